@@ -0,0 +1,166 @@
+"""
+Account Tagging Rules
+Derives jurisdiction, offshore/high-risk flags and entity type from account identifiers.
+Shared by ingestion (stored as node labels and indexed properties) and the risk scorer.
+All name keyword lists are matched in a single automaton pass per identifier.
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, FrozenSet, Hashable, List
+
+from keyword_classifier import KeywordAutomaton
+
+
+class EntityType(Enum):
+    """Entity type classification"""
+    INDIVIDUAL = "INDIVIDUAL"
+    CORPORATE = "CORPORATE"
+    SHELL_COMPANY = "SHELL_COMPANY"
+    OFFSHORE_ENTITY = "OFFSHORE_ENTITY"
+    FINANCIAL_INSTITUTION = "FINANCIAL_INSTITUTION"
+    CRYPTOCURRENCY_EXCHANGE = "CRYPTOCURRENCY_EXCHANGE"
+    UNKNOWN = "UNKNOWN"
+
+
+OFFSHORE_COUNTRIES = frozenset({
+    'BM', 'KY', 'VI', 'BS', 'PA', 'LI', 'MC', 'AD', 'SM', 'MT',
+    'CY', 'LU', 'CH', 'SG', 'HK', 'MY', 'TH', 'PH', 'VU', 'WS'
+})
+
+HIGH_RISK_COUNTRIES = frozenset({
+    'AF', 'IQ', 'IR', 'KP', 'MM', 'SO', 'SY', 'YE', 'VE', 'CU'
+})
+
+# Checked in order; the first matching group decides the entity type
+ENTITY_TYPE_PATTERNS = [
+    (EntityType.SHELL_COMPANY, ('SHELL', 'HOLDING', 'SPV')),
+    (EntityType.OFFSHORE_ENTITY, ('OFFSHORE', 'BVI', 'CAYMAN')),
+    (EntityType.FINANCIAL_INSTITUTION, ('BANK', 'CREDIT', 'FINANCE')),
+    (EntityType.CORPORATE, ('CORP', 'LLC', 'LTD', 'INC')),
+    (EntityType.CRYPTOCURRENCY_EXCHANGE, ('EXCHANGE', 'CRYPTO', 'COIN')),
+]
+
+# Name keyword lists used by the risk factors and shell network indicators
+SHELL_INDICATORS = 'shell_indicators'
+CORPORATE_NAME = 'corporate_name'
+CRYPTO_INDICATORS = 'crypto_indicators'
+PEP_INDICATORS = 'pep_indicators'
+SHELL_NETWORK_KEYWORDS = 'shell_network_keywords'
+
+# Entity type groups are keyed by their EntityType
+KEYWORD_CATEGORIES = {
+    **dict(ENTITY_TYPE_PATTERNS),
+    SHELL_INDICATORS: ('SHELL', 'HOLDING', 'SPV', 'INVEST', 'CAPITAL', 'MANAGEMENT'),
+    CORPORATE_NAME: ('LLC', 'LTD', 'INC', 'CORP', 'HOLDING', 'INVEST', 'CAPITAL'),
+    CRYPTO_INDICATORS: ('EXCHANGE', 'CRYPTO', 'BTC', 'ETH', 'COIN'),
+    PEP_INDICATORS: ('MINISTER', 'SENATOR', 'MAYOR', 'GOVERNOR', 'AMBASSADOR'),
+    SHELL_NETWORK_KEYWORDS: ('LLC', 'CORP', 'HOLDING', 'INVEST', 'CAPITAL', 'MANAGEMENT', 'SERVICES'),
+}
+
+_KEYWORD_AUTOMATON = KeywordAutomaton(KEYWORD_CATEGORIES)
+
+# Entity types that count as corporate structures for shell network queries
+CORPORATE_STRUCTURE_TYPES = (EntityType.SHELL_COMPANY, EntityType.CORPORATE)
+
+# Neo4j labels added to Account nodes at ingestion
+OFFSHORE_LABEL = 'Offshore'
+HIGH_RISK_LABEL = 'HighRiskJurisdiction'
+ENTITY_LABELS = {
+    EntityType.SHELL_COMPANY: 'ShellCompany',
+    EntityType.OFFSHORE_ENTITY: 'OffshoreEntity',
+    EntityType.FINANCIAL_INSTITUTION: 'FinancialInstitution',
+    EntityType.CORPORATE: 'Corporate',
+    EntityType.CRYPTOCURRENCY_EXCHANGE: 'CryptoExchange',
+}
+
+
+@dataclass(frozen=True)
+class AccountTags:
+    """Tags derived once per account identifier"""
+    country_code: str
+    entity_type: EntityType
+    is_offshore: bool
+    is_high_risk_jurisdiction: bool
+
+    @property
+    def labels(self) -> List[str]:
+        """Extra node labels beyond Account"""
+        labels = []
+        if self.is_offshore:
+            labels.append(OFFSHORE_LABEL)
+        if self.is_high_risk_jurisdiction:
+            labels.append(HIGH_RISK_LABEL)
+        if self.entity_type in ENTITY_LABELS:
+            labels.append(ENTITY_LABELS[self.entity_type])
+        return labels
+
+    def as_properties(self) -> Dict:
+        """Node properties stored alongside the labels"""
+        return {
+            "country_code": self.country_code,
+            "entity_type": self.entity_type.value,
+            "is_offshore": self.is_offshore,
+            "is_high_risk_jurisdiction": self.is_high_risk_jurisdiction
+        }
+
+
+@dataclass(frozen=True)
+class AccountKeywords:
+    """Keyword categories matched by one account identifier"""
+    mask: int
+    keywords: FrozenSet[str]
+
+    def has(self, category: Hashable) -> bool:
+        return bool(self.mask & keyword_bit(category))
+
+    def matches(self, category: Hashable) -> List[str]:
+        """The category's keywords found in the identifier, in list order"""
+        return [keyword for keyword in KEYWORD_CATEGORIES[category] if keyword in self.keywords]
+
+
+@lru_cache(maxsize=1 << 20)
+def account_keywords(account_id: str) -> AccountKeywords:
+    """Match (and memoize) every keyword category against an identifier in one pass"""
+    return AccountKeywords(*_KEYWORD_AUTOMATON.scan(account_id))
+
+
+def keyword_bit(category: Hashable) -> int:
+    """Bit of the category in AccountKeywords.mask"""
+    return _KEYWORD_AUTOMATON.bit(category)
+
+
+def has_keyword(account_id: str, category: Hashable) -> bool:
+    """Whether the identifier contains any keyword of the category"""
+    return account_keywords(account_id).has(category)
+
+
+def extract_country_code(account_id: str) -> str:
+    """Extract country code from account ID"""
+    # Simple pattern matching - in real implementation, use a proper mapping
+    if len(account_id) >= 2:
+        return account_id[:2].upper()
+    return "XX"
+
+
+def classify_entity_type(account_id: str) -> EntityType:
+    """Classify entity type based on account patterns"""
+    keywords = account_keywords(account_id)
+    for entity_type, _ in ENTITY_TYPE_PATTERNS:
+        if keywords.has(entity_type):
+            return entity_type
+    return EntityType.INDIVIDUAL
+
+
+@lru_cache(maxsize=1 << 20)
+def tag_account(account_id: str) -> AccountTags:
+    """Derive (and memoize) all tags for an account identifier"""
+    country_code = extract_country_code(account_id)
+    return AccountTags(
+        country_code=country_code,
+        entity_type=classify_entity_type(account_id),
+        is_offshore=(country_code in OFFSHORE_COUNTRIES or
+                     has_keyword(account_id, EntityType.OFFSHORE_ENTITY)),
+        is_high_risk_jurisdiction=country_code in HIGH_RISK_COUNTRIES
+    )
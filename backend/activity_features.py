@@ -0,0 +1,231 @@
+"""
+Streaming Activity Features
+Velocity and temporal features over each account's latest transactions (the
+window the risk factors read from the timeline store), maintained at
+ingestion. Each account keeps a ring buffer of its latest timestamps, per-day
+counts with a running maximum, an hour-of-week histogram, night, weekend and
+rapid-sequence counters, a monotonic queue of inter-arrival gaps and decayed
+transaction counts. Every counter is adjusted as a transaction enters or
+leaves the window, so ingesting a transaction and reading an account's
+features are both O(1).
+"""
+
+import logging
+import math
+import threading
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import RAPID_SEQUENCE_SECONDS, BURST_SHORT_SECONDS, BURST_LONG_SECONDS
+from timeline_store import SECONDS_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+# Features served from the store, in the order _Activity.features returns them
+ACTIVITY_FEATURES = (
+    'avg_daily_transactions', 'max_daily_transactions', 'active_days',
+    'night_ratio', 'weekend_ratio', 'rapid_sequences', 'hourly_variance',
+    'min_inter_arrival', 'burst_ratio',
+)
+_INTEGER_FEATURES = {'max_daily_transactions', 'active_days', 'rapid_sequences'}
+
+
+class _Activity:
+    """Window counters for one account"""
+
+    __slots__ = ('timestamps', 'start', 'sequence', 'daily', 'days_with_count', 'max_daily',
+                 'hour_of_week', 'hour_square_sum', 'night', 'weekend', 'rapid', 'gaps', 'short', 'long')
+
+    def __init__(self):
+        self.timestamps = array('q')        # ring buffer once it holds window entries
+        self.start = 0                      # ring position of the oldest timestamp
+        self.sequence = 0                   # transactions added; gap i is between i - 1 and i
+        self.daily: Dict[int, int] = {}     # day -> transactions in the window
+        self.days_with_count: Dict[int, int] = {}
+        self.max_daily = 0
+        self.hour_of_week = array('H', bytes(2 * 7 * 24))
+        self.hour_square_sum = 0            # sum of squared hour-of-day counts
+        self.night = 0
+        self.weekend = 0
+        self.rapid = 0
+        self.gaps = deque()                 # (sequence, gap), gaps increasing: window minimum in front
+        self.short = 0.0                    # decayed counts at the latest timestamp
+        self.long = 0.0
+
+    @property
+    def latest(self) -> int:
+        return self.timestamps[self.start - 1]
+
+    def ordered(self) -> List[int]:
+        """Window timestamps, oldest first"""
+        return list(self.timestamps[self.start:]) + list(self.timestamps[:self.start])
+
+    def _count_day(self, day: int, delta: int):
+        count = self.daily.get(day, 0)
+        if count:
+            self._count_days_with(count, -1)
+        count += delta
+        if count:
+            self.daily[day] = count
+            self._count_days_with(count, 1)
+        else:
+            del self.daily[day]
+
+        if delta > 0:
+            self.max_daily = max(self.max_daily, count)
+        elif not self.days_with_count.get(self.max_daily):
+            # The only day at the maximum lost one transaction
+            self.max_daily -= 1
+
+    def _count_days_with(self, count: int, delta: int):
+        days = self.days_with_count.get(count, 0) + delta
+        if days:
+            self.days_with_count[count] = days
+        else:
+            del self.days_with_count[count]
+
+    def _count(self, timestamp: int, delta: int):
+        """Add (delta=1) or remove (delta=-1) a transaction from the day and hour counters"""
+        self._count_day(timestamp // SECONDS_PER_DAY, delta)
+        hour = (timestamp // 3600) % 24
+        weekday = (timestamp // SECONDS_PER_DAY + 3) % 7
+        hour_count = sum(self.hour_of_week[hour::24])
+        self.hour_square_sum += delta * (2 * hour_count + delta)
+        self.hour_of_week[weekday * 24 + hour] += delta
+        if hour >= 22 or hour <= 6:
+            self.night += delta
+        if weekday >= 5:
+            self.weekend += delta
+
+    def add(self, timestamp: int, window: int):
+        if not self.timestamps:
+            self.short = self.long = 1.0
+        else:
+            latest = self.latest
+            if timestamp < latest:
+                self._add_late(timestamp, window)
+                return
+            elapsed = timestamp - latest
+            self.short = self.short * math.exp(-elapsed / BURST_SHORT_SECONDS) + 1.0
+            self.long = self.long * math.exp(-elapsed / BURST_LONG_SECONDS) + 1.0
+            gap = timestamp - latest
+            if gap < RAPID_SEQUENCE_SECONDS:
+                self.rapid += 1
+            while self.gaps and self.gaps[-1][1] >= gap:
+                self.gaps.pop()
+            self.gaps.append((self.sequence, gap))
+
+        if len(self.timestamps) < window:
+            self.timestamps.append(timestamp)
+        else:
+            self._evict(timestamp, window)
+            self.timestamps[self.start] = timestamp
+            self.start = (self.start + 1) % window
+        self.sequence += 1
+        self._count(timestamp, 1)
+
+    def _evict(self, latest: int, window: int):
+        """Drop the oldest transaction; latest is the timestamp replacing it"""
+        oldest = self.timestamps[self.start]
+        following = self.timestamps[(self.start + 1) % window] if window > 1 else latest
+        if following - oldest < RAPID_SEQUENCE_SECONDS:
+            self.rapid -= 1
+        oldest_sequence = self.sequence - window + 1
+        while self.gaps and self.gaps[0][0] <= oldest_sequence:
+            self.gaps.popleft()
+        self.short = max(self.short - math.exp(-(latest - oldest) / BURST_SHORT_SECONDS), 0.0)
+        self.long = max(self.long - math.exp(-(latest - oldest) / BURST_LONG_SECONDS), 0.0)
+        self._count(oldest, -1)
+
+    def _add_late(self, timestamp: int, window: int):
+        # Late arrivals are rare; recount the window with the transaction in place
+        timestamps = self.ordered()
+        position = bisect_right(timestamps, timestamp)
+        if position == 0 and len(timestamps) >= window:
+            return
+        timestamps.insert(position, timestamp)
+        self.__init__()
+        for value in timestamps[-window:]:
+            self.add(value, window)
+
+    def features(self) -> tuple:
+        n = len(self.timestamps)
+        days = len(self.daily)
+        return (
+            n / days,
+            self.max_daily,
+            days,
+            self.night / n,
+            self.weekend / n,
+            self.rapid,
+            (24 * self.hour_square_sum - n * n) / 576,
+            float(self.gaps[0][1]) if self.gaps else math.inf,
+            self.short * (BURST_LONG_SECONDS / BURST_SHORT_SECONDS) / self.long if self.long > 0 else 0.0,
+        )
+
+
+class ActivityFeatureStore:
+    """Per-account velocity and temporal features kept current by ingestion"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._accounts: Dict[str, _Activity] = {}
+
+    def _account(self, account_id: str) -> _Activity:
+        activity = self._accounts.get(account_id)
+        if activity is None:
+            activity = self._accounts[account_id] = _Activity()
+        return activity
+
+    def add_transaction(self, sender_id: str, receiver_id: str, timestamp: int):
+        """Count one transaction for both parties"""
+        with self._lock:
+            self._account(sender_id).add(timestamp, self.window)
+            self._account(receiver_id).add(timestamp, self.window)
+
+    def ingest_dataframe(self, df: pd.DataFrame):
+        """Feed a batch of canonical transactions (nameOrig, nameDest, step)"""
+        if df is None or df.empty:
+            return
+
+        df = df.sort_values('step', kind='stable')
+        for orig, dest, step in zip(df['nameOrig'].astype(str), df['nameDest'].astype(str), df['step']):
+            self.add_transaction(orig, dest, int(step))
+
+    def features(self, account_ids: List[str], until: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        ACTIVITY_FEATURES columns for the accounts, plus a `present` mask of the
+        accounts the store covers (known, and with no transaction after until)
+        """
+        present = np.zeros(len(account_ids), dtype=bool)
+        rows = []
+        with self._lock:
+            for index, account_id in enumerate(account_ids):
+                activity = self._accounts.get(account_id)
+                if activity is None or (until is not None and activity.latest > until):
+                    rows.append((0,) * len(ACTIVITY_FEATURES))
+                    continue
+                present[index] = True
+                rows.append(activity.features())
+
+        columns = {
+            name: np.fromiter((row[position] for row in rows),
+                              dtype=np.int64 if name in _INTEGER_FEATURES else np.float64, count=len(rows))
+            for position, name in enumerate(ACTIVITY_FEATURES)
+        }
+        columns['present'] = present
+        return columns
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "tracked_accounts": len(self._accounts),
+                "window": self.window,
+                "windowed_transactions": sum(len(activity.timestamps) for activity in self._accounts.values())
+            }
@@ -10,11 +10,36 @@ from typing import Dict, List, Tuple, Optional, Set
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
-import networkx as nx
 from collections import defaultdict, deque
 
+from flow_graph import MoneyFlowGraph, build_money_flow_graph
+from flow_attribution import attribute_flow, ATTRIBUTION_PROPORTIONAL
+from timeline_store import AccountTimeline
+from analysis_context import AnalysisContext
+from analytics_pool import AnalyticsTimeoutError, run_analytics
+from centrality import ego_centrality, centrality_risk, HIGH_BETWEENNESS, HIGH_CLOSENESS, HIGH_DEGREE
+from batch_scoring import FACTOR_NAMES, TransactionTable, rule_features, score_table
+from risk_rules import RuleEngine, RuleSet
+from screening import SANCTIONS, PEP
+from account_tags import (
+    EntityType,
+    OFFSHORE_COUNTRIES,
+    HIGH_RISK_COUNTRIES,
+    SHELL_INDICATORS,
+    CORPORATE_NAME,
+    CRYPTO_INDICATORS,
+    PEP_INDICATORS,
+    has_keyword,
+    tag_account
+)
+
 logger = logging.getLogger(__name__)
 
+# Most recent transactions considered by the per-account risk factors
+HISTORY_LIMIT = 1000
+# Most recent transactions forming the account's network for centrality
+NETWORK_EDGE_LIMIT = 500
+
 class RiskLevel(Enum):
     """Risk level enumeration"""
     LOW = "LOW"
@@ -22,16 +47,6 @@ class RiskLevel(Enum):
     HIGH = "HIGH"
     CRITICAL = "CRITICAL"
 
-class EntityType(Enum):
-    """Entity type classification"""
-    INDIVIDUAL = "INDIVIDUAL"
-    CORPORATE = "CORPORATE"
-    SHELL_COMPANY = "SHELL_COMPANY"
-    OFFSHORE_ENTITY = "OFFSHORE_ENTITY"
-    FINANCIAL_INSTITUTION = "FINANCIAL_INSTITUTION"
-    CRYPTOCURRENCY_EXCHANGE = "CRYPTOCURRENCY_EXCHANGE"
-    UNKNOWN = "UNKNOWN"
-
 @dataclass
 class RiskFactor:
     """Individual risk factor with weight and description"""
@@ -63,50 +78,61 @@ class AccountProfile:
 class AdvancedRiskScorer:
     """Advanced risk scoring engine for money laundering detection"""
     
-    def __init__(self, db_provider):
+    def __init__(self, db_provider, timeline_store=None, analytics_pool=None, screening=None,
+                 risk_rules: Optional[RuleEngine] = None):
         self.db_provider = db_provider
-        self.offshore_countries = {
-            'BM', 'KY', 'VI', 'BS', 'PA', 'LI', 'MC', 'AD', 'SM', 'MT',
-            'CY', 'LU', 'CH', 'SG', 'HK', 'MY', 'TH', 'PH', 'VU', 'WS'
-        }
-        self.high_risk_countries = {
-            'AF', 'IQ', 'IR', 'KP', 'MM', 'SO', 'SY', 'YE', 'VE', 'CU'
-        }
-        
-        # Risk weights for different factors
-        self.risk_weights = {
-            'velocity': 0.15,           # Transaction velocity
-            'amount_pattern': 0.20,     # Unusual amount patterns
-            'network_centrality': 0.15, # Position in transaction network
-            'geographic': 0.10,         # Geographic risk
-            'structural': 0.15,         # Structural indicators
-            'temporal': 0.10,           # Time-based patterns
-            'counterparty': 0.15        # Counterparty risk
-        }
+        self.timeline_store = timeline_store
+        # Streaming velocity/temporal features (activity_features.ActivityFeatureStore); computed from
+        # the transactions when unset or when the store does not cover the account
+        self.feature_store = None
+        # Sanctions/PEP list screening (screening.ScreeningEngine); lists are not consulted when unset
+        self.screening = screening
+        # Flow graph analyses run here when set, otherwise in the calling thread
+        self.analytics_pool = analytics_pool
+        self.offshore_countries = set(OFFSHORE_COUNTRIES)
+        self.high_risk_countries = set(HIGH_RISK_COUNTRIES)
+        
+        # Thresholds of the rule-based factors and all factor weights (risk_rules.json by default)
+        self.risk_rules = risk_rules if risk_rules is not None else RuleEngine()
+    
+    @property
+    def risk_weights(self) -> Dict[str, float]:
+        """Current weight of each factor"""
+        rules = self.risk_rules.current()
+        return {name: rules.weight(name) for name in FACTOR_NAMES}
     
-    def calculate_comprehensive_risk_score(self, account_id: str) -> Dict:
-        """Calculate comprehensive risk score for an account"""
+    def calculate_comprehensive_risk_score(self, account_id: str, as_of: Optional[int] = None,
+                                           context: Optional[AnalysisContext] = None) -> Dict:
+        """Calculate comprehensive risk score for an account, optionally as the graph stood at as_of"""
         try:
-            # Get account profile and transaction data
-            profile = self._build_account_profile(account_id)
-            transactions = self._get_account_transactions(account_id)
+            if context is None:
+                context = AnalysisContext(account_id, as_of)
+            
+            # Get transaction data and account profile
+            transactions = self._get_account_transactions(account_id, as_of, context)
+            profile = self._build_account_profile(account_id, transactions)
             
             if not transactions:
                 return {"risk_score": 0.0, "risk_level": RiskLevel.LOW, "factors": []}
             
+            # One rule set and one feature row for all rule-based factors
+            rules = self.risk_rules.current()
+            features = rule_features(TransactionTable.from_timelines([transactions]), self,
+                                     streamed=self._streamed_features([account_id], as_of))
+            
             # Calculate individual risk factors
             risk_factors = []
             
             # 1. Velocity Risk - Rapid transaction frequency
-            velocity_risk = self._calculate_velocity_risk(transactions)
+            velocity_risk = self._calculate_rule_factor('velocity', rules, features)
             risk_factors.append(velocity_risk)
             
             # 2. Amount Pattern Risk - Structuring, round amounts
-            amount_risk = self._calculate_amount_pattern_risk(transactions)
+            amount_risk = self._calculate_rule_factor('amount_pattern', rules, features)
             risk_factors.append(amount_risk)
             
             # 3. Network Centrality Risk - Position in money flow network
-            network_risk = self._calculate_network_centrality_risk(account_id)
+            network_risk = self._calculate_network_centrality_risk(account_id, as_of, context)
             risk_factors.append(network_risk)
             
             # 4. Geographic Risk - Offshore/high-risk jurisdictions
@@ -114,11 +140,11 @@ class AdvancedRiskScorer:
             risk_factors.append(geo_risk)
             
             # 5. Structural Risk - Shell company patterns
-            structural_risk = self._calculate_structural_risk(profile, account_id)
+            structural_risk = self._calculate_rule_factor('structural', rules, features)
             risk_factors.append(structural_risk)
             
             # 6. Temporal Risk - Unusual timing patterns
-            temporal_risk = self._calculate_temporal_risk(transactions)
+            temporal_risk = self._calculate_rule_factor('temporal', rules, features)
             risk_factors.append(temporal_risk)
             
             # 7. Counterparty Risk - High-risk associations
@@ -127,7 +153,7 @@ class AdvancedRiskScorer:
             
             # Calculate weighted risk score
             total_score = sum(
-                factor.score * self.risk_weights.get(factor.name, 0.1) 
+                factor.score * rules.weight(factor.name)
                 for factor in risk_factors
             )
             
@@ -145,7 +171,7 @@ class AdvancedRiskScorer:
                     {
                         "name": factor.name,
                         "score": factor.score,
-                        "weight": factor.weight,
+                        "weight": rules.weight(factor.name),
                         "description": factor.description,
                         "evidence": factor.evidence
                     }
@@ -160,6 +186,7 @@ class AdvancedRiskScorer:
                     "total_outflow": profile.total_outflow,
                     "transaction_count": profile.transaction_count
                 },
+                "as_of": as_of,
                 "timestamp": datetime.utcnow().isoformat()
             }
             
@@ -167,37 +194,103 @@ class AdvancedRiskScorer:
             logger.error(f"Error calculating risk score for {account_id}: {e}")
             return {"risk_score": 0.0, "risk_level": RiskLevel.LOW, "error": str(e)}
     
-    def track_money_flow(self, account_id: str, max_depth: int = 5) -> Dict:
+    def calculate_batch_risk_table(self, account_ids: List[str], as_of: Optional[int] = None) -> pd.DataFrame:
+        """Factor scores, risk_score, risk_level and transaction_count per account (indexed by account_id)"""
+        timelines = self._get_accounts_transactions(account_ids, as_of)
+        return score_table(TransactionTable.from_timelines(timelines), self, NETWORK_EDGE_LIMIT,
+                           streamed=self._streamed_features(account_ids, as_of))
+    
+    def _streamed_features(self, account_ids: List[str], as_of: Optional[int] = None) -> Optional[Dict]:
+        """Velocity and temporal feature columns kept current by ingestion, if a feature store is set"""
+        if self.feature_store is None:
+            return None
+        return self.feature_store.features(account_ids, until=as_of)
+
+    def calculate_batch_risk_scores(self, account_ids: List[str], as_of: Optional[int] = None) -> List[Dict]:
+        """
+        Score many accounts at once with column-wise factors (no per-factor evidence).
+        Errors reading the transactions propagate, so a failed read is not an empty result.
+        """
+        scores = self.calculate_batch_risk_table(account_ids, as_of)
+
+        results = []
+        for account_id, row in zip(account_ids, scores.itertuples(index=False)):
+            results.append({
+                "account_id": account_id,
+                "risk_score": float(row.risk_score),
+                "risk_level": row.risk_level,
+                "factor_scores": {name: float(getattr(row, name)) for name in FACTOR_NAMES},
+                "transaction_count": int(row.transaction_count)
+            })
+        return results
+    
+    def track_money_flow(self, account_id: str, max_depth: int = 5, as_of: Optional[int] = None,
+                         context: Optional[AnalysisContext] = None) -> Dict:
         """Track money flow across multiple accounts and entities"""
         try:
-            flow_graph = self._build_money_flow_graph(account_id, max_depth)
+            flow_graph = self._build_money_flow_graph(account_id, max_depth, as_of, context)
             
             # Analyze flow patterns
             analysis = {
                 "source_account": account_id,
                 "total_depth": max_depth,
-                "flow_analysis": self._analyze_flow_patterns(flow_graph),
-                "suspicious_patterns": self._detect_suspicious_patterns(flow_graph),
-                "entity_analysis": self._analyze_entities_in_flow(flow_graph),
-                "geographic_analysis": self._analyze_geographic_flow(flow_graph),
+                "as_of": as_of,
+                **run_analytics(self.analytics_pool, analyze_money_flow, flow_graph),
                 "timestamp": datetime.utcnow().isoformat()
             }
             
             return analysis
             
+        except AnalyticsTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Error tracking money flow for {account_id}: {e}")
             return {"error": str(e)}
     
-    def detect_layering_schemes(self, account_id: str) -> Dict:
-        """Detect complex layering schemes and circular transactions"""
+    def trace_fund_attribution(self, account_id: str, max_hops: int = 5,
+                               method: str = ATTRIBUTION_PROPORTIONAL,
+                               target: Optional[str] = None, as_of: Optional[int] = None,
+                               context: Optional[AnalysisContext] = None) -> Dict:
+        """Attribute an account's outgoing funds to the accounts where they ended up"""
+        try:
+            flow_graph = self._build_money_flow_graph(account_id, max_hops, as_of, context)
+            
+            analysis = run_analytics(self.analytics_pool, summarize_fund_attribution, flow_graph, max_hops, method, target)
+            analysis["as_of"] = as_of
+            analysis["timestamp"] = datetime.utcnow().isoformat()
+            return analysis
+            
+        except AnalyticsTimeoutError:
+            raise
+        except Exception as e:
+            logger.error(f"Error attributing fund flow for {account_id}: {e}")
+            return {"error": str(e)}
+    
+    def get_centrality_metrics(self, account_id: str, as_of: Optional[int] = None,
+                               context: Optional[AnalysisContext] = None) -> Dict:
+        """Network centrality metrics for an account, fetched once per analysis context"""
+        def load():
+            return self.db_provider.calculate_account_centrality_metrics(account_id, as_of=as_of)
+        
+        return context.get('centrality_metrics', load) if context is not None else load()
+    
+    def get_counterparties(self, account_id: str, as_of: Optional[int] = None) -> List[str]:
+        """Distinct counterparties of the account's recent transactions (at or before as_of)"""
+        return self._get_account_transactions(account_id, as_of).counterparties()
+    
+    def detect_layering_schemes(self, account_id: str, as_of: Optional[int] = None,
+                                context: Optional[AnalysisContext] = None) -> Dict:
+        """Detect complex layering schemes and circular transactions (at or before as_of)"""
+        if context is not None:
+            as_of = context.as_of
         try:
             # Find all paths and cycles involving the account
-            cycles = self._find_complex_cycles(account_id)
-            layering_patterns = self._detect_layering_patterns(account_id)
+            cycles = self._find_complex_cycles(account_id, as_of)
+            layering_patterns = self._detect_layering_patterns(account_id, as_of)
             
             return {
                 "account_id": account_id,
+                "as_of": as_of,
                 "cycles_detected": len(cycles),
                 "cycle_details": cycles[:10],  # Top 10 cycles
                 "layering_patterns": layering_patterns,
@@ -209,14 +302,17 @@ class AdvancedRiskScorer:
             logger.error(f"Error detecting layering schemes for {account_id}: {e}")
             return {"error": str(e)}
     
-    def _build_account_profile(self, account_id: str) -> AccountProfile:
+    def _build_account_profile(self, account_id: str,
+                               transactions: Optional[AccountTimeline] = None) -> AccountProfile:
         """Build comprehensive account profile"""
         # Extract country code and entity type from account ID patterns
         country_code = self._extract_country_code(account_id)
         entity_type = self._classify_entity_type(account_id)
         
         # Get transaction statistics
-        stats = self._get_transaction_statistics(account_id)
+        if transactions is None:
+            transactions = self._get_account_transactions(account_id)
+        stats = self._get_transaction_statistics(transactions)
         
         return AccountProfile(
             account_id=account_id,
@@ -230,137 +326,72 @@ class AdvancedRiskScorer:
             unique_counterparties=stats.get('unique_counterparties', 0)
         )
     
-    def _get_account_transactions(self, account_id: str) -> pd.DataFrame:
-        """Get recent transactions for an account"""
-        return self.db_provider.get_account_history(account_id, limit=1000)
+    def _get_account_transactions(self, account_id: str, as_of: Optional[int] = None,
+                                  context: Optional[AnalysisContext] = None) -> AccountTimeline:
+        """Get recent transactions (at or before as_of) for an account as time-sorted column views"""
+        if context is not None:
+            return context.get('transactions', lambda: self._get_account_transactions(account_id, as_of))
+        
+        if self.timeline_store is not None:
+            timeline = self.timeline_store.timeline(account_id, until=as_of)
+            if timeline is not None:
+                return timeline.latest(HISTORY_LIMIT)
+        
+        # Accounts the local store has not seen yet fall back to the database
+        history = self.db_provider.get_account_history(account_id, limit=HISTORY_LIMIT, until=as_of)
+        return AccountTimeline.from_history(account_id, history)
     
-    def _calculate_velocity_risk(self, transactions: pd.DataFrame) -> RiskFactor:
-        """Calculate transaction velocity risk"""
-        if transactions.empty:
-            return RiskFactor("velocity", 0.0, 0.15, "No transactions", [])
-        
-        # Calculate transactions per day
-        transactions['date'] = pd.to_datetime(transactions.get('timestamp', 0), unit='s', errors='coerce')
-        daily_counts = transactions.groupby(transactions['date'].dt.date).size()
-        avg_daily_tx = daily_counts.mean()
-        max_daily_tx = daily_counts.max()
-        
-        evidence = []
-        score = 0.0
-        
-        # High frequency scoring
-        if avg_daily_tx > 50:
-            score += 0.4
-            evidence.append(f"High average daily transactions: {avg_daily_tx:.1f}")
-        
-        if max_daily_tx > 100:
-            score += 0.3
-            evidence.append(f"Peak daily transactions: {max_daily_tx}")
-        
-        # Burst detection
-        if max_daily_tx > avg_daily_tx * 5:
-            score += 0.3
-            evidence.append("Unusual transaction bursts detected")
-        
-        return RiskFactor(
-            "velocity", 
-            min(score, 1.0), 
-            0.15, 
-            "Transaction frequency and velocity patterns",
-            evidence
-        )
+    def _get_accounts_transactions(self, account_ids: List[str],
+                                   as_of: Optional[int] = None) -> List[AccountTimeline]:
+        """Recent transactions of many accounts, fetching the ones the store lacks in one batch query"""
+        timelines = {}
+        if self.timeline_store is not None:
+            for account_id in account_ids:
+                timeline = self.timeline_store.timeline(account_id, until=as_of)
+                if timeline is not None:
+                    timelines[account_id] = timeline.latest(HISTORY_LIMIT)
+        
+        missing = [account_id for account_id in account_ids if account_id not in timelines]
+        if missing:
+            histories = self.db_provider.get_account_histories(missing, limit=HISTORY_LIMIT, until=as_of)
+            grouped = dict(tuple(histories.groupby('account'))) if not histories.empty else {}
+            for account_id in missing:
+                timelines[account_id] = AccountTimeline.from_history(account_id, grouped.get(account_id))
+        
+        return [timelines[account_id] for account_id in account_ids]
     
-    def _calculate_amount_pattern_risk(self, transactions: pd.DataFrame) -> RiskFactor:
-        """Calculate risk based on amount patterns (structuring, round amounts)"""
-        if transactions.empty:
-            return RiskFactor("amount_pattern", 0.0, 0.20, "No transactions", [])
-        
-        amounts = transactions['amount'].values
-        evidence = []
-        score = 0.0
-        
-        # Structuring detection (amounts just below reporting thresholds)
-        structuring_thresholds = [10000, 5000, 3000]
-        for threshold in structuring_thresholds:
-            near_threshold = np.sum((amounts >= threshold * 0.9) & (amounts < threshold))
-            if near_threshold > 5:
-                score += 0.3
-                evidence.append(f"{near_threshold} transactions near ${threshold} threshold")
-        
-        # Round amount analysis
-        round_amounts = np.sum(amounts % 1000 == 0)
-        if round_amounts / len(amounts) > 0.5:
-            score += 0.2
-            evidence.append(f"High percentage of round amounts: {round_amounts/len(amounts)*100:.1f}%")
-        
-        # Unusual amount patterns
-        amount_variance = np.var(amounts)
-        amount_mean = np.mean(amounts)
-        if amount_variance > amount_mean * 100:
-            score += 0.2
-            evidence.append("High variance in transaction amounts")
-        
-        # Smurfing detection (many small similar amounts)
-        amount_bins = np.histogram(amounts, bins=50)[0]
-        if np.max(amount_bins) > len(amounts) * 0.3:
-            score += 0.3
-            evidence.append("Potential smurfing pattern detected")
-        
-        return RiskFactor(
-            "amount_pattern",
-            min(score, 1.0),
-            0.20,
-            "Analysis of transaction amount patterns for structuring",
-            evidence
-        )
+    def _calculate_rule_factor(self, name: str, rules: RuleSet, features: Dict[str, np.ndarray]) -> RiskFactor:
+        """Score a rule-based factor (velocity, amount pattern, structural, temporal) from its features"""
+        score, evidence = rules.explain(name, features)
+        return RiskFactor(name, min(score, 1.0), rules.weight(name), rules.descriptions.get(name, ""), evidence)
     
-    def _calculate_network_centrality_risk(self, account_id: str) -> RiskFactor:
+    def _calculate_network_centrality_risk(self, account_id: str, as_of: Optional[int] = None,
+                                           context: Optional[AnalysisContext] = None) -> RiskFactor:
         """Calculate risk based on network position"""
         try:
-            # Build transaction network
-            network_data = self.db_provider.get_transaction_graph(account_id, limit=500)
+            # The account's direct network, from the transactions already fetched for the other factors
+            transactions = self._get_account_transactions(account_id, as_of, context).latest(NETWORK_EDGE_LIMIT)
             
-            if not network_data.get('nodes') or not network_data.get('links'):
+            if not transactions:
                 return RiskFactor("network_centrality", 0.0, 0.15, "Insufficient network data", [])
             
-            # Create NetworkX graph
-            G = nx.DiGraph()
+            # Every edge of the ego network touches the account, so its values have closed forms
+            centrality = ego_centrality(transactions.counterparty, transactions.outgoing)
             
-            # Add nodes
-            for node in network_data['nodes']:
-                G.add_node(node['id'])
+            score = float(centrality_risk(centrality.betweenness, centrality.closeness, centrality.degree))
+            evidence = []
             
-            # Add edges with weights
-            for link in network_data['links']:
-                G.add_edge(link['source'], link['target'], weight=link.get('amount', 1))
+            # High betweenness suggests intermediary role
+            if centrality.betweenness > HIGH_BETWEENNESS:
+                evidence.append(f"High betweenness centrality: {centrality.betweenness:.3f}")
             
-            evidence = []
-            score = 0.0
-            
-            if account_id in G:
-                # Calculate centrality measures
-                betweenness = nx.betweenness_centrality(G)
-                closeness = nx.closeness_centrality(G)
-                degree = dict(G.degree())
-                
-                account_betweenness = betweenness.get(account_id, 0)
-                account_closeness = closeness.get(account_id, 0)
-                account_degree = degree.get(account_id, 0)
-                
-                # High betweenness suggests intermediary role
-                if account_betweenness > 0.1:
-                    score += 0.4
-                    evidence.append(f"High betweenness centrality: {account_betweenness:.3f}")
-                
-                # High closeness suggests central position
-                if account_closeness > 0.5:
-                    score += 0.3
-                    evidence.append(f"High closeness centrality: {account_closeness:.3f}")
-                
-                # High degree suggests hub activity
-                if account_degree > 20:
-                    score += 0.3
-                    evidence.append(f"High degree centrality: {account_degree}")
+            # High closeness suggests central position
+            if centrality.closeness > HIGH_CLOSENESS:
+                evidence.append(f"High closeness centrality: {centrality.closeness:.3f}")
+            
+            # High degree suggests hub activity
+            if centrality.degree > HIGH_DEGREE:
+                evidence.append(f"High degree centrality: {centrality.degree}")
             
             return RiskFactor(
                 "network_centrality",
@@ -374,7 +405,7 @@ class AdvancedRiskScorer:
             logger.error(f"Error calculating network centrality: {e}")
             return RiskFactor("network_centrality", 0.0, 0.15, "Network analysis failed", [])
     
-    def _calculate_geographic_risk(self, profile: AccountProfile, transactions: pd.DataFrame) -> RiskFactor:
+    def _calculate_geographic_risk(self, profile: AccountProfile, transactions: AccountTimeline) -> RiskFactor:
         """Calculate geographic risk factors"""
         evidence = []
         score = 0.0
@@ -390,9 +421,9 @@ class AdvancedRiskScorer:
             evidence.append(f"Account in high-risk country: {profile.country_code}")
         
         # Analyze counterparty countries from transactions
-        if not transactions.empty and 'other_party' in transactions.columns:
+        if transactions:
             counterparty_countries = set()
-            for party in transactions['other_party'].unique():
+            for party in transactions.counterparties():
                 country = self._extract_country_code(party)
                 if country:
                     counterparty_countries.add(country)
@@ -409,110 +440,29 @@ class AdvancedRiskScorer:
                 score += 0.4 * len(high_risk_counterparties) / len(counterparty_countries)
                 evidence.append(f"Transactions with high-risk countries: {list(high_risk_counterparties)}")
         
-        return RiskFactor(
-            "geographic",
-            min(score, 1.0),
-            0.10,
-            "Geographic risk based on jurisdictions involved",
-            evidence
-        )
-    
-    def _calculate_structural_risk(self, profile: AccountProfile, account_id: str) -> RiskFactor:
-        """Calculate structural risk indicators for shell companies"""
-        evidence = []
-        score = 0.0
-        
-        # Check entity type
-        if profile.entity_type == EntityType.SHELL_COMPANY:
+        # Check if the account itself is on a sanctions list
+        if self._check_sanctions_list(profile.account_id):
             score += 0.8
-            evidence.append("Identified as shell company")
-        elif profile.entity_type == EntityType.OFFSHORE_ENTITY:
-            score += 0.6
-            evidence.append("Identified as offshore entity")
-        
-        # Account ID pattern analysis for shell company indicators
-        shell_patterns = ['LLC', 'LTD', 'INC', 'CORP', 'HOLDING', 'INVEST', 'CAPITAL']
-        if any(pattern in account_id.upper() for pattern in shell_patterns):
-            score += 0.3
-            evidence.append("Account name suggests corporate structure")
-        
-        # Check for minimal transaction history (shell companies often have sparse activity)
-        if profile.transaction_count < 10 and profile.total_outflow > 100000:
-            score += 0.4
-            evidence.append("High-value, low-frequency transaction pattern")
-        
-        # Check for pass-through behavior (similar inflow and outflow)
-        if profile.total_inflow > 0 and profile.total_outflow > 0:
-            ratio = min(profile.total_inflow, profile.total_outflow) / max(profile.total_inflow, profile.total_outflow)
-            if ratio > 0.9:
-                score += 0.5
-                evidence.append("Pass-through transaction pattern detected")
-        
-        return RiskFactor(
-            "structural",
-            min(score, 1.0),
-            0.15,
-            "Structural indicators of shell companies and pass-through entities",
-            evidence
-        )
-    
-    def _calculate_temporal_risk(self, transactions: pd.DataFrame) -> RiskFactor:
-        """Calculate temporal risk patterns"""
-        if transactions.empty:
-            return RiskFactor("temporal", 0.0, 0.10, "No transactions", [])
-        
-        evidence = []
-        score = 0.0
-        
-        # Convert timestamps
-        transactions['datetime'] = pd.to_datetime(transactions.get('timestamp', 0), unit='s', errors='coerce')
-        transactions['hour'] = transactions['datetime'].dt.hour
-        transactions['weekday'] = transactions['datetime'].dt.weekday
-        
-        # Unusual time patterns
-        night_transactions = np.sum((transactions['hour'] >= 22) | (transactions['hour'] <= 6))
-        if night_transactions / len(transactions) > 0.3:
-            score += 0.3
-            evidence.append(f"High percentage of night transactions: {night_transactions/len(transactions)*100:.1f}%")
-        
-        # Weekend activity
-        weekend_transactions = np.sum(transactions['weekday'] >= 5)
-        if weekend_transactions / len(transactions) > 0.4:
-            score += 0.2
-            evidence.append(f"High weekend activity: {weekend_transactions/len(transactions)*100:.1f}%")
-        
-        # Rapid sequences
-        time_diffs = transactions['datetime'].diff().dt.total_seconds()
-        rapid_sequences = np.sum(time_diffs < 60)  # Transactions within 1 minute
-        if rapid_sequences > 10:
-            score += 0.4
-            evidence.append(f"Rapid transaction sequences detected: {rapid_sequences}")
-        
-        # Regular patterns (may indicate automated activity)
-        if len(transactions) > 50:
-            hourly_variance = np.var(np.bincount(transactions['hour'], minlength=24))
-            if hourly_variance < 2:  # Very regular timing
-                score += 0.3
-                evidence.append("Highly regular transaction timing pattern")
+            evidence.append(f"Account matches sanctions list: {self._listed_names(profile.account_id, SANCTIONS)}")
         
         return RiskFactor(
-            "temporal",
+            "geographic",
             min(score, 1.0),
             0.10,
-            "Temporal patterns in transaction timing",
+            "Geographic risk based on jurisdictions involved",
             evidence
         )
     
-    def _calculate_counterparty_risk(self, account_id: str, transactions: pd.DataFrame) -> RiskFactor:
+    def _calculate_counterparty_risk(self, account_id: str, transactions: AccountTimeline) -> RiskFactor:
         """Calculate counterparty risk"""
-        if transactions.empty:
+        if not transactions:
             return RiskFactor("counterparty", 0.0, 0.15, "No transactions", [])
         
         evidence = []
         score = 0.0
         
         # Get unique counterparties
-        counterparties = transactions['other_party'].unique()
+        counterparties = transactions.counterparties()
         
         # Check for high-risk counterparties
         high_risk_counterparties = []
@@ -526,10 +476,9 @@ class AdvancedRiskScorer:
             evidence.append(f"Transactions with potential shell companies: {len(high_risk_counterparties)}")
         
         # Check for cryptocurrency exchanges
-        crypto_indicators = ['EXCHANGE', 'CRYPTO', 'BTC', 'ETH', 'COIN']
         crypto_counterparties = [
             party for party in counterparties 
-            if any(indicator in party.upper() for indicator in crypto_indicators)
+            if self._is_crypto_counterparty(party)
         ]
         
         if crypto_counterparties:
@@ -541,6 +490,17 @@ class AdvancedRiskScorer:
             score += 0.3
             evidence.append("High transaction concentration with few counterparties")
         
+        # Check counterparties against sanctions and PEP lists
+        sanctioned_counterparties = [party for party in counterparties if self._check_sanctions_list(party)]
+        if sanctioned_counterparties:
+            score += 0.6
+            evidence.append(f"Transactions with sanctioned counterparties: {sanctioned_counterparties[:10]}")
+        
+        pep_counterparties = [party for party in counterparties if self._is_listed_pep(party)]
+        if pep_counterparties:
+            score += 0.2
+            evidence.append(f"Transactions with listed PEP counterparties: {pep_counterparties[:10]}")
+        
         return RiskFactor(
             "counterparty",
             min(score, 1.0),
@@ -562,45 +522,24 @@ class AdvancedRiskScorer:
     
     # Helper methods
     def _extract_country_code(self, account_id: str) -> str:
-        """Extract country code from account ID"""
-        # Simple pattern matching - in real implementation, use a proper mapping
-        if len(account_id) >= 2:
-            return account_id[:2].upper()
-        return "XX"
+        """Extract country code from account ID (memoized shared tagging rules)"""
+        return tag_account(account_id).country_code
     
     def _classify_entity_type(self, account_id: str) -> EntityType:
-        """Classify entity type based on account patterns"""
-        account_upper = account_id.upper()
-        
-        if any(pattern in account_upper for pattern in ['SHELL', 'HOLDING', 'SPV']):
-            return EntityType.SHELL_COMPANY
-        elif any(pattern in account_upper for pattern in ['OFFSHORE', 'BVI', 'CAYMAN']):
-            return EntityType.OFFSHORE_ENTITY
-        elif any(pattern in account_upper for pattern in ['BANK', 'CREDIT', 'FINANCE']):
-            return EntityType.FINANCIAL_INSTITUTION
-        elif any(pattern in account_upper for pattern in ['CORP', 'LLC', 'LTD', 'INC']):
-            return EntityType.CORPORATE
-        elif any(pattern in account_upper for pattern in ['EXCHANGE', 'CRYPTO', 'COIN']):
-            return EntityType.CRYPTOCURRENCY_EXCHANGE
-        else:
-            return EntityType.INDIVIDUAL
+        """Classify entity type based on account patterns (memoized shared tagging rules)"""
+        return tag_account(account_id).entity_type
     
-    def _get_transaction_statistics(self, account_id: str) -> Dict:
-        """Get transaction statistics for an account"""
+    def _get_transaction_statistics(self, transactions: AccountTimeline) -> Dict:
+        """Get transaction statistics from an account's recent transactions"""
         try:
-            transactions = self.db_provider.get_account_history(account_id, limit=1000)
-            
-            if transactions.empty:
+            if not transactions:
                 return {"total_inflow": 0, "total_outflow": 0, "transaction_count": 0, "unique_counterparties": 0}
             
-            inflow = transactions[transactions['direction'] == 'incoming']['amount'].sum()
-            outflow = transactions[transactions['direction'] == 'outgoing']['amount'].sum()
-            
             return {
-                "total_inflow": float(inflow),
-                "total_outflow": float(outflow),
+                "total_inflow": transactions.total_inflow,
+                "total_outflow": transactions.total_outflow,
                 "transaction_count": len(transactions),
-                "unique_counterparties": transactions['other_party'].nunique()
+                "unique_counterparties": int(len(np.unique(transactions.counterparty)))
             }
         except Exception as e:
             logger.error(f"Error getting transaction statistics: {e}")
@@ -608,50 +547,256 @@ class AdvancedRiskScorer:
     
     def _check_pep_status(self, account_id: str) -> bool:
         """Check if account belongs to a Politically Exposed Person"""
-        # In real implementation, check against PEP database
-        pep_indicators = ['MINISTER', 'SENATOR', 'MAYOR', 'GOVERNOR', 'AMBASSADOR']
-        return any(indicator in account_id.upper() for indicator in pep_indicators)
+        return has_keyword(account_id, PEP_INDICATORS) or self._is_listed_pep(account_id)
+    
+    def _is_listed_pep(self, account_id: str) -> bool:
+        """Check if account matches the PEP list"""
+        return self.screening is not None and self.screening.is_listed(account_id, PEP)
     
     def _check_sanctions_list(self, account_id: str) -> bool:
         """Check if account is on sanctions list"""
-        # In real implementation, check against OFAC/UN sanctions lists
-        return False
+        return self.screening is not None and self.screening.is_listed(account_id, SANCTIONS)
+    
+    def _listed_names(self, account_id: str, list_type: str) -> List[str]:
+        """Listed names matched by the account on one list"""
+        return [match.listed_name for match in self.screening.screen(account_id) if match.list_type == list_type]
     
     def _is_potential_shell_company(self, account_id: str) -> bool:
         """Check if account shows shell company characteristics"""
-        shell_indicators = ['SHELL', 'HOLDING', 'SPV', 'INVEST', 'CAPITAL', 'MANAGEMENT']
-        return any(indicator in account_id.upper() for indicator in shell_indicators)
+        return has_keyword(account_id, SHELL_INDICATORS)
+    
+    def _has_corporate_name(self, account_id: str) -> bool:
+        """Check if account name suggests a corporate structure"""
+        return has_keyword(account_id, CORPORATE_NAME)
     
-    def _build_money_flow_graph(self, account_id: str, max_depth: int) -> nx.DiGraph:
-        """Build a money flow graph starting from an account"""
-        # This would implement BFS/DFS to trace money flows
-        # Placeholder implementation
-        return nx.DiGraph()
+    def _is_crypto_counterparty(self, account_id: str) -> bool:
+        """Check if account looks like a cryptocurrency exchange"""
+        return has_keyword(account_id, CRYPTO_INDICATORS)
     
-    def _analyze_flow_patterns(self, flow_graph: nx.DiGraph) -> Dict:
+    def _build_money_flow_graph(self, account_id: str, max_depth: int, as_of: Optional[int] = None,
+                                context: Optional[AnalysisContext] = None) -> MoneyFlowGraph:
+        """Build a money flow graph with one batched query per depth level"""
+        if context is not None:
+            return context.get(f'flow_graph:{max_depth}',
+                               lambda: self._build_money_flow_graph(account_id, max_depth, as_of))
+        
+        supernodes = set()
+        flow_graph = build_money_flow_graph(
+            account_id,
+            lambda frontier: self.db_provider.fetch_outgoing_edges(
+                frontier, supernodes=supernodes, as_of=as_of
+            ),
+            max_depth=max_depth
+        )
+        flow_graph.supernodes = sorted(supernodes)
+        return flow_graph
+    
+    def _analyze_flow_patterns(self, flow_graph: MoneyFlowGraph) -> Dict:
         """Analyze patterns in money flow graph"""
-        return {"placeholder": "flow_analysis"}
+        if flow_graph.num_edges == 0:
+            return {"total_accounts": flow_graph.num_nodes, "total_transactions": 0, "total_volume": 0.0}
+        
+        out_degree = flow_graph.out_degree()
+        in_degree = flow_graph.in_degree()
+        inflow = flow_graph.inflow()
+        edge_depth = flow_graph.depth[flow_graph.src] + 1
+        
+        # Volume moved at each hop distance from the source
+        depth_volume = np.bincount(edge_depth, weights=flow_graph.amount)
+        depth_accounts = np.bincount(flow_graph.depth)
+        
+        # Accounts that received funds but did not pass any on within the traced graph
+        terminal = np.flatnonzero((out_degree == 0) & (in_degree > 0))
+        top_terminal = terminal[np.argsort(inflow[terminal])[::-1][:10]]
+        
+        return {
+            "total_accounts": flow_graph.num_nodes,
+            "total_transactions": flow_graph.num_edges,
+            "total_volume": float(flow_graph.amount.sum()),
+            "max_depth_reached": int(flow_graph.depth.max()),
+            "levels_queried": flow_graph.levels_queried,
+            "truncated": flow_graph.truncated,
+            "supernodes": flow_graph.supernodes,
+            "by_depth": [
+                {
+                    "depth": depth,
+                    "accounts": int(depth_accounts[depth]) if depth < len(depth_accounts) else 0,
+                    "volume": float(depth_volume[depth])
+                }
+                for depth in range(1, len(depth_volume))
+            ],
+            "max_fan_out": int(out_degree.max()),
+            "max_fan_in": int(in_degree.max()),
+            "terminal_accounts": [
+                {"account_id": flow_graph.nodes[i], "amount_received": float(inflow[i])}
+                for i in top_terminal
+            ],
+            "transaction_types": {
+                name: float(flow_graph.amount[flow_graph.edge_type == code].sum())
+                for code, name in enumerate(flow_graph.type_names)
+            }
+        }
     
-    def _detect_suspicious_patterns(self, flow_graph: nx.DiGraph) -> List[Dict]:
+    def _detect_suspicious_patterns(self, flow_graph: MoneyFlowGraph) -> List[Dict]:
         """Detect suspicious patterns in money flow"""
-        return []
+        patterns = []
+        if flow_graph.num_edges == 0:
+            return patterns
+        
+        nodes = flow_graph.nodes
+        out_degree = flow_graph.out_degree()
+        in_degree = flow_graph.in_degree()
+        inflow = flow_graph.inflow()
+        outflow = flow_graph.outflow()
+        
+        # Funds returning to the source, or to accounts closer to it than the sender
+        to_source = np.flatnonzero(flow_graph.dst == 0)
+        if len(to_source):
+            patterns.append({
+                "pattern_type": "circular_flow",
+                "accounts_involved": sorted({nodes[i] for i in flow_graph.src[to_source]})[:20],
+                "edge_count": int(len(to_source)),
+                "volume": float(flow_graph.amount[to_source].sum()),
+                "risk_score": 0.8
+            })
+        back_edges = np.flatnonzero(
+            (flow_graph.depth[flow_graph.dst] < flow_graph.depth[flow_graph.src]) & (flow_graph.dst != 0)
+        )
+        if len(back_edges):
+            patterns.append({
+                "pattern_type": "back_flow",
+                "accounts_involved": sorted({nodes[i] for i in flow_graph.dst[back_edges]})[:20],
+                "edge_count": int(len(back_edges)),
+                "volume": float(flow_graph.amount[back_edges].sum()),
+                "risk_score": 0.5
+            })
+        
+        # Distribution (smurfing) and aggregation points
+        for i in np.flatnonzero(out_degree >= 5):
+            patterns.append({
+                "pattern_type": "fan_out",
+                "accounts_involved": [nodes[i]],
+                "counterparties": int(out_degree[i]),
+                "volume": float(outflow[i]),
+                "risk_score": min(0.3 + 0.05 * int(out_degree[i]), 0.9)
+            })
+        for i in np.flatnonzero(in_degree >= 5):
+            patterns.append({
+                "pattern_type": "fan_in",
+                "accounts_involved": [nodes[i]],
+                "counterparties": int(in_degree[i]),
+                "volume": float(inflow[i]),
+                "risk_score": min(0.3 + 0.05 * int(in_degree[i]), 0.9)
+            })
+        
+        # Pass-through accounts forwarding almost everything they receive
+        intermediaries = np.flatnonzero((inflow > 0) & (outflow > 0))
+        ratio = np.minimum(inflow[intermediaries], outflow[intermediaries]) / np.maximum(
+            inflow[intermediaries], outflow[intermediaries])
+        for i in intermediaries[ratio > 0.9]:
+            patterns.append({
+                "pattern_type": "pass_through",
+                "accounts_involved": [nodes[i]],
+                "volume": float(inflow[i]),
+                "risk_score": 0.6
+            })
+        
+        # Structuring: repeated hop amounts just below reporting thresholds
+        amounts = flow_graph.amount
+        for threshold in (10000, 5000, 3000):
+            near = np.flatnonzero((amounts >= threshold * 0.9) & (amounts < threshold))
+            if len(near) > 3:
+                patterns.append({
+                    "pattern_type": "structuring",
+                    "accounts_involved": sorted({nodes[i] for i in flow_graph.src[near]})[:20],
+                    "transactions": int(len(near)),
+                    "threshold": threshold,
+                    "risk_score": 0.7
+                })
+        
+        return patterns
     
-    def _analyze_entities_in_flow(self, flow_graph: nx.DiGraph) -> Dict:
+    def _analyze_entities_in_flow(self, flow_graph: MoneyFlowGraph) -> Dict:
         """Analyze entities involved in money flow"""
-        return {"placeholder": "entity_analysis"}
+        entity_types = [self._classify_entity_type(node).value for node in flow_graph.nodes]
+        inflow = flow_graph.inflow()
+        
+        by_type = defaultdict(lambda: {"count": 0, "volume_received": 0.0})
+        for i, entity_type in enumerate(entity_types):
+            by_type[entity_type]["count"] += 1
+            by_type[entity_type]["volume_received"] += float(inflow[i])
+        
+        flagged_types = {EntityType.SHELL_COMPANY.value, EntityType.OFFSHORE_ENTITY.value,
+                         EntityType.CRYPTOCURRENCY_EXCHANGE.value}
+        return {
+            "entity_breakdown": dict(by_type),
+            "high_risk_entities": [
+                {"account_id": node, "entity_type": entity_type, "depth": int(flow_graph.depth[i])}
+                for i, (node, entity_type) in enumerate(zip(flow_graph.nodes, entity_types))
+                if entity_type in flagged_types
+            ][:50]
+        }
     
-    def _analyze_geographic_flow(self, flow_graph: nx.DiGraph) -> Dict:
+    def _analyze_geographic_flow(self, flow_graph: MoneyFlowGraph) -> Dict:
         """Analyze geographic patterns in money flow"""
-        return {"placeholder": "geographic_analysis"}
+        countries = [self._extract_country_code(node) for node in flow_graph.nodes]
+        if flow_graph.num_edges == 0:
+            return {"countries_involved": sorted(set(countries)), "cross_border_volume": 0.0}
+        
+        country_codes = np.asarray(countries)
+        src_country = country_codes[flow_graph.src]
+        dst_country = country_codes[flow_graph.dst]
+        cross_border = src_country != dst_country
+        offshore_dst = np.isin(dst_country, list(self.offshore_countries))
+        high_risk_dst = np.isin(dst_country, list(self.high_risk_countries))
+        
+        corridors = defaultdict(float)
+        for origin, destination, value in zip(src_country[cross_border], dst_country[cross_border],
+                                              flow_graph.amount[cross_border]):
+            corridors[f"{origin}->{destination}"] += float(value)
+        top_corridors = sorted(corridors.items(), key=lambda item: item[1], reverse=True)[:10]
+        
+        return {
+            "countries_involved": sorted(set(countries)),
+            "cross_border_volume": float(flow_graph.amount[cross_border].sum()),
+            "offshore_volume": float(flow_graph.amount[offshore_dst].sum()),
+            "high_risk_jurisdiction_volume": float(flow_graph.amount[high_risk_dst].sum()),
+            "top_corridors": [{"corridor": corridor, "volume": volume} for corridor, volume in top_corridors]
+        }
     
-    def _find_complex_cycles(self, account_id: str) -> List[Dict]:
+    def _find_complex_cycles(self, account_id: str, as_of: Optional[int] = None) -> List[Dict]:
         """Find complex cycles and layering patterns"""
         return []
     
-    def _detect_layering_patterns(self, account_id: str) -> List[Dict]:
+    def _detect_layering_patterns(self, account_id: str, as_of: Optional[int] = None) -> List[Dict]:
         """Detect layering patterns"""
         return []
     
     def _assess_layering_risk(self, cycles: List, patterns: List) -> Dict:
         """Assess risk from layering schemes"""
         return {"risk_level": "LOW", "confidence": 0.0}
+
+
+# Analytics tasks: module-level so worker processes of the analytics pool can import them
+_analysis_scorer: Optional[AdvancedRiskScorer] = None
+
+
+def analyze_money_flow(flow_graph: MoneyFlowGraph) -> Dict:
+    """Flow, pattern, entity and geographic analyses of a money flow graph"""
+    global _analysis_scorer
+    if _analysis_scorer is None:
+        # The analyses only use the tagging rules, never the database
+        _analysis_scorer = AdvancedRiskScorer(None)
+    
+    return {
+        "flow_analysis": _analysis_scorer._analyze_flow_patterns(flow_graph),
+        "suspicious_patterns": _analysis_scorer._detect_suspicious_patterns(flow_graph),
+        "entity_analysis": _analysis_scorer._analyze_entities_in_flow(flow_graph),
+        "geographic_analysis": _analysis_scorer._analyze_geographic_flow(flow_graph)
+    }
+
+
+def summarize_fund_attribution(flow_graph: MoneyFlowGraph, max_hops: int, method: str,
+                               target: Optional[str] = None) -> Dict:
+    """Attribute the source's funds over the flow graph and summarize where they ended"""
+    return attribute_flow(flow_graph, max_hops=max_hops, method=method).summary(target=target)
@@ -0,0 +1,86 @@
+"""
+Analysis Context
+Per-request memo of the data sets fetched while analysing one account, so the
+risk factors, money flow tracking, layering detection and centrality metrics
+of a single report each trigger a fetch at most once, also when those stages
+run concurrently.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisContext:
+    """Lazily fetched data for one account (as of one point in time) within one request"""
+
+    def __init__(self, account_id: str, as_of: Optional[int] = None):
+        self.account_id = account_id
+        self.as_of = as_of
+        self._lock = threading.Lock()
+        self._values: Dict[str, Future] = {}
+        self._fetched: List[str] = []
+        self._reused: Dict[str, int] = {}
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the value stored under key, calling loader the first time only"""
+        with self._lock:
+            value = self._values.get(key)
+            loading = value is None
+            if loading:
+                value = self._values[key] = Future()
+                self._fetched.append(key)
+            else:
+                self._reused[key] = self._reused.get(key, 0) + 1
+
+        # Concurrent callers wait for the first caller's fetch instead of repeating it
+        if loading:
+            try:
+                value.set_result(loader())
+            except Exception as e:
+                value.set_exception(e)
+        return value.result()
+
+    def get_stats(self) -> Dict:
+        """Which data sets were fetched, and how often each was served again from the context"""
+        with self._lock:
+            return {
+                "fetched": list(self._fetched),
+                "reused": dict(self._reused),
+                "fetches_saved": sum(self._reused.values())
+            }
+
+
+def run_stages(executor: Executor, stages: Dict[str, Callable[[], Any]],
+               timeout: float) -> Tuple[Dict[str, Any], Dict[str, Dict]]:
+    """
+    Run independent stages on the executor, waiting at most timeout seconds for
+    each. A stage that fails or overruns yields None (an overrunning stage keeps
+    its worker until it finishes). Returns the results and each stage's status.
+    """
+    def timed(stage):
+        stage_started = time.monotonic()
+        return stage(), time.monotonic() - stage_started
+
+    started = time.monotonic()
+    futures = {name: executor.submit(timed, stage) for name, stage in stages.items()}
+
+    results: Dict[str, Any] = {}
+    statuses: Dict[str, Dict] = {}
+    for name, future in futures.items():
+        results[name] = None
+        try:
+            results[name], elapsed = future.result(timeout=max(started + timeout - time.monotonic(), 0))
+            statuses[name] = {"status": "ok", "elapsed_ms": round(elapsed * 1000, 1)}
+        except FutureTimeoutError:
+            future.cancel()
+            statuses[name] = {"status": "timeout", "elapsed_ms": None}
+            logger.warning(f"Analysis stage {name} exceeded {timeout}s")
+        except Exception as e:
+            statuses[name] = {"status": "error", "elapsed_ms": None}
+            logger.error(f"Analysis stage {name} failed: {e}")
+    return results, statuses
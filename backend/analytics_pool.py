@@ -0,0 +1,124 @@
+"""
+Analytics Process Pool
+Runs CPU-bound analytics in worker processes so a heavy analysis does not hold
+the GIL of the Flask worker serving other requests. Tasks take array payloads
+(such as a MoneyFlowGraph), wait at most a per-task timeout, and are admitted
+only while the queue has room; queue depth and outcomes are reported by
+get_stats.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsPoolFullError(RuntimeError):
+    """The pool's queue is full; the caller should retry later"""
+
+
+class AnalyticsTimeoutError(TimeoutError):
+    """A task did not finish within its timeout"""
+
+
+class AnalyticsPool:
+    """Bounded process pool for analytics tasks with timeouts, cancellation and queue metrics"""
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 32, default_timeout: float = 15.0,
+                 start_method: str = 'spawn'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self._start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counts = {"completed": 0, "failed": 0, "timed_out": 0, "cancelled": 0, "rejected": 0}
+        self._task_seconds = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Workers are spawned on first use, not when the app module is imported;
+        # spawn avoids forking a process that already runs threads and connections
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self._start_method)
+            )
+        return self._executor
+
+    def submit(self, function: Callable, *args) -> Future:
+        """Queue function(*args) on a worker; raises AnalyticsPoolFullError when the queue is full"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._counts["rejected"] += 1
+                raise AnalyticsPoolFullError("Analytics pool is busy")
+            self._in_flight += 1
+            future = self._pool().submit(function, *args)
+
+        submitted = time.monotonic()
+
+        def finished(done: Future):
+            with self._lock:
+                self._in_flight -= 1
+                if done.cancelled():
+                    self._counts["cancelled"] += 1
+                elif done.exception() is not None:
+                    self._counts["failed"] += 1
+                else:
+                    self._counts["completed"] += 1
+                    self._task_seconds += time.monotonic() - submitted
+
+        future.add_done_callback(finished)
+        return future
+
+    def run(self, function: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run function(*args) on a worker and return its result. After the timeout
+        a queued task is cancelled; one already running finishes in the
+        background and its result is dropped.
+        """
+        future = self.submit(function, *args)
+        try:
+            return future.result(timeout=self.default_timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self._counts["timed_out"] += 1
+            raise AnalyticsTimeoutError(f"{getattr(function, '__name__', 'task')} exceeded its timeout")
+
+    def get_stats(self) -> Dict:
+        """Return queue depth and task outcome counts"""
+        with self._lock:
+            running = min(self._in_flight, self.max_workers)
+            completed = self._counts["completed"]
+            return {
+                "workers": self.max_workers,
+                "running": running,
+                "queued": self._in_flight - running,
+                "queue_capacity": self.max_queue,
+                **self._counts,
+                "avg_task_ms": round(self._task_seconds / completed * 1000, 1) if completed else 0.0
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_analytics(pool: Optional[AnalyticsPool], function: Callable, *args) -> Any:
+    """
+    Run function(*args) on the pool, or inline when there is no pool or its queue
+    is full. AnalyticsTimeoutError is left to the caller.
+    """
+    if pool is not None:
+        try:
+            return pool.run(function, *args)
+        except AnalyticsPoolFullError:
+            logger.warning(f"Analytics pool busy; running {getattr(function, '__name__', 'task')} inline")
+    return function(*args)
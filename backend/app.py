@@ -1,5 +1,6 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import wraps
 from flask import Flask, request, jsonify
@@ -8,19 +9,35 @@ import werkzeug.utils
 import pandas as pd
 
 from config import Config, config_by_name
-from ml_models import model_provider
-from graph_db import db_provider
 from utils import process_uploaded_csv, process_uploaded_pdf
 from validation import (
     validate_transaction_data, 
     sanitize_transaction_data,
     clean_account_id,
     validate_pagination_params,
+    validate_cursor_params,
+    validate_time_range,
+    validate_as_of,
     SecurityError,
     require_valid_json,
     validate_request_size
 )
-from advanced_risk_scorer import AdvancedRiskScorer
+from advanced_risk_scorer import AdvancedRiskScorer, HISTORY_LIMIT
+from analysis_context import AnalysisContext, run_stages
+from analytics_pool import AnalyticsPool, AnalyticsTimeoutError
+from structuring_detector import StructuringDetector
+from sketches import NeighbourSketchStore
+from timeline_store import TimelineStore
+from activity_features import ActivityFeatureStore
+from risk_maintenance import RiskScoreMaintainer
+from leaderboard import RiskLeaderboard
+from screening import ScreeningEngine
+from risk_rules import RuleEngine
+from case_store import CaseStore, CASE_STATUSES, CASE_SORTS, SORT_BY_SCORE
+from path_finder import RANK_BY_TOTAL, RANK_MODES
+from flow_attribution import ATTRIBUTION_PROPORTIONAL, ATTRIBUTION_METHODS
+from pagination import fetch_page, iter_pages, wants_ndjson, ndjson_response
+from partitioned_analytics import load_cycle_summary
 
 # Configure logging
 logging.basicConfig(
@@ -36,13 +53,6 @@ CORS(app)
 env = os.environ.get('FLASK_ENV', 'development')
 app.config.from_object(config_by_name.get(env, config_by_name['default']))
 
-# Setup upload folder
-if not os.path.exists(app.config['UPLOAD_FOLDER']):
-    os.makedirs(app.config['UPLOAD_FOLDER'])
-
-# Initialize advanced risk scorer
-risk_scorer = AdvancedRiskScorer(db_provider)
-
 # Validation helpers
 def validate_json_request(required_fields=None):
     """Decorator to validate JSON requests"""
@@ -105,16 +115,134 @@ def handle_database_errors(f):
             }), 500
     return decorated_function
 
-# Initialize database constraints with error handling
-try:
-    with app.app_context():
-        if db_provider.graph:
-            db_provider.setup_constraints()
-            logger.info("Database constraints setup completed")
-        else:
-            logger.warning("Database connection not available during startup")
-except Exception as e:
-    logger.error(f"Failed to setup database constraints: {str(e)}")
+# Services shared by the request handlers, created by init_services()
+model_provider = None
+db_provider = None
+analytics_pool = None
+risk_scorer = None
+analysis_executor = None
+structuring_detector = None
+neighbour_sketches = None
+timeline_store = None
+activity_features = None
+screening_engine = None
+risk_maintainer = None
+risk_leaderboard = None
+case_store = None
+
+
+def init_services():
+    """Connect to the database, build the in-memory services and warm them from stored transactions"""
+    global model_provider, db_provider, analytics_pool, risk_scorer, analysis_executor
+    global structuring_detector, neighbour_sketches, timeline_store, activity_features
+    global screening_engine, risk_maintainer, risk_leaderboard, case_store
+    from ml_models import model_provider
+    from graph_db import db_provider
+    
+    # Setup upload folder
+    if not os.path.exists(app.config['UPLOAD_FOLDER']):
+        os.makedirs(app.config['UPLOAD_FOLDER'])
+
+    # Process pool for CPU-bound analytics, so heavy analyses do not stall other requests
+    analytics_pool = AnalyticsPool(
+        max_workers=Config.ANALYTICS_POOL_WORKERS,
+        max_queue=Config.ANALYTICS_POOL_MAX_QUEUE,
+        default_timeout=Config.ANALYTICS_TASK_TIMEOUT_SECONDS
+    ) if Config.ANALYTICS_POOL_WORKERS > 0 else None
+    db_provider.analytics_pool = analytics_pool
+
+    # Initialize advanced risk scorer
+    risk_scorer = AdvancedRiskScorer(
+        db_provider,
+        analytics_pool=analytics_pool,
+        risk_rules=RuleEngine(Config.RISK_RULES_PATH, reload_check_seconds=Config.RISK_RULES_RELOAD_CHECK_SECONDS)
+    )
+
+    # Bounded pool for the independent stages of comprehensive analysis
+    analysis_executor = ThreadPoolExecutor(max_workers=Config.ANALYSIS_MAX_WORKERS, thread_name_prefix='analysis')
+
+    # Initialize streaming detectors fed by every committed ingestion batch
+    structuring_detector = StructuringDetector(window_seconds=Config.STRUCTURING_WINDOW_SECONDS)
+    db_provider.add_ingestion_listener(structuring_detector.ingest_dataframe)
+
+    neighbour_sketches = NeighbourSketchStore(precision=Config.SKETCH_PRECISION)
+    db_provider.add_ingestion_listener(neighbour_sketches.ingest_dataframe)
+    db_provider.neighbour_sketches = neighbour_sketches
+
+    timeline_store = TimelineStore()
+    db_provider.add_ingestion_listener(timeline_store.ingest_dataframe)
+    risk_scorer.timeline_store = timeline_store
+
+    # Velocity and temporal features of the same transaction window, updated per transaction
+    activity_features = ActivityFeatureStore(window=HISTORY_LIMIT)
+    db_provider.add_ingestion_listener(activity_features.ingest_dataframe)
+    risk_scorer.feature_store = activity_features
+
+    # Sanctions and PEP list screening used by the geographic and counterparty factors
+    screening_engine = ScreeningEngine(
+        Config.SANCTIONS_LIST_PATH,
+        Config.PEP_LIST_PATH,
+        max_distance=Config.SCREENING_MAX_DISTANCE,
+        reload_check_seconds=Config.SCREENING_RELOAD_CHECK_SECONDS
+    )
+    risk_scorer.screening = screening_engine
+
+    # Keeps stored risk scores current for accounts touched by ingestion
+    risk_maintainer = RiskScoreMaintainer(
+        risk_scorer,
+        db_provider,
+        debounce_seconds=Config.RISK_MAINTENANCE_DEBOUNCE_SECONDS,
+        max_delay_seconds=Config.RISK_MAINTENANCE_MAX_DELAY_SECONDS,
+        batch_size=Config.RISK_MAINTENANCE_BATCH_SIZE
+    ) if Config.RISK_MAINTENANCE_ENABLED else None
+
+    # Accounts at or above the case threshold, updated on every risk score write
+    risk_leaderboard = RiskLeaderboard(
+        capacity=Config.LEADERBOARD_CAPACITY,
+        min_score=Config.CASE_MIN_RISK_SCORE,
+        loader=lambda: db_provider.get_scored_accounts(
+            min_score=Config.CASE_MIN_RISK_SCORE, limit=Config.LEADERBOARD_CAPACITY
+        ),
+        resync_seconds=Config.LEADERBOARD_RESYNC_SECONDS
+    )
+    db_provider.add_risk_score_listener(risk_leaderboard.update_scores)
+
+    # Investigation cases, opened and rescored by the same score writes
+    case_store = CaseStore(Config.CASE_STORE_PATH, min_score=Config.CASE_MIN_RISK_SCORE)
+    db_provider.add_risk_score_listener(case_store.upsert_scores)
+    
+    # Initialize database constraints with error handling
+    try:
+        with app.app_context():
+            if db_provider.graph:
+                db_provider.setup_constraints()
+                logger.info("Database constraints setup completed")
+                db_provider.backfill_account_tags()
+                db_provider.refresh_supernodes()
+                
+                # Rebuild ingestion-fed state (detectors, sketches) from stored transactions
+                db_provider.replay_ingestion()
+                logger.info(f"Structuring detector warmed: {structuring_detector.get_stats()}")
+                logger.info(f"Neighbour sketches warmed: {neighbour_sketches.get_stats()}")
+                logger.info(f"Timeline store warmed: {timeline_store.get_stats()}")
+                logger.info(f"Activity features warmed: {activity_features.get_stats()}")
+                
+                # Registered after the replay, so only new transactions mark accounts dirty
+                # (stored scores of existing accounts come from the nightly portfolio job)
+                if risk_maintainer:
+                    db_provider.add_ingestion_listener(risk_maintainer.ingest_dataframe)
+                    risk_maintainer.start()
+                risk_leaderboard.rebuild()
+            else:
+                logger.warning("Database connection not available during startup")
+    except Exception as e:
+        logger.error(f"Failed to setup database constraints: {str(e)}")
+
+
+# Spawned analytics pool workers run this module again as __mp_main__ when it is
+# the entry script; only the serving process loads models, connects and starts the services
+if __name__ != '__mp_main__':
+    init_services()
 
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
@@ -126,6 +254,12 @@ def health_check():
             "status": "healthy",
             "message": "Backend is running",
             "database": db_status,
+            "analytics_pool": analytics_pool.get_stats() if analytics_pool else None,
+            "risk_maintenance": risk_maintainer.get_stats() if risk_maintainer else None,
+            "risk_leaderboard": risk_leaderboard.get_stats(),
+            "screening": screening_engine.get_stats(),
+            "risk_rules": risk_scorer.risk_rules.get_stats(),
+            "activity_features": activity_features.get_stats(),
             "timestamp": datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -170,6 +304,11 @@ def handle_realtime_transaction():
             "timestamp": datetime.utcnow().isoformat()
         }
         
+        # Structuring alerts are maintained at ingestion, so they are ready here
+        structuring_alert = structuring_detector.get_alert(sanitized_data.get('nameOrig'))
+        if structuring_alert:
+            response["structuring_alert"] = structuring_alert
+        
         logger.info(f"Processed transaction {response['transaction_id']}")
         return jsonify(response), 201
         
@@ -306,10 +445,14 @@ def get_graph():
         except SecurityError as e:
             return jsonify({"error": str(e)}), 400
         
-        # Get pagination parameters
+        # Get pagination parameters and time window
         limit, _ = validate_pagination_params(request.args)
+        try:
+            since, until = validate_time_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        graph_data = db_provider.get_transaction_graph(clean_id, limit=limit)
+        graph_data = db_provider.get_transaction_graph(clean_id, limit=limit, since=since, until=until)
         
         if not graph_data.get("nodes"):
             return jsonify({
@@ -362,8 +505,13 @@ def get_account_summary(account_id):
         if not account_id.strip():
             return jsonify({"error": "Invalid account_id"}), 400
         
+        try:
+            since, until = validate_time_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Fetch transaction history
-        history_df = db_provider.get_account_history(account_id)
+        history_df = db_provider.get_account_history(account_id, since=since, until=until)
         if history_df is None or history_df.empty:
             return jsonify({
                 "summary": "No transaction history found for this account"
@@ -392,10 +540,18 @@ def get_account_summary(account_id):
 def find_cycles_endpoint():
     """Find cycles in the transaction graph"""
     try:
-        nodes_in_cycles = db_provider.find_all_cycles()
+        try:
+            as_of = validate_as_of(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        supernodes = set()
+        nodes_in_cycles = db_provider.find_all_cycles(supernodes=supernodes, as_of=as_of)
         return jsonify({
             "nodes": nodes_in_cycles,
             "count": len(nodes_in_cycles),
+            "as_of": as_of,
+            "supernodes_excluded_from_traversal": sorted(supernodes),
             "timestamp": datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -407,10 +563,25 @@ def find_cycles_endpoint():
 def find_high_risk_endpoint():
     """Find high-risk nodes in the graph"""
     try:
-        high_risk_nodes = db_provider.find_high_risk_nodes()
+        try:
+            since, until = validate_time_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+        
+        # Stored scores: the leaderboard holds the top accounts; a time range
+        # restricts them to accounts active in it, which needs the graph
+        if since is None and until is None:
+            high_risk_nodes = risk_leaderboard.top(limit)
+        else:
+            high_risk_nodes = db_provider.find_high_risk_nodes(
+                min_score=Config.CASE_MIN_RISK_SCORE, since=since, until=until, limit=limit
+            )
         return jsonify({
             "nodes": high_risk_nodes,
             "count": len(high_risk_nodes),
+            "min_score": Config.CASE_MIN_RISK_SCORE,
+            "time_range": {"since": since, "until": until},
             "timestamp": datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
@@ -423,11 +594,23 @@ def find_high_risk_endpoint():
 def get_global_dashboard():
     """Get global dashboard statistics"""
     try:
+        # Cycles come from the latest partitioned run, else from a periodic graph count
+        summary = load_cycle_summary(Config.PARTITIONED_ANALYTICS_WORK_DIR)
+        if summary is not None:
+            cycle_count = summary['cycle_accounts']
+            cycle_source = {"source": "partitioned_run", "computed_at": summary['computed_at'],
+                            "parameters": summary['parameters'], "truncated": summary['truncated']}
+        else:
+            cycle_count, computed_at = db_provider.count_cycle_accounts(Config.DASHBOARD_CYCLES_MAX_AGE_SECONDS)
+            cycle_source = {"source": "graph", "computed_at": computed_at}
+        
         stats = {
             "total_accounts": db_provider.get_total_accounts(),
             "total_transactions": db_provider.get_total_transactions(),
-            "high_risk_accounts": len(db_provider.find_high_risk_nodes()),
-            "suspicious_cycles": len(db_provider.find_all_cycles()),
+            "high_risk_accounts": risk_leaderboard.count(),
+            "cases": case_store.count_by_status(),
+            "suspicious_cycles": cycle_count,
+            "suspicious_cycles_source": cycle_source,
             "timestamp": datetime.utcnow().isoformat()
         }
         return jsonify(stats), 200
@@ -436,38 +619,70 @@ def get_global_dashboard():
         return jsonify({"error": "Failed to fetch dashboard data"}), 500
 
 @app.route('/api/cases', methods=['GET'])
-@handle_database_errors
 def get_cases():
-    """Get case management data"""
+    """Get one page of stored cases, optionally filtered by status or assignee"""
     try:
-        high_risk_nodes = db_provider.find_high_risk_nodes()
-        limit = request.args.get('limit', 20, type=int)
+        status = request.args.get('status') or None
+        assignee = request.args.get('assignee') or None
+        sort = request.args.get('sort', SORT_BY_SCORE)
+        if status is not None and status not in CASE_STATUSES:
+            return jsonify({"error": f"status must be one of {list(CASE_STATUSES)}"}), 400
+        if sort not in CASE_SORTS:
+            return jsonify({"error": f"sort must be one of {list(CASE_SORTS)}"}), 400
+        try:
+            limit, after = validate_cursor_params(request.args, default_limit=20)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        cases = []
-        for node in high_risk_nodes[:limit]:
-            try:
-                account_id = node.get('account_id', 'Unknown')
-                risk_score = node.get('risk_score', 0)
-                cases.append({
-                    "case_id": f"CASE-{account_id}",
-                    "account_id": account_id,
-                    "risk_score": risk_score,
-                    "status": "Open" if risk_score > 0.7 else "Under Review",
-                    "created_date": datetime.utcnow().strftime("%Y-%m-%d")
-                })
-            except Exception as e:
-                logger.warning(f"Error processing case for node {node}: {str(e)}")
-                continue
+        def fetch(page_limit, page_after):
+            return case_store.list_cases(page_limit, page_after, status=status, assignee=assignee, sort=sort)
+        
+        cases, next_cursor = fetch_page(fetch, limit, after)
         
         return jsonify({
             "cases": cases,
             "total_cases": len(cases),
+            "next_cursor": next_cursor,
+            "status_counts": case_store.count_by_status(),
             "timestamp": datetime.utcnow().isoformat()
         }), 200
     except Exception as e:
         logger.error(f"Error fetching cases: {str(e)}")
         return jsonify({"error": "Failed to fetch cases"}), 500
 
+@app.route('/api/cases/<case_id>', methods=['GET'])
+def get_case(case_id):
+    """Get a single stored case"""
+    try:
+        case = case_store.get_case(case_id)
+        if case is None:
+            return jsonify({"error": "Case not found"}), 404
+        return jsonify(case), 200
+    except Exception as e:
+        logger.error(f"Error fetching case {case_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch case"}), 500
+
+@app.route('/api/cases/<case_id>', methods=['PATCH'])
+@require_valid_json
+def update_case(case_id):
+    """Change a case's status and/or assignee"""
+    try:
+        data = request.get_json()
+        status = data.get('status')
+        assignee = data.get('assignee')
+        if status is not None and status not in CASE_STATUSES:
+            return jsonify({"error": f"status must be one of {list(CASE_STATUSES)}"}), 400
+        if assignee is not None and not isinstance(assignee, str):
+            return jsonify({"error": "assignee must be a string"}), 400
+        
+        case = case_store.update_case(case_id, status=status, assignee=assignee)
+        if case is None:
+            return jsonify({"error": "Case not found"}), 404
+        return jsonify(case), 200
+    except Exception as e:
+        logger.error(f"Error updating case {case_id}: {str(e)}")
+        return jsonify({"error": "Failed to update case"}), 500
+
 @app.route('/api/trace-investigate', methods=['GET', 'POST'])
 @handle_database_errors
 def trace_investigate():
@@ -495,8 +710,27 @@ def trace_investigate():
             if not account_id:
                 return jsonify({"error": "account_id is required"}), 400
             
+            # Search options: highest-value paths first, bounded by depth and top_k
+            try:
+                max_depth = min(max(int(data.get('max_depth', 5)), 1), 10)
+                top_k = min(max(int(data.get('top_k', 50)), 1), 500)
+                min_amount = max(float(data.get('min_amount', 0)), 0.0)
+            except (ValueError, TypeError):
+                return jsonify({"error": "max_depth, top_k and min_amount must be numeric"}), 400
+            try:
+                as_of = validate_as_of(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            rank_by = data.get('rank_by', RANK_BY_TOTAL)
+            if rank_by not in RANK_MODES:
+                return jsonify({"error": f"rank_by must be one of {list(RANK_MODES)}"}), 400
+            
             # Get transaction path
-            trace_data = db_provider.get_transaction_path(account_id)
+            supernodes = set()
+            trace_data = db_provider.get_transaction_path(
+                account_id, max_depth=max_depth, top_k=top_k,
+                min_amount=min_amount, rank_by=rank_by, supernodes=supernodes, as_of=as_of
+            )
             if not trace_data:
                 return jsonify({
                     "error": "No trace data found for this account"
@@ -506,6 +740,15 @@ def trace_investigate():
                 "account_id": account_id,
                 "trace_length": len(trace_data),
                 "trace_data": trace_data,
+                "supernodes": sorted(supernodes),
+                "search_parameters": {
+                    "max_depth": max_depth,
+                    "top_k": top_k,
+                    "min_amount": min_amount,
+                    "rank_by": rank_by,
+                    "as_of": as_of,
+                    "supernode_policy": Config.SUPERNODE_POLICY
+                },
                 "message": "Trace analysis complete",
                 "timestamp": datetime.utcnow().isoformat()
             }
@@ -526,11 +769,12 @@ def get_advanced_risk_score(account_id):
         # Clean and validate account ID
         try:
             clean_id = clean_account_id(account_id)
-        except SecurityError as e:
+            as_of = validate_as_of(request.args)
+        except (SecurityError, ValueError) as e:
             return jsonify({"error": str(e)}), 400
         
         # Calculate comprehensive risk score
-        risk_analysis = risk_scorer.calculate_comprehensive_risk_score(clean_id)
+        risk_analysis = risk_scorer.calculate_comprehensive_risk_score(clean_id, as_of=as_of)
         
         if "error" in risk_analysis:
             return jsonify(risk_analysis), 500
@@ -542,6 +786,82 @@ def get_advanced_risk_score(account_id):
         logger.error(f"Error calculating advanced risk score: {str(e)}")
         return jsonify({"error": "Risk analysis failed"}), 500
 
+@app.route('/api/batch-risk-score', methods=['POST'])
+@require_valid_json
+@validate_request_size(max_size=1024*1024)
+@handle_database_errors
+def get_batch_risk_scores():
+    """Score many accounts in one request with column-wise risk factors"""
+    try:
+        data = request.get_json()
+        account_ids = data.get('account_ids')
+        if not isinstance(account_ids, list) or not account_ids:
+            return jsonify({"error": "account_ids must be a non-empty list"}), 400
+        if len(account_ids) > Config.BATCH_SCORING_MAX_ACCOUNTS:
+            return jsonify({"error": f"At most {Config.BATCH_SCORING_MAX_ACCOUNTS} accounts per request"}), 400
+        
+        try:
+            clean_ids = list(dict.fromkeys(clean_account_id(str(account_id)) for account_id in account_ids))
+            as_of = validate_as_of(data)
+        except (SecurityError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        scores = risk_scorer.calculate_batch_risk_scores(clean_ids, as_of=as_of)
+        
+        logger.info(f"Generated batch risk scores for {len(clean_ids)} accounts")
+        return jsonify({
+            "scores": scores,
+            "account_count": len(scores),
+            "as_of": as_of,
+            "timestamp": datetime.utcnow().isoformat()
+        }), 200
+        
+    except ConnectionError as e:
+        logger.error(f"Error reading transactions for batch risk scores: {str(e)}")
+        return jsonify({"error": "Database connection unavailable. Please try again later."}), 503
+    except Exception as e:
+        logger.error(f"Error calculating batch risk scores: {str(e)}")
+        return jsonify({"error": "Batch risk analysis failed"}), 500
+
+@app.route('/api/screening', methods=['POST'])
+@require_valid_json
+@validate_request_size(max_size=1024*1024)
+@handle_database_errors
+def screen_names():
+    """Screen names, or an account and all its counterparties, against sanctions and PEP lists"""
+    try:
+        data = request.get_json()
+        names = data.get('names', [])
+        if not isinstance(names, list):
+            return jsonify({"error": "names must be a list"}), 400
+        names = [str(name) for name in names]
+        
+        account_id = data.get('account_id')
+        if account_id is not None:
+            try:
+                clean_id = clean_account_id(str(account_id))
+                as_of = validate_as_of(data)
+            except (SecurityError, ValueError) as e:
+                return jsonify({"error": str(e)}), 400
+            names = [clean_id] + risk_scorer.get_counterparties(clean_id, as_of) + names
+        
+        if not names:
+            return jsonify({"error": "Provide names or account_id"}), 400
+        if len(names) > Config.SCREENING_MAX_NAMES:
+            return jsonify({"error": f"At most {Config.SCREENING_MAX_NAMES} names per request"}), 400
+        
+        matches = screening_engine.screen_many(names)
+        return jsonify({
+            "matches": {name: [match.as_dict() for match in found] for name, found in matches.items()},
+            "screened_count": len(set(names)),
+            "match_count": len(matches),
+            "timestamp": datetime.utcnow().isoformat()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error screening names: {str(e)}")
+        return jsonify({"error": "Screening failed"}), 500
+
 @app.route('/api/money-flow-tracking/<string:account_id>', methods=['GET'])
 @handle_database_errors
 def track_money_flow(account_id):
@@ -550,7 +870,8 @@ def track_money_flow(account_id):
         # Clean and validate account ID
         try:
             clean_id = clean_account_id(account_id)
-        except SecurityError as e:
+            as_of = validate_as_of(request.args)
+        except (SecurityError, ValueError) as e:
             return jsonify({"error": str(e)}), 400
         
         # Get parameters
@@ -558,7 +879,7 @@ def track_money_flow(account_id):
         max_depth = min(max_depth, 10)  # Limit to prevent excessive queries
         
         # Track money flow
-        flow_analysis = risk_scorer.track_money_flow(clean_id, max_depth)
+        flow_analysis = risk_scorer.track_money_flow(clean_id, max_depth, as_of=as_of)
         
         if "error" in flow_analysis:
             return jsonify(flow_analysis), 500
@@ -566,10 +887,51 @@ def track_money_flow(account_id):
         logger.info(f"Tracked money flow for account {clean_id}")
         return jsonify(flow_analysis), 200
         
+    except AnalyticsTimeoutError as e:
+        logger.warning(f"{e}")
+        return jsonify({"error": "Analysis timed out. Please try again later or reduce the depth."}), 504
     except Exception as e:
         logger.error(f"Error tracking money flow: {str(e)}")
         return jsonify({"error": "Money flow tracking failed"}), 500
 
+@app.route('/api/fund-attribution/<string:account_id>', methods=['GET'])
+@handle_database_errors
+def trace_fund_attribution(account_id):
+    """Attribute an account's outgoing funds to the accounts they ended at"""
+    try:
+        # Clean and validate account ID
+        try:
+            clean_id = clean_account_id(account_id)
+            target = request.args.get('target')
+            clean_target = clean_account_id(target) if target else None
+            as_of = validate_as_of(request.args)
+        except (SecurityError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Get parameters
+        max_hops = request.args.get('max_hops', 5, type=int)
+        max_hops = min(max(max_hops, 1), 10)  # Limit to prevent excessive queries
+        method = request.args.get('method', ATTRIBUTION_PROPORTIONAL)
+        if method not in ATTRIBUTION_METHODS:
+            return jsonify({"error": f"method must be one of {list(ATTRIBUTION_METHODS)}"}), 400
+        
+        attribution = risk_scorer.trace_fund_attribution(
+            clean_id, max_hops, method, clean_target, as_of=as_of
+        )
+        
+        if "error" in attribution:
+            return jsonify(attribution), 500
+        
+        logger.info(f"Attributed fund flow for account {clean_id}")
+        return jsonify(attribution), 200
+        
+    except AnalyticsTimeoutError as e:
+        logger.warning(f"{e}")
+        return jsonify({"error": "Analysis timed out. Please try again later or reduce the depth."}), 504
+    except Exception as e:
+        logger.error(f"Error attributing fund flow: {str(e)}")
+        return jsonify({"error": "Fund attribution failed"}), 500
+
 @app.route('/api/layering-detection/<string:account_id>', methods=['GET'])
 @handle_database_errors
 def detect_layering_schemes(account_id):
@@ -578,11 +940,12 @@ def detect_layering_schemes(account_id):
         # Clean and validate account ID
         try:
             clean_id = clean_account_id(account_id)
-        except SecurityError as e:
+            as_of = validate_as_of(request.args)
+        except (SecurityError, ValueError) as e:
             return jsonify({"error": str(e)}), 400
         
         # Detect layering schemes
-        layering_analysis = risk_scorer.detect_layering_schemes(clean_id)
+        layering_analysis = risk_scorer.detect_layering_schemes(clean_id, as_of=as_of)
         
         if "error" in layering_analysis:
             return jsonify(layering_analysis), 500
@@ -606,23 +969,45 @@ def find_circular_transactions():
         # Validate parameters
         min_amount = max(min_amount, 1000)  # Minimum $1000
         max_cycle_length = min(max_cycle_length, 10)  # Maximum 10 hops
+        try:
+            limit, after = validate_cursor_params(request.args, default_limit=50)
+            as_of = validate_as_of(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Find circular transactions; a stream does not report the supernodes excluded from traversal
+        supernodes = None if wants_ndjson(request) else set()
+        def fetch(page_limit, page_after):
+            return db_provider.detect_circular_transactions(
+                min_amount, max_cycle_length, limit=page_limit, after=page_after, as_of=as_of,
+                supernodes=supernodes
+            )
         
-        # Find circular transactions
-        cycles = db_provider.detect_circular_transactions(min_amount, max_cycle_length)
+        if supernodes is None:
+            return ndjson_response(iter_pages(fetch, limit, after))
+        
+        cycles, next_cursor = fetch_page(fetch, limit, after)
         
         response = {
             "total_cycles": len(cycles),
             "cycles": cycles,
+            "next_cursor": next_cursor,
             "search_parameters": {
                 "min_amount": min_amount,
-                "max_cycle_length": max_cycle_length
+                "max_cycle_length": max_cycle_length,
+                "as_of": as_of,
+                "supernode_threshold": Config.SUPERNODE_DEGREE_THRESHOLD
             },
+            "supernodes_excluded_from_traversal": sorted(supernodes),
             "timestamp": datetime.utcnow().isoformat()
         }
         
         logger.info(f"Found {len(cycles)} circular transaction patterns")
         return jsonify(response), 200
         
+    except AnalyticsTimeoutError as e:
+        logger.warning(f"{e}")
+        return jsonify({"error": "Analysis timed out. Please try again later or reduce max_cycle_length."}), 504
     except Exception as e:
         logger.error(f"Error finding circular transactions: {str(e)}")
         return jsonify({"error": "Circular transaction detection failed"}), 500
@@ -632,12 +1017,26 @@ def find_circular_transactions():
 def find_shell_company_networks():
     """Identify potential shell company networks"""
     try:
+        try:
+            limit, after = validate_cursor_params(request.args, default_limit=100)
+            as_of = validate_as_of(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Find shell company networks
-        networks = db_provider.find_shell_company_networks()
+        def fetch(page_limit, page_after):
+            return db_provider.find_shell_company_networks(limit=page_limit, after=page_after, as_of=as_of)
+        
+        if wants_ndjson(request):
+            return ndjson_response(iter_pages(fetch, limit, after))
+        
+        networks, next_cursor = fetch_page(fetch, limit, after)
         
         response = {
             "total_networks": len(networks),
             "networks": networks,
+            "next_cursor": next_cursor,
+            "as_of": as_of,
             "analysis": {
                 "high_risk_networks": [n for n in networks if len(n.get('shell_indicators', [])) >= 2],
                 "total_flow_volume": sum(n.get('total_flow', 0) for n in networks),
@@ -665,9 +1064,32 @@ def analyze_cash_patterns():
         # Get parameters
         min_cash_amount = request.args.get('min_amount', 10000, type=float)
         min_cash_amount = max(min_cash_amount, 1000)  # Minimum $1000
+        try:
+            limit, after = validate_cursor_params(request.args, default_limit=50)
+            since, until = validate_time_range(request.args)
+            if after and (isinstance(after[0], bool) or not isinstance(after[0], (int, float))
+                          or not isinstance(after[1], str)):
+                raise ValueError("Invalid cursor")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # The detector only holds operations from window_start onwards
+        window_start = structuring_detector.window_start
+        if window_start is not None and any(t is not None and t < window_start for t in (since, until)):
+            return jsonify({
+                "error": f"Range starts before the structuring window (window_start={window_start})"
+            }), 400
+        
+        # Read cash patterns from the streaming structuring detector
+        def fetch(page_limit, page_after):
+            return structuring_detector.get_patterns(
+                min_cash_amount, limit=page_limit, after=page_after, since=since, until=until
+            )
+        
+        if wants_ndjson(request):
+            return ndjson_response(iter_pages(fetch, limit, after))
         
-        # Analyze cash patterns
-        patterns = db_provider.analyze_cash_intensive_patterns(min_cash_amount)
+        patterns, next_cursor = fetch_page(fetch, limit, after)
         
         # Calculate aggregate statistics
         total_cash_volume = sum(p.get('total_cash_out', 0) + p.get('total_cash_in', 0) for p in patterns)
@@ -678,8 +1100,13 @@ def analyze_cash_patterns():
             "high_risk_patterns": len(high_risk_patterns),
             "total_cash_volume": total_cash_volume,
             "patterns": patterns,
+            "next_cursor": next_cursor,
             "search_parameters": {
-                "min_cash_amount": min_cash_amount
+                "min_cash_amount": min_cash_amount,
+                "window_seconds": structuring_detector.window_seconds,
+                "window_start": window_start,
+                "since": since,
+                "until": until
             },
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -696,8 +1123,22 @@ def analyze_cash_patterns():
 def find_offshore_patterns():
     """Find patterns involving offshore accounts and jurisdictions"""
     try:
+        try:
+            limit, after = validate_cursor_params(request.args, default_limit=100)
+            as_of = validate_as_of(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Find offshore patterns
-        patterns = db_provider.find_offshore_connection_patterns()
+        def fetch(page_limit, page_after):
+            return db_provider.find_offshore_connection_patterns(
+                limit=page_limit, after=page_after, as_of=as_of
+            )
+        
+        if wants_ndjson(request):
+            return ndjson_response(iter_pages(fetch, limit, after))
+        
+        patterns, next_cursor = fetch_page(fetch, limit, after)
         
         # Analyze patterns
         total_offshore_volume = sum(p.get('amount', 0) for p in patterns)
@@ -720,6 +1161,8 @@ def find_offshore_patterns():
                 for pattern_type, pattern_list in by_pattern_type.items()
             },
             "patterns": patterns,
+            "next_cursor": next_cursor,
+            "as_of": as_of,
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -738,11 +1181,12 @@ def get_network_centrality(account_id):
         # Clean and validate account ID
         try:
             clean_id = clean_account_id(account_id)
-        except SecurityError as e:
+            as_of = validate_as_of(request.args)
+        except (SecurityError, ValueError) as e:
             return jsonify({"error": str(e)}), 400
         
         # Calculate centrality metrics
-        centrality_metrics = db_provider.calculate_account_centrality_metrics(clean_id)
+        centrality_metrics = db_provider.calculate_account_centrality_metrics(clean_id, as_of=as_of)
         
         if not centrality_metrics:
             return jsonify({
@@ -750,6 +1194,7 @@ def get_network_centrality(account_id):
             }), 404
         
         # Add timestamp
+        centrality_metrics["as_of"] = as_of
         centrality_metrics["timestamp"] = datetime.utcnow().isoformat()
         
         logger.info(f"Calculated centrality metrics for account {clean_id}")
@@ -767,18 +1212,38 @@ def get_comprehensive_analysis(account_id):
         # Clean and validate account ID
         try:
             clean_id = clean_account_id(account_id)
-        except SecurityError as e:
+            as_of = validate_as_of(request.args)
+        except (SecurityError, ValueError) as e:
             return jsonify({"error": str(e)}), 400
         
-        # Perform comprehensive analysis
-        risk_analysis = risk_scorer.calculate_comprehensive_risk_score(clean_id)
-        money_flow = risk_scorer.track_money_flow(clean_id, max_depth=4)
-        layering_analysis = risk_scorer.detect_layering_schemes(clean_id)
-        centrality_metrics = db_provider.calculate_account_centrality_metrics(clean_id)
+        # Run the independent stages concurrently; they share one fetch of each data set
+        context = AnalysisContext(clean_id, as_of)
+        results, stages = run_stages(analysis_executor, {
+            "risk_analysis": lambda: risk_scorer.calculate_comprehensive_risk_score(
+                clean_id, as_of=as_of, context=context
+            ),
+            "money_flow_tracking": lambda: risk_scorer.track_money_flow(
+                clean_id, max_depth=4, as_of=as_of, context=context
+            ),
+            "layering_detection": lambda: risk_scorer.detect_layering_schemes(clean_id, context=context),
+            "network_centrality": lambda: risk_scorer.get_centrality_metrics(
+                clean_id, as_of=as_of, context=context
+            )
+        }, timeout=Config.ANALYSIS_STAGE_TIMEOUT_SECONDS)
+        
+        # A stage that failed or timed out leaves a partial report
+        for name, result in results.items():
+            if result is None:
+                results[name] = {"error": f"{name} {stages[name]['status']}"}
+        risk_analysis = results["risk_analysis"]
+        money_flow = results["money_flow_tracking"]
+        layering_analysis = results["layering_detection"]
+        centrality_metrics = results["network_centrality"]
         
         # Compile comprehensive report
         comprehensive_report = {
             "account_id": clean_id,
+            "as_of": as_of,
             "risk_analysis": risk_analysis,
             "money_flow_tracking": money_flow,
             "layering_detection": layering_analysis,
@@ -789,6 +1254,9 @@ def get_comprehensive_analysis(account_id):
                 "key_concerns": _extract_key_concerns(risk_analysis, money_flow, layering_analysis),
                 "recommended_actions": _generate_recommendations(risk_analysis)
             },
+            "stages": stages,
+            "partial": any(stage["status"] != "ok" for stage in stages.values()),
+            "data_access": context.get_stats(),
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -0,0 +1,482 @@
+"""
+Batch Risk Scoring
+Evaluates the per-account risk factors column-wise over a long transaction
+table holding many accounts, using grouped NumPy operations instead of one
+DataFrame and one NetworkX graph per account. The velocity, amount pattern,
+structural and temporal factors are the scorer's risk rules (risk_rules.py)
+applied to the feature columns computed here; the other factors mirror the
+per-account factors in AdvancedRiskScorer. Factor evidence is not built.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from account_tags import EntityType, SHELL_INDICATORS, CRYPTO_INDICATORS, account_keywords, keyword_bit
+from centrality import star_centrality, centrality_risk
+from timeline_store import AccountTimeline, SECONDS_PER_DAY
+from screening import SANCTIONS
+
+logger = logging.getLogger(__name__)
+
+STRUCTURING_THRESHOLDS = (10000, 5000, 3000)
+RAPID_SEQUENCE_SECONDS = 60
+# Time constants of the decayed transaction counts compared by burst_ratio
+BURST_SHORT_SECONDS = 3600
+BURST_LONG_SECONDS = SECONDS_PER_DAY
+EDGE_COLUMNS = ('orig', 'dest', 'amount', 'timestamp', 'by_orig', 'by_dest', 'orig_offsets', 'dest_offsets')
+HISTOGRAM_BINS = 50
+
+FACTOR_NAMES = (
+    'velocity', 'amount_pattern', 'network_centrality', 'geographic',
+    'structural', 'temporal', 'counterparty'
+)
+
+# Factors scored by the declarative risk rules, and the features the rules can test
+RULE_FACTORS = ('velocity', 'amount_pattern', 'structural', 'temporal')
+RULE_FEATURES = (
+    'transaction_count', 'avg_daily_transactions', 'max_daily_transactions', 'active_days',
+    *(f'near_threshold_{threshold}' for threshold in STRUCTURING_THRESHOLDS),
+    'round_amount_ratio', 'amount_mean', 'amount_variance', 'largest_amount_bin',
+    'is_shell_company', 'is_offshore_entity', 'has_corporate_name',
+    'total_inflow', 'total_outflow', 'pass_through_ratio',
+    'night_ratio', 'weekend_ratio', 'rapid_sequences', 'hourly_variance',
+    'min_inter_arrival', 'burst_ratio',
+)
+
+
+@dataclass
+class EdgeTable:
+    """
+    Exported transaction edges with account ids coded in sorted order. Edge
+    positions are also kept grouped by sender and by receiver (CSR offsets), so
+    the edges of any contiguous account range are two slices.
+    """
+    account_ids: np.ndarray     # str, sorted
+    orig: np.ndarray            # int64 code of the sender
+    dest: np.ndarray            # int64 code of the receiver
+    amount: np.ndarray          # float64
+    timestamp: np.ndarray       # int64
+    by_orig: np.ndarray         # edge positions grouped by sender code
+    by_dest: np.ndarray         # edge positions grouped by receiver code
+    orig_offsets: np.ndarray    # by_orig[orig_offsets[c]:orig_offsets[c + 1]] are c's outgoing edges
+    dest_offsets: np.ndarray
+
+    @property
+    def num_accounts(self) -> int:
+        return len(self.account_ids)
+
+    @classmethod
+    def from_frames(cls, frames: Iterable[pd.DataFrame]) -> 'EdgeTable':
+        """Build from canonical transaction batches (nameOrig, nameDest, amount, step)"""
+        frames = [frame for frame in frames if frame is not None and not frame.empty]
+        if not frames:
+            edges = pd.DataFrame(columns=['nameOrig', 'nameDest', 'amount', 'step'])
+        else:
+            edges = pd.concat(frames, ignore_index=True)
+
+        names = pd.concat([edges['nameOrig'], edges['nameDest']], ignore_index=True).astype(str)
+        codes, account_ids = pd.factorize(names, sort=True)
+        orig, dest = codes[:len(edges)].astype(np.int64), codes[len(edges):].astype(np.int64)
+
+        by_orig = np.argsort(orig, kind='stable')
+        by_dest = np.argsort(dest, kind='stable')
+        bounds = np.arange(len(account_ids) + 1)
+        return cls(
+            account_ids=np.asarray(account_ids, dtype=str),
+            orig=orig,
+            dest=dest,
+            amount=edges['amount'].fillna(0).to_numpy(dtype=np.float64),
+            timestamp=edges['step'].fillna(0).to_numpy(dtype=np.int64),
+            by_orig=by_orig,
+            by_dest=by_dest,
+            orig_offsets=np.searchsorted(orig[by_orig], bounds),
+            dest_offsets=np.searchsorted(dest[by_dest], bounds)
+        )
+
+    def save(self, directory: str):
+        """Write each column as a .npy file so worker processes can memory-map them"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'account_ids.npy'), self.account_ids)
+        for name in EDGE_COLUMNS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'EdgeTable':
+        columns = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ('account_ids',) + EDGE_COLUMNS
+        }
+        return cls(**columns)
+
+
+@dataclass
+class TransactionTable:
+    """Transactions of many accounts as parallel arrays grouped by account index"""
+    account_ids: List[str]
+    account: np.ndarray         # int64 index into account_ids
+    timestamp: np.ndarray       # int64
+    amount: np.ndarray          # float64
+    outgoing: np.ndarray        # bool
+    counterparty: np.ndarray    # int64 index into counterparty_ids
+    counterparty_ids: List[str]
+
+    @property
+    def num_accounts(self) -> int:
+        return len(self.account_ids)
+
+    @classmethod
+    def from_timelines(cls, timelines: List[AccountTimeline]) -> 'TransactionTable':
+        """Concatenate account timelines, re-coding counterparties into one dictionary"""
+        codes: Dict[str, int] = {}
+        counterparty_ids: List[str] = []
+        account, counterparty = [], []
+        for index, timeline in enumerate(timelines):
+            unique, inverse = np.unique(timeline.counterparty, return_inverse=True)
+            local = np.empty(len(unique), dtype=np.int64)
+            for i, code in enumerate(unique):
+                name = timeline.counterparty_ids[code]
+                if name not in codes:
+                    codes[name] = len(counterparty_ids)
+                    counterparty_ids.append(name)
+                local[i] = codes[name]
+            account.append(np.full(len(timeline), index, dtype=np.int64))
+            counterparty.append(local[inverse])
+
+        def concat(arrays, dtype):
+            return np.concatenate(arrays).astype(dtype, copy=False) if arrays else np.zeros(0, dtype=dtype)
+
+        return cls(
+            account_ids=[timeline.account_id for timeline in timelines],
+            account=concat(account, np.int64),
+            timestamp=concat([t.timestamp for t in timelines], np.int64),
+            amount=concat([t.amount for t in timelines], np.float64),
+            outgoing=concat([t.outgoing for t in timelines], bool),
+            counterparty=concat(counterparty, np.int64),
+            counterparty_ids=counterparty_ids
+        )
+
+    @classmethod
+    def from_edges(cls, edges: EdgeTable, start: int, stop: int,
+                   limit: Optional[int] = None) -> 'TransactionTable':
+        """
+        Both sides of every edge touching accounts start..stop-1 (by code),
+        keeping each account's latest limit transactions like the timelines do.
+        """
+        outgoing = np.asarray(edges.by_orig[edges.orig_offsets[start]:edges.orig_offsets[stop]])
+        incoming = np.asarray(edges.by_dest[edges.dest_offsets[start]:edges.dest_offsets[stop]])
+
+        account = np.concatenate([edges.orig[outgoing], edges.dest[incoming]]) - start
+        counterparty = np.concatenate([edges.dest[outgoing], edges.orig[incoming]])
+        rows = np.concatenate([outgoing, incoming])
+        is_outgoing = np.concatenate([np.ones(len(outgoing), dtype=bool), np.zeros(len(incoming), dtype=bool)])
+        timestamp = np.asarray(edges.timestamp[rows])
+
+        if limit is not None:
+            keep = _latest_mask(account, timestamp, stop - start, limit)
+            account, counterparty, rows, is_outgoing, timestamp = (
+                column[keep] for column in (account, counterparty, rows, is_outgoing, timestamp)
+            )
+
+        return cls(
+            account_ids=[str(account_id) for account_id in edges.account_ids[start:stop]],
+            account=account.astype(np.int64, copy=False),
+            timestamp=timestamp,
+            amount=np.asarray(edges.amount[rows]),
+            outgoing=is_outgoing,
+            counterparty=counterparty.astype(np.int64, copy=False),
+            counterparty_ids=edges.account_ids
+        )
+
+
+def _latest_mask(account: np.ndarray, timestamp: np.ndarray, size: int, limit: int) -> np.ndarray:
+    """Rows among each account's latest limit transactions (ties keep row order)"""
+    order = np.lexsort((timestamp, account))
+    ends = np.cumsum(np.bincount(account, minlength=size))
+    mask = np.zeros(len(account), dtype=bool)
+    mask[order] = ends[account[order]] - np.arange(len(order)) <= limit
+    return mask
+
+
+def _count(groups: np.ndarray, size: int, mask=None) -> np.ndarray:
+    if mask is not None:
+        groups = groups[mask]
+    return np.bincount(groups, minlength=size)
+
+
+def _distinct_pairs(groups: np.ndarray, values: np.ndarray, num_values: int):
+    """Distinct (group, value) pairs as two arrays"""
+    keys = np.unique(groups * max(num_values, 1) + values)
+    return keys // max(num_values, 1), keys % max(num_values, 1)
+
+
+def _flags(ids: List[str], predicate) -> np.ndarray:
+    return np.fromiter((predicate(value) for value in ids), dtype=bool, count=len(ids))
+
+
+def _lookup(ids, codes: np.ndarray, function, dtype) -> np.ndarray:
+    """function(ids[code]) for each code, evaluated once per distinct code"""
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    values = np.fromiter((function(str(ids[code])) for code in distinct), dtype=dtype, count=len(distinct))
+    return values[inverse.reshape(-1)]
+
+
+def _velocity_features(table: TransactionTable, n: np.ndarray) -> Dict[str, np.ndarray]:
+    size = table.num_accounts
+    day = table.timestamp // SECONDS_PER_DAY
+    if len(day):
+        day = day - day.min()
+    span = int(day.max()) + 1 if len(day) else 1
+
+    # Transactions per (account, calendar day) pair, as the per-account factor groups them
+    keys, daily_counts = np.unique(table.account * span + day, return_counts=True)
+    day_groups = keys // span
+    days_active = _count(day_groups, size)
+    max_daily = np.zeros(size, dtype=np.int64)
+    np.maximum.at(max_daily, day_groups, daily_counts)
+
+    return {
+        "avg_daily_transactions": np.divide(n, days_active, out=np.zeros(size), where=days_active > 0),
+        "max_daily_transactions": max_daily,
+        "active_days": days_active,
+    }
+
+
+def _amount_features(table: TransactionTable, n: np.ndarray) -> Dict[str, np.ndarray]:
+    size = table.num_accounts
+    g, amounts = table.account, table.amount
+    features = {}
+
+    for threshold in STRUCTURING_THRESHOLDS:
+        features[f'near_threshold_{threshold}'] = _count(g, size, (amounts >= threshold * 0.9) & (amounts < threshold))
+
+    round_count = _count(g, size, amounts % 1000 == 0)
+    features['round_amount_ratio'] = np.divide(round_count, n, out=np.zeros(size), where=n > 0)
+
+    total = np.bincount(g, weights=amounts, minlength=size)
+    mean = np.divide(total, n, out=np.zeros(size), where=n > 0)
+    features['amount_mean'] = mean
+    features['amount_variance'] = np.divide(np.bincount(g, weights=(amounts - mean[g]) ** 2, minlength=size), n,
+                                            out=np.zeros(size), where=n > 0)
+
+    # Largest of 50 equal-width bins between each account's min and max amount
+    low = np.full(size, np.inf)
+    high = np.full(size, -np.inf)
+    np.minimum.at(low, g, amounts)
+    np.maximum.at(high, g, amounts)
+    width = high - low
+    flat = width[g] == 0
+    position = np.where(flat, 0.5, (amounts - low[g]) / np.where(flat, 1.0, width[g]))
+    bins = np.minimum((position * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    bin_counts = np.bincount(g * HISTOGRAM_BINS + bins, minlength=size * HISTOGRAM_BINS)
+    features['largest_amount_bin'] = bin_counts.reshape(size, HISTOGRAM_BINS).max(axis=1)
+
+    return features
+
+
+def _network_centrality(table: TransactionTable, network_limit: Optional[int] = None) -> np.ndarray:
+    """
+    Centrality risk of each account in its own star network (the account and its
+    direct counterparties over its latest network_limit transactions), with the
+    closed forms of centrality.star_centrality
+    """
+    size = table.num_accounts
+    num_cp = len(table.counterparty_ids)
+    account, counterparty, outgoing = table.account, table.counterparty, table.outgoing
+    if network_limit is not None:
+        latest = _latest_mask(account, table.timestamp, size, network_limit)
+        account, counterparty, outgoing = account[latest], counterparty[latest], outgoing[latest]
+
+    g_out, cp_out = _distinct_pairs(account[outgoing], counterparty[outgoing], num_cp)
+    g_in, cp_in = _distinct_pairs(account[~outgoing], counterparty[~outgoing], num_cp)
+    out_count = _count(g_out, size)
+    in_count = _count(g_in, size)
+
+    both_keys = np.intersect1d(g_out * max(num_cp, 1) + cp_out, g_in * max(num_cp, 1) + cp_in)
+    both_count = _count(both_keys // max(num_cp, 1), size)
+
+    return centrality_risk(*star_centrality(in_count, out_count, both_count))
+
+
+def _temporal_features(table: TransactionTable, n: np.ndarray) -> Dict[str, np.ndarray]:
+    size = table.num_accounts
+    g = table.account
+    hour = (table.timestamp // 3600) % 24
+    weekday = (table.timestamp // SECONDS_PER_DAY + 3) % 7
+
+    night = _count(g, size, (hour >= 22) | (hour <= 6))
+    weekend = _count(g, size, weekday >= 5)
+
+    # Gaps between consecutive transactions of the same account
+    order = np.lexsort((table.timestamp, g))
+    sorted_g = g[order]
+    gaps = np.diff(table.timestamp[order])
+    same = sorted_g[1:] == sorted_g[:-1]
+
+    min_gap = np.full(size, np.inf)
+    np.minimum.at(min_gap, sorted_g[1:][same], gaps[same])
+
+    # Variance of the 24 hourly counts from integer sums, as the streaming store keeps it
+    hourly = np.bincount(g * 24 + hour, minlength=size * 24).reshape(size, 24)
+    hourly_variance = (24 * (hourly ** 2).sum(axis=1) - n ** 2) / 576
+
+    # Decayed transaction counts at each account's latest transaction
+    latest = np.full(size, np.iinfo(np.int64).min)
+    np.maximum.at(latest, g, table.timestamp)
+    age = (latest[g] - table.timestamp).astype(np.float64)
+    short = np.bincount(g, weights=np.exp(-age / BURST_SHORT_SECONDS), minlength=size)
+    long = np.bincount(g, weights=np.exp(-age / BURST_LONG_SECONDS), minlength=size)
+
+    return {
+        "night_ratio": np.divide(night, n, out=np.zeros(size), where=n > 0),
+        "weekend_ratio": np.divide(weekend, n, out=np.zeros(size), where=n > 0),
+        "rapid_sequences": _count(sorted_g[1:], size, same & (gaps < RAPID_SEQUENCE_SECONDS)),
+        "hourly_variance": hourly_variance,
+        "min_inter_arrival": min_gap,
+        # Short-horizon over long-horizon decayed rate, 1 for steady activity
+        "burst_ratio": np.divide(short * (BURST_LONG_SECONDS / BURST_SHORT_SECONDS), long,
+                                 out=np.zeros(size), where=long > 0),
+    }
+
+
+def _geographic(table: TransactionTable, scorer, tags) -> np.ndarray:
+    size = table.num_accounts
+    score = (0.5 * np.isin(tags['country_code'], list(scorer.offshore_countries)) +
+             0.7 * np.isin(tags['country_code'], list(scorer.high_risk_countries)))
+
+    if len(table.account) == 0:
+        return score
+    countries, country_names = pd.factorize(
+        _lookup(table.counterparty_ids, table.counterparty, scorer._extract_country_code, object)
+    )
+    country_groups, country_codes = _distinct_pairs(table.account, countries, max(len(country_names), 1))
+    offshore = np.isin(np.asarray(country_names, dtype=object), list(scorer.offshore_countries))
+    high_risk = np.isin(np.asarray(country_names, dtype=object), list(scorer.high_risk_countries))
+
+    distinct = _count(country_groups, size)
+    score += 0.3 * np.divide(_count(country_groups, size, offshore[country_codes]), distinct,
+                             out=np.zeros(size), where=distinct > 0)
+    score += 0.4 * np.divide(_count(country_groups, size, high_risk[country_codes]), distinct,
+                             out=np.zeros(size), where=distinct > 0)
+    return score + _sanctioned_accounts(table, scorer)
+
+
+def _sanctioned_accounts(table: TransactionTable, scorer) -> np.ndarray:
+    if scorer.screening is None:
+        return np.zeros(table.num_accounts)
+    return 0.8 * scorer.screening.flags(table.account_ids, SANCTIONS)
+
+
+def _structural_features(table: TransactionTable, scorer, tags) -> Dict[str, np.ndarray]:
+    size = table.num_accounts
+    entity = tags['entity_type']
+    outflow = np.bincount(table.account, weights=np.where(table.outgoing, table.amount, 0.0), minlength=size)
+    inflow = np.bincount(table.account, weights=np.where(table.outgoing, 0.0, table.amount), minlength=size)
+
+    both = (inflow > 0) & (outflow > 0)
+    return {
+        "is_shell_company": entity == EntityType.SHELL_COMPANY.value,
+        "is_offshore_entity": entity == EntityType.OFFSHORE_ENTITY.value,
+        "has_corporate_name": _flags(table.account_ids, scorer._has_corporate_name),
+        "total_inflow": inflow,
+        "total_outflow": outflow,
+        "pass_through_ratio": np.divide(np.minimum(inflow, outflow), np.maximum(inflow, outflow),
+                                        out=np.zeros(size), where=both),
+    }
+
+
+def _counterparty(table: TransactionTable, scorer, n: np.ndarray) -> np.ndarray:
+    size = table.num_accounts
+    pair_groups, pair_cps = _distinct_pairs(table.account, table.counterparty, len(table.counterparty_ids))
+    # One keyword scan per distinct counterparty covers both lists
+    keywords = _lookup(table.counterparty_ids, pair_cps, lambda party: account_keywords(party).mask, np.int64)
+    shell = (keywords & keyword_bit(SHELL_INDICATORS)) != 0
+    crypto = (keywords & keyword_bit(CRYPTO_INDICATORS)) != 0
+
+    distinct = _count(pair_groups, size)
+    score = 0.4 * np.divide(_count(pair_groups, size, shell), distinct,
+                            out=np.zeros(size), where=distinct > 0)
+    score += 0.3 * (_count(pair_groups, size, crypto) > 0)
+    score += 0.3 * ((distinct < 5) & (n > 50))
+
+    if scorer.screening is not None and len(pair_cps):
+        # Each distinct counterparty is screened once against both lists
+        sanctioned = _lookup(table.counterparty_ids, pair_cps, scorer._check_sanctions_list, bool)
+        pep = _lookup(table.counterparty_ids, pair_cps, scorer._is_listed_pep, bool)
+        score += 0.6 * (_count(pair_groups, size, sanctioned) > 0)
+        score += 0.2 * (_count(pair_groups, size, pep) > 0)
+    return score
+
+
+def _table_tags(table: TransactionTable, scorer) -> Dict[str, np.ndarray]:
+    return {
+        "country_code": np.asarray([scorer._extract_country_code(a) for a in table.account_ids], dtype=object),
+        "entity_type": np.asarray([scorer._classify_entity_type(a).value for a in table.account_ids], dtype=object),
+    }
+
+
+def _activity_features(table: TransactionTable, n: np.ndarray,
+                       streamed: Optional[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Velocity and temporal features, read from the streaming store for the accounts it covers"""
+    if streamed is not None and streamed['present'].all():
+        return {name: column for name, column in streamed.items() if name != 'present'}
+
+    computed = {**_velocity_features(table, n), **_temporal_features(table, n)}
+    if streamed is None or not streamed['present'].any():
+        return computed
+    return {name: np.where(streamed['present'], streamed[name], column) for name, column in computed.items()}
+
+
+def rule_features(table: TransactionTable, scorer, tags: Optional[Dict] = None, n: Optional[np.ndarray] = None,
+                  streamed: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """
+    Every RULE_FEATURES column, one value per account in the table. streamed
+    holds velocity and temporal columns from the activity feature store
+    (ActivityFeatureStore.features), used where its `present` mask is set.
+    """
+    if n is None:
+        n = _count(table.account, table.num_accounts)
+    if tags is None:
+        tags = _table_tags(table, scorer)
+    return {
+        "transaction_count": n,
+        **_amount_features(table, n),
+        **_structural_features(table, scorer, tags),
+        **_activity_features(table, n, streamed),
+    }
+
+
+def score_table(table: TransactionTable, scorer, network_limit: Optional[int] = None,
+                streamed: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+    """
+    Score every account in the table. Returns one row per account (indexed by
+    account id) with each factor's score, the weighted risk_score and risk_level.
+    """
+    size = table.num_accounts
+    n = _count(table.account, size)
+    tags = _table_tags(table, scorer)
+    # One rule set for the whole table, even if the rule file is reloaded meanwhile
+    rules = scorer.risk_rules.current()
+
+    factors = rules.evaluate(rule_features(table, scorer, tags, n, streamed), size)
+    factors.update({
+        'network_centrality': _network_centrality(table, network_limit),
+        'geographic': _geographic(table, scorer, tags),
+        'counterparty': _counterparty(table, scorer, n),
+    })
+    scores = pd.DataFrame(
+        {name: np.minimum(factors[name], 1.0) for name in FACTOR_NAMES},
+        index=pd.Index(table.account_ids, name='account_id')
+    )
+
+    # Accounts without transactions score zero, as in the per-account scorer
+    scores.loc[n == 0, list(FACTOR_NAMES)] = 0.0
+    total = sum(scores[name] * rules.weight(name) for name in FACTOR_NAMES)
+    scores['risk_score'] = np.minimum(total, 1.0)
+    scores['risk_level'] = [scorer._determine_risk_level(score).value for score in scores['risk_score']]
+    scores['transaction_count'] = n
+    return scores
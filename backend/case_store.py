@@ -0,0 +1,191 @@
+"""
+Case Store
+Investigation cases persisted in an embedded SQLite database. The risk
+pipeline opens a case for every account whose stored score reaches the case
+threshold and keeps the case's score current; analysts change status and
+assignee. Listing is keyset-paginated over indexes on (status, score),
+(assignee, score), score and created time, so a page costs the same however
+many cases are open.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from batch_scoring import FACTOR_NAMES
+from pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+STATUS_OPEN = 'Open'
+STATUS_UNDER_REVIEW = 'Under Review'
+STATUS_CLOSED = 'Closed'
+CASE_STATUSES = (STATUS_OPEN, STATUS_UNDER_REVIEW, STATUS_CLOSED)
+
+SORT_BY_SCORE = 'risk_score'
+SORT_BY_CREATED = 'created_at'
+CASE_SORTS = (SORT_BY_SCORE, SORT_BY_CREATED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    assignee TEXT,
+    risk_score REAL NOT NULL,
+    risk_level TEXT,
+    factor_scores TEXT,
+    scored_at TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_by_score ON cases (risk_score DESC, id);
+CREATE INDEX IF NOT EXISTS cases_by_created ON cases (created_at DESC, id);
+CREATE INDEX IF NOT EXISTS cases_by_status ON cases (status, risk_score DESC, id);
+CREATE INDEX IF NOT EXISTS cases_by_status_created ON cases (status, created_at DESC, id);
+CREATE INDEX IF NOT EXISTS cases_by_assignee ON cases (assignee, risk_score DESC, id);
+"""
+
+
+def format_case_id(row_id: int) -> str:
+    return f"CASE-{row_id:06d}"
+
+
+def parse_case_id(case_id: str) -> Optional[int]:
+    """Row id of a CASE-000123 style id, or None if it is not one"""
+    prefix, _, number = case_id.partition('-')
+    return int(number) if prefix == 'CASE' and number.isdigit() else None
+
+
+class CaseStore:
+    """SQLite-backed case list fed by risk score writes"""
+
+    def __init__(self, path: str, min_score: float = 0.6):
+        self.path = path
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        # One connection shared by the app's threads, serialized by the lock;
+        # WAL lets the nightly job's process write while the app reads
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def upsert_scores(self, scores: pd.DataFrame, scored_at: Optional[str] = None) -> int:
+        """
+        Risk score write listener: open a case for each account at or above
+        min_score and refresh the score of every account that already has one.
+        Returns the number of cases opened.
+        """
+        if scores is None or scores.empty:
+            return 0
+
+        now = datetime.utcnow().isoformat()
+        factors = [name for name in FACTOR_NAMES if name in scores.columns]
+        rows = [
+            (
+                str(account_id), STATUS_OPEN, float(row['risk_score']), row.get('risk_level'),
+                json.dumps({name: float(row[name]) for name in factors}), scored_at, now, now
+            )
+            for account_id, row in zip(scores.index, scores.to_dict('records'))
+        ]
+        opening = [row for row in rows if row[2] >= self.min_score]
+
+        with self._lock:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO cases (account_id, status, risk_score, risk_level, factor_scores, "
+                "scored_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", opening
+            )
+            opened = self._connection.total_changes - before
+            self._connection.executemany(
+                "UPDATE cases SET risk_score = ?, risk_level = ?, factor_scores = ?, scored_at = ?, updated_at = ? "
+                "WHERE account_id = ?",
+                [(score, level, factor_json, scored, updated, account_id)
+                 for account_id, _, score, level, factor_json, scored, _, updated in rows]
+            )
+            self._connection.commit()
+        return opened
+
+    def list_cases(self, limit: int = 50, after: Optional[list] = None, status: Optional[str] = None,
+                   assignee: Optional[str] = None, sort: str = SORT_BY_SCORE) -> List[Dict]:
+        """
+        One page of cases, highest score (or newest) first, starting after the
+        sort key of a previous page's cursor; each row carries its own cursor
+        """
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if assignee is not None:
+            conditions.append("assignee = ?")
+            params.append(assignee)
+        if after is not None:
+            conditions.append(f"({sort} < ? OR ({sort} = ? AND id > ?))")
+            params.extend([after[0], after[0], after[1]])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT * FROM cases {where} ORDER BY {sort} DESC, id LIMIT ?"
+        with self._lock:
+            records = self._connection.execute(query, params + [limit]).fetchall()
+        return [self._to_case(record, sort) for record in records]
+
+    def get_case(self, case_id: str) -> Optional[Dict]:
+        row_id = parse_case_id(case_id)
+        if row_id is None:
+            return None
+        with self._lock:
+            record = self._connection.execute("SELECT * FROM cases WHERE id = ?", (row_id,)).fetchone()
+        return self._to_case(record) if record else None
+
+    def update_case(self, case_id: str, status: Optional[str] = None,
+                    assignee: Optional[str] = None) -> Optional[Dict]:
+        """Change a case's status and/or assignee; returns the updated case, or None if unknown"""
+        row_id = parse_case_id(case_id)
+        if row_id is None:
+            return None
+
+        changes = {"updated_at": datetime.utcnow().isoformat()}
+        if status is not None:
+            changes["status"] = status
+        if assignee is not None:
+            changes["assignee"] = assignee or None
+        assignments = ', '.join(f"{column} = ?" for column in changes)
+        with self._lock:
+            self._connection.execute(f"UPDATE cases SET {assignments} WHERE id = ?",
+                                     list(changes.values()) + [row_id])
+            self._connection.commit()
+        return self.get_case(case_id)
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            records = self._connection.execute("SELECT status, count(*) FROM cases GROUP BY status").fetchall()
+        counts = {status: 0 for status in CASE_STATUSES}
+        counts.update({status: count for status, count in records})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _to_case(self, record: sqlite3.Row, sort: str = SORT_BY_SCORE) -> Dict:
+        return {
+            "case_id": format_case_id(record['id']),
+            "account_id": record['account_id'],
+            "status": record['status'],
+            "assignee": record['assignee'],
+            "risk_score": record['risk_score'],
+            "risk_level": record['risk_level'],
+            "factor_scores": json.loads(record['factor_scores']) if record['factor_scores'] else {},
+            "scored_at": record['scored_at'],
+            "created_date": record['created_at'][:10],
+            "created_at": record['created_at'],
+            "updated_at": record['updated_at'],
+            "cursor": encode_cursor([record[sort], record['id']])
+        }
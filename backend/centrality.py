@@ -0,0 +1,70 @@
+"""
+Ego Network Centrality
+Betweenness, closeness and degree of an account in its own ego network: the
+account and its direct counterparties, every edge touching the account. On
+such a star they have closed forms, so no shortest paths are searched:
+betweenness counts in-neighbour to out-neighbour pairs (distinct nodes)
+routed through the account, closeness is the share of the other nodes that
+reach it in one hop, and degree is distinct in plus out neighbours. Values
+are normalized like networkx's betweenness_centrality and
+closeness_centrality (wf_improved) on a DiGraph. star_centrality and
+centrality_risk take columns, so the per-account and batch scorers share them.
+"""
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+# Network centrality risk: each value above its threshold adds its weight
+HIGH_BETWEENNESS = 0.1
+HIGH_CLOSENESS = 0.5
+HIGH_DEGREE = 20
+BETWEENNESS_WEIGHT = 0.4
+CLOSENESS_WEIGHT = 0.3
+DEGREE_WEIGHT = 0.3
+
+
+@dataclass
+class TargetCentrality:
+    """Centrality values of one node"""
+    betweenness: float
+    closeness: float
+    degree: int
+
+
+def star_centrality(in_count: np.ndarray, out_count: np.ndarray,
+                    both_count: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Betweenness, closeness and degree of star centres from their numbers of distinct
+    in-neighbours, out-neighbours and neighbours that are both
+    """
+    in_count, out_count, both_count = np.asarray(in_count), np.asarray(out_count), np.asarray(both_count)
+    nodes = in_count + out_count - both_count + 1
+    pairs = (nodes - 1) * (nodes - 2)
+    betweenness = np.divide(in_count * out_count - both_count, pairs,
+                            out=np.zeros(pairs.shape), where=pairs > 0)
+    closeness = np.divide(in_count, nodes - 1, out=np.zeros(nodes.shape), where=nodes > 1)
+    return betweenness, closeness, in_count + out_count
+
+
+def centrality_risk(betweenness: np.ndarray, closeness: np.ndarray, degree: np.ndarray) -> np.ndarray:
+    """Network centrality factor score (before capping) from the centrality columns"""
+    return (BETWEENNESS_WEIGHT * (np.asarray(betweenness) > HIGH_BETWEENNESS)
+            + CLOSENESS_WEIGHT * (np.asarray(closeness) > HIGH_CLOSENESS)
+            + DEGREE_WEIGHT * (np.asarray(degree) > HIGH_DEGREE))
+
+
+def ego_centrality(counterparty: np.ndarray, outgoing: np.ndarray) -> TargetCentrality:
+    """
+    Centrality of an account given its transactions' counterparties and directions;
+    parallel transactions count once
+    """
+    counterparty = np.asarray(counterparty)
+    outgoing = np.asarray(outgoing, dtype=bool)
+    out_neighbours = np.unique(counterparty[outgoing])
+    in_neighbours = np.unique(counterparty[~outgoing])
+    both = len(np.intersect1d(out_neighbours, in_neighbours, assume_unique=True))
+
+    betweenness, closeness, degree = star_centrality(len(in_neighbours), len(out_neighbours), both)
+    return TargetCentrality(float(betweenness), float(closeness), int(degree))
@@ -18,6 +18,67 @@ class Config:
     # API Configuration
     API_RATE_LIMIT = os.environ.get('API_RATE_LIMIT', '100 per hour')
     
+    # Streaming Detection Configuration
+    STRUCTURING_WINDOW_SECONDS = int(os.environ.get('STRUCTURING_WINDOW_SECONDS', 86400 * 7))
+    # HyperLogLog precision for neighbour sketches (relative error 1.04 / sqrt(2**p))
+    SKETCH_PRECISION = int(os.environ.get('SKETCH_PRECISION', 8))
+    
+    # Supernodes: accounts with at least this many transactions are not expanded
+    # by traversals ('terminal') or only have a sample of their edges followed ('sample')
+    SUPERNODE_DEGREE_THRESHOLD = int(os.environ.get('SUPERNODE_DEGREE_THRESHOLD', 1000))
+    SUPERNODE_POLICY = os.environ.get('SUPERNODE_POLICY', 'terminal')
+    
+    # Batch risk scoring: largest account list accepted per request
+    BATCH_SCORING_MAX_ACCOUNTS = int(os.environ.get('BATCH_SCORING_MAX_ACCOUNTS', 1000))
+    
+    # Process pool for CPU-bound flow analyses (0 workers runs them in the request thread)
+    ANALYTICS_POOL_WORKERS = int(os.environ.get('ANALYTICS_POOL_WORKERS', 2))
+    ANALYTICS_POOL_MAX_QUEUE = int(os.environ.get('ANALYTICS_POOL_MAX_QUEUE', 32))
+    ANALYTICS_TASK_TIMEOUT_SECONDS = float(os.environ.get('ANALYTICS_TASK_TIMEOUT_SECONDS', 15))
+    
+    # Comprehensive analysis runs its stages concurrently on a shared bounded pool;
+    # a stage still running after the timeout is reported without its result
+    ANALYSIS_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', 16))
+    ANALYSIS_STAGE_TIMEOUT_SECONDS = float(os.environ.get('ANALYSIS_STAGE_TIMEOUT_SECONDS', 20))
+    
+    # Nightly portfolio scoring job (portfolio_scoring.py); 0 workers means all cores
+    PORTFOLIO_SCORING_WORK_DIR = os.environ.get('PORTFOLIO_SCORING_WORK_DIR', 'portfolio_scoring')
+    PORTFOLIO_SCORING_CHUNK_SIZE = int(os.environ.get('PORTFOLIO_SCORING_CHUNK_SIZE', 50000))
+    PORTFOLIO_SCORING_WORKERS = int(os.environ.get('PORTFOLIO_SCORING_WORKERS', 0))
+    
+    # Incremental rescoring of accounts touched by ingestion: an account is rescored once it
+    # has been quiet for the debounce period, or after the maximum delay if it keeps changing
+    RISK_MAINTENANCE_ENABLED = os.environ.get('RISK_MAINTENANCE_ENABLED', 'true').lower() == 'true'
+    RISK_MAINTENANCE_DEBOUNCE_SECONDS = float(os.environ.get('RISK_MAINTENANCE_DEBOUNCE_SECONDS', 30))
+    RISK_MAINTENANCE_MAX_DELAY_SECONDS = float(os.environ.get('RISK_MAINTENANCE_MAX_DELAY_SECONDS', 300))
+    RISK_MAINTENANCE_BATCH_SIZE = int(os.environ.get('RISK_MAINTENANCE_BATCH_SIZE', 500))
+    
+    # Stored risk score at which an account is listed as a case
+    CASE_MIN_RISK_SCORE = float(os.environ.get('CASE_MIN_RISK_SCORE', 0.6))
+    # Embedded SQLite database holding investigation cases
+    CASE_STORE_PATH = os.environ.get('CASE_STORE_PATH', 'cases.db')
+    # In-memory leaderboard of those accounts, resynced from the stored scores periodically
+    LEADERBOARD_CAPACITY = int(os.environ.get('LEADERBOARD_CAPACITY', 10000))
+    LEADERBOARD_RESYNC_SECONDS = float(os.environ.get('LEADERBOARD_RESYNC_SECONDS', 600))
+    
+    # Declarative thresholds and weights of the risk factors, reloaded when the file changes
+    RISK_RULES_PATH = os.environ.get('RISK_RULES_PATH',
+                                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'risk_rules.json'))
+    RISK_RULES_RELOAD_CHECK_SECONDS = float(os.environ.get('RISK_RULES_RELOAD_CHECK_SECONDS', 5))
+    
+    # Sanctions and PEP lists (CSV: name, aliases, source), reloaded when the files change
+    SANCTIONS_LIST_PATH = os.environ.get('SANCTIONS_LIST_PATH', 'screening/sanctions.csv')
+    PEP_LIST_PATH = os.environ.get('PEP_LIST_PATH', 'screening/pep.csv')
+    SCREENING_MAX_DISTANCE = int(os.environ.get('SCREENING_MAX_DISTANCE', 2))
+    SCREENING_RELOAD_CHECK_SECONDS = float(os.environ.get('SCREENING_RELOAD_CHECK_SECONDS', 5))
+    SCREENING_MAX_NAMES = int(os.environ.get('SCREENING_MAX_NAMES', 10000))
+    
+    # Partition-parallel full-graph detectors (partitioned_analytics.py); 0 workers means all cores
+    PARTITIONED_ANALYTICS_WORK_DIR = os.environ.get('PARTITIONED_ANALYTICS_WORK_DIR', 'partitioned_analytics')
+    PARTITIONED_ANALYTICS_WORKERS = int(os.environ.get('PARTITIONED_ANALYTICS_WORKERS', 0))
+    # Without a partitioned cycle run, the dashboard's graph cycle count is reused this long
+    DASHBOARD_CYCLES_MAX_AGE_SECONDS = float(os.environ.get('DASHBOARD_CYCLES_MAX_AGE_SECONDS', 600))
+    
     # ML Model Configuration
     MODEL_PATH = os.environ.get('MODEL_PATH', '../ml/models')
     
@@ -0,0 +1,8 @@
+"""
+pytest configuration for the backend unit tests.
+
+test_advanced_aml.py and test_real_dataset.py are scripts that exercise a
+running API server (python test_advanced_aml.py); they are not collected.
+"""
+
+collect_ignore = ["test_advanced_aml.py", "test_real_dataset.py"]
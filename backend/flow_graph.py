@@ -0,0 +1,140 @@
+"""
+Money Flow Graph
+Array-based flow graph built by a level-synchronous BFS: one batched edge fetch
+per depth level for the whole frontier, with per-node and per-level caps.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+from path_finder import EdgeFetcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LEVEL_EDGES = 2000
+DEFAULT_MAX_FRONTIER = 500
+
+
+@dataclass
+class MoneyFlowGraph:
+    """Nodes and edges reached from a source account, stored as parallel arrays"""
+    source: str
+    nodes: List[str]
+    depth: np.ndarray          # BFS level at which each node was discovered
+    src: np.ndarray            # Edge source node index
+    dst: np.ndarray            # Edge destination node index
+    amount: np.ndarray
+    timestamp: np.ndarray
+    edge_type: np.ndarray      # Index into type_names
+    type_names: List[str]
+    levels_queried: int = 0
+    truncated: bool = False
+    node_index: Dict[str, int] = field(default_factory=dict)
+    supernodes: List[str] = field(default_factory=list)   # High-degree accounts left unexpanded
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    def out_degree(self) -> np.ndarray:
+        return np.bincount(self.src, minlength=self.num_nodes)
+
+    def in_degree(self) -> np.ndarray:
+        return np.bincount(self.dst, minlength=self.num_nodes)
+
+    def outflow(self) -> np.ndarray:
+        return np.bincount(self.src, weights=self.amount, minlength=self.num_nodes)
+
+    def inflow(self) -> np.ndarray:
+        return np.bincount(self.dst, weights=self.amount, minlength=self.num_nodes)
+
+    def __getstate__(self):
+        # Pickled for the analytics pool without the index, which is rebuilt from nodes
+        state = self.__dict__.copy()
+        state['node_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.node_index = {node: index for index, node in enumerate(self.nodes)}
+
+
+def build_money_flow_graph(source: str, fetch_edges: EdgeFetcher, max_depth: int = 5,
+                           max_level_edges: int = DEFAULT_MAX_LEVEL_EDGES,
+                           max_frontier: int = DEFAULT_MAX_FRONTIER) -> MoneyFlowGraph:
+    """
+    Expand outgoing transactions from source one depth level per fetch.
+
+    Each level keeps at most max_level_edges edges (largest amounts first) and
+    expands at most max_frontier newly discovered accounts, so depth d costs d
+    fetches regardless of how many paths exist.
+    """
+    node_index = {source: 0}
+    nodes = [source]
+    depth = [0]
+    src, dst, amount, timestamp, edge_type = [], [], [], [], []
+    type_index: Dict[str, int] = {}
+    truncated = False
+    levels_queried = 0
+
+    frontier = [source]
+    for level in range(1, max_depth + 1):
+        if not frontier:
+            break
+
+        edges_by_node = fetch_edges({node: float('-inf') for node in frontier})
+        levels_queried += 1
+
+        level_edges = [
+            (node, target, rel_type, value, ts)
+            for node in frontier
+            for target, rel_type, value, ts in edges_by_node.get(node, ())
+        ]
+        if len(level_edges) > max_level_edges:
+            level_edges.sort(key=lambda edge: edge[3], reverse=True)
+            level_edges = level_edges[:max_level_edges]
+            truncated = True
+
+        discovered = {}
+        for node, target, rel_type, value, ts in level_edges:
+            if target not in node_index:
+                node_index[target] = len(nodes)
+                nodes.append(target)
+                depth.append(level)
+                discovered[target] = 0.0
+            if target in discovered:
+                discovered[target] += value
+
+            src.append(node_index[node])
+            dst.append(node_index[target])
+            amount.append(value)
+            timestamp.append(ts)
+            edge_type.append(type_index.setdefault(rel_type, len(type_index)))
+
+        # Visited accounts are never re-expanded; expand the best-funded new ones
+        frontier = sorted(discovered, key=discovered.get, reverse=True)
+        if len(frontier) > max_frontier:
+            frontier = frontier[:max_frontier]
+            truncated = True
+
+    return MoneyFlowGraph(
+        source=source,
+        nodes=nodes,
+        depth=np.asarray(depth, dtype=np.int16),
+        src=np.asarray(src, dtype=np.int64),
+        dst=np.asarray(dst, dtype=np.int64),
+        amount=np.asarray(amount, dtype=np.float64),
+        timestamp=np.asarray(timestamp, dtype=np.float64),
+        edge_type=np.asarray(edge_type, dtype=np.int16),
+        type_names=list(type_index),
+        levels_queried=levels_queried,
+        truncated=truncated,
+        node_index=node_index
+    )
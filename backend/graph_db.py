@@ -1,16 +1,58 @@
 
 from py2neo import Graph, Node, Relationship
 import pandas as pd
-import numpy as np
 import logging
+import threading
+import time
 from datetime import datetime
 from config import Config
+from path_finder import find_top_paths, RANK_BY_TOTAL, DEFAULT_FAN_OUT
+from pagination import encode_cursor
+from batch_scoring import FACTOR_NAMES
+from pattern_indicators import path_indicators, pack_rows, analyze_cycles
+from analytics_pool import AnalyticsTimeoutError, run_analytics
+from account_tags import (
+    tag_account,
+    account_keywords,
+    SHELL_NETWORK_KEYWORDS,
+    OFFSHORE_LABEL,
+    CORPORATE_STRUCTURE_TYPES
+)
 
 logger = logging.getLogger(__name__)
 
+# Accounts whose degree reaches Config.SUPERNODE_DEGREE_THRESHOLD carry this label
+SUPERNODE_LABEL = 'Supernode'
+
+# Relationship types written by ingestion; each gets a timestamp index
+TRANSACTION_TYPES = ('CASH_IN', 'CASH_OUT', 'TRANSFER', 'PAYMENT', 'DEBIT')
+
+
+def time_range_predicate(rel: str, since=None, until=None) -> str:
+    """
+    Cypher predicate bounding rel.timestamp to [since, until].
+    
+    Only the bounds that are set are emitted (no "$since IS NULL OR ..." guards),
+    so the comparison stays a plain range the planner can answer from an index.
+    """
+    conditions = []
+    if since is not None:
+        conditions.append(f"{rel}.timestamp >= $since")
+    if until is not None:
+        conditions.append(f"{rel}.timestamp <= $until")
+    return " AND ".join(conditions) if conditions else "true"
+
 class GraphDatabase:
     def __init__(self):
         self.graph = None
+        self._ingestion_listeners = []
+        self._risk_score_listeners = []
+        self.neighbour_sketches = None
+        # Cycle indicators of a result page run here when set (analytics_pool.AnalyticsPool)
+        self.analytics_pool = None
+        # (monotonic time, count, computed_at) of the last find_all_cycles count
+        self._cycle_count = None
+        self._cycle_count_lock = threading.Lock()
         self._connect()
 
     def _connect(self):
@@ -59,6 +101,25 @@ class GraphDatabase:
                 "CREATE INDEX IF NOT EXISTS FOR (a:Account) ON (a.id)"
             )
             
+            # Ingestion-time account tags
+            self.graph.run(
+                "CREATE INDEX IF NOT EXISTS FOR (a:Account) ON (a.entity_type)"
+            )
+            self.graph.run(
+                "CREATE INDEX IF NOT EXISTS FOR (a:Account) ON (a.country_code)"
+            )
+            
+            # Stored risk scores, read highest first by case lists and dashboards
+            self.graph.run(
+                "CREATE INDEX IF NOT EXISTS FOR (a:Account) ON (a.risk_score)"
+            )
+            
+            # Transaction time range predicates
+            for rel_type in TRANSACTION_TYPES:
+                self.graph.run(
+                    f"CREATE INDEX IF NOT EXISTS FOR ()-[r:{rel_type}]-() ON (r.timestamp)"
+                )
+            
             logger.info("Database constraints and indexes setup completed")
         except Exception as e:
             logger.error(f"Failed to setup constraints: {e}")
@@ -82,11 +143,11 @@ class GraphDatabase:
                 sender_id = str(row['nameOrig'])
                 receiver_id = str(row['nameDest'])
                 
-                # Create or merge account nodes
-                sender_node = Node("Account", id=sender_id)
+                # Create or merge account nodes with their jurisdiction/entity tags
+                sender_node = self._account_node(sender_id)
                 tx.merge(sender_node, "Account", "id")
                 
-                receiver_node = Node("Account", id=receiver_id)
+                receiver_node = self._account_node(receiver_id)
                 tx.merge(receiver_node, "Account", "id")
                 
                 # Create transaction relationship
@@ -107,18 +168,270 @@ class GraphDatabase:
             logger.error(f"Failed to add transactions: {e}")
             raise
 
-    def get_transaction_graph(self, account_id: str, limit: int = 50):
-        """Get transaction graph for a specific account"""
+        self._update_degrees(df)
+        self._notify_ingestion(df)
+
+    def _account_node(self, account_id: str) -> Node:
+        """Build an Account node carrying its derived tags as labels and properties"""
+        tags = tag_account(account_id)
+        return Node("Account", *tags.labels, id=account_id, **tags.as_properties())
+
+    def backfill_account_tags(self, batch_size: int = 5000):
+        """Tag accounts created before ingestion-time tagging existed"""
+        if not self.graph:
+            return 0
+        
+        tagged = 0
+        try:
+            while True:
+                rows = self.graph.run(
+                    "MATCH (a:Account) WHERE a.entity_type IS NULL "
+                    "RETURN a.id as account_id LIMIT $batch_size",
+                    batch_size=batch_size
+                ).data()
+                if not rows:
+                    break
+                
+                updates = []
+                ids_by_label = {}
+                for row in rows:
+                    tags = tag_account(str(row['account_id']))
+                    updates.append({"id": row['account_id'], "props": tags.as_properties()})
+                    for label in tags.labels:
+                        ids_by_label.setdefault(label, []).append(row['account_id'])
+                
+                self.graph.run(
+                    "UNWIND $updates as u MATCH (a:Account {id: u.id}) SET a += u.props",
+                    updates=updates
+                )
+                # Labels cannot be parameterized; they come from the fixed tag label set
+                for label, ids in ids_by_label.items():
+                    self.graph.run(
+                        f"UNWIND $ids as id MATCH (a:Account {{id: id}}) SET a:{label}",
+                        ids=ids
+                    )
+                tagged += len(rows)
+            
+            if tagged:
+                logger.info(f"Backfilled tags for {tagged} accounts")
+            return tagged
+            
+        except Exception as e:
+            logger.error(f"Error backfilling account tags: {e}")
+            return tagged
+
+    def _update_degrees(self, df: pd.DataFrame):
+        """Increment per-account transaction degrees and label accounts that become supernodes"""
+        try:
+            counts = pd.DataFrame({
+                "out_degree": df['nameOrig'].astype(str).value_counts(),
+                "in_degree": df['nameDest'].astype(str).value_counts()
+            }).fillna(0)
+            rows = [
+                {"id": account_id, "out_degree": int(row.out_degree), "in_degree": int(row.in_degree)}
+                for account_id, row in counts.iterrows()
+            ]
+            
+            self.graph.run(f"""
+            UNWIND $rows as row
+            MATCH (a:Account {{id: row.id}})
+            SET a.out_degree = coalesce(a.out_degree, 0) + row.out_degree,
+                a.in_degree = coalesce(a.in_degree, 0) + row.in_degree
+            WITH a
+            WHERE a.out_degree + a.in_degree >= $threshold
+            SET a:{SUPERNODE_LABEL}
+            """, rows=rows, threshold=Config.SUPERNODE_DEGREE_THRESHOLD)
+            
+        except Exception as e:
+            logger.error(f"Failed to update account degrees: {e}")
+
+    def refresh_supernodes(self, batch_size: int = 5000):
+        """Backfill missing degrees and sync the Supernode label with the configured threshold"""
+        if not self.graph:
+            return 0
+        
+        try:
+            while True:
+                result = self.graph.run("""
+                MATCH (a:Account) WHERE a.out_degree IS NULL
+                WITH a LIMIT $batch_size
+                SET a.out_degree = size([(a)-->() | 1]), a.in_degree = size([(a)<--() | 1])
+                RETURN count(a) as updated
+                """, batch_size=batch_size).data()
+                if not result or result[0]['updated'] == 0:
+                    break
+            
+            threshold = Config.SUPERNODE_DEGREE_THRESHOLD
+            self.graph.run(
+                f"MATCH (a:{SUPERNODE_LABEL}) WHERE a.out_degree + a.in_degree < $threshold "
+                f"REMOVE a:{SUPERNODE_LABEL}",
+                threshold=threshold
+            )
+            self.graph.run(
+                f"MATCH (a:Account) WHERE a.out_degree + a.in_degree >= $threshold "
+                f"AND NOT a:{SUPERNODE_LABEL} SET a:{SUPERNODE_LABEL}",
+                threshold=threshold
+            )
+            supernodes = self.count_supernodes()
+            logger.info(f"{supernodes} supernodes at degree threshold {threshold}")
+            return supernodes
+            
+        except Exception as e:
+            logger.error(f"Error refreshing supernodes: {e}")
+            return 0
+
+    def count_supernodes(self):
+        """Get number of accounts labelled as supernodes"""
+        if not self.graph:
+            return 0
+        
+        try:
+            result = self.graph.run(f"MATCH (a:{SUPERNODE_LABEL}) RETURN count(a) as count").data()
+            return result[0]["count"] if result else 0
+        except Exception as e:
+            logger.error(f"Error counting supernodes: {e}")
+            return 0
+
+    def add_ingestion_listener(self, listener):
+        """Register a callable that receives each committed transaction DataFrame"""
+        self._ingestion_listeners.append(listener)
+
+    def _notify_ingestion(self, df: pd.DataFrame):
+        """Pass a committed batch to the ingestion listeners"""
+        for listener in self._ingestion_listeners:
+            try:
+                listener(df)
+            except Exception as e:
+                logger.error(f"Ingestion listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+
+    def add_risk_score_listener(self, listener):
+        """Register a callable that receives (scores, scored_at) after each risk score write"""
+        self._risk_score_listeners.append(listener)
+
+    def replay_ingestion(self, batch_size: int = 10000):
+        """Rebuild listener state by streaming every stored transaction through them"""
+        replayed = 0
+        for batch in self.iter_transactions(batch_size=batch_size):
+            self._notify_ingestion(batch)
+            replayed += len(batch)
+        logger.info(f"Replayed {replayed} stored transactions to ingestion listeners")
+        return replayed
+
+    def iter_transactions(self, rel_types=None, batch_size: int = 10000, until=None, strict: bool = False):
+        """
+        Stream stored transactions (at or before until) in timestamp order as canonical DataFrames.
+        A database error ends the stream with a log entry, or raises when strict
+        (for exports that must be complete)
+        """
+        if not self.graph:
+            if strict:
+                raise ConnectionError("Database connection unavailable")
+            return
+        
+        try:
+            type_filter = "type(r) IN $rel_types" if rel_types else "true"
+            query = f"""
+            MATCH (a:Account)-[r]->(b:Account)
+            WHERE {type_filter} AND {time_range_predicate('r', until=until)}
+            RETURN a.id as nameOrig, b.id as nameDest, type(r) as type,
+                   r.amount as amount, r.timestamp as step, r.isFraud as isFraud
+            ORDER BY r.timestamp
+            """
+            cursor = self.graph.run(query, rel_types=list(rel_types or []), until=until)
+            
+            batch = []
+            for record in cursor:
+                batch.append(dict(record))
+                if len(batch) >= batch_size:
+                    yield pd.DataFrame(batch)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch)
+                
+        except Exception as e:
+            logger.error(f"Error streaming transactions: {e}")
+            if strict:
+                raise
+
+    def write_risk_scores(self, scores: pd.DataFrame, scored_at: str, batch_size: int = 5000) -> int:
+        """
+        Store risk_score / risk_level on Account nodes in bulk, plus each factor
+        column present as risk_<factor>; returns the number of rows written
+        """
+        if not self.graph or scores is None or scores.empty:
+            return 0
+        
+        query = """
+        UNWIND $rows AS row
+        MATCH (a:Account {id: row.account_id})
+        SET a += row.factors,
+            a.risk_score = row.risk_score,
+            a.risk_level = row.risk_level,
+            a.risk_scored_at = $scored_at
+        """
+        factors = [name for name in FACTOR_NAMES if name in scores.columns]
+        table = scores.reset_index()
+        rows = [
+            {
+                "account_id": row['account_id'],
+                "risk_score": float(row['risk_score']),
+                "risk_level": row['risk_level'],
+                "factors": {f"risk_{name}": float(row[name]) for name in factors}
+            }
+            for row in table.to_dict('records')
+        ]
+        written = 0
+        try:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                self.graph.run(query, rows=batch, scored_at=scored_at)
+                written += len(batch)
+        except Exception as e:
+            logger.error(f"Error writing risk scores: {e}")
+            raise
+        
+        for listener in self._risk_score_listeners:
+            try:
+                listener(scores, scored_at)
+            except Exception as e:
+                logger.error(f"Risk score listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+        return written
+
+    def get_scored_accounts(self, min_score: float = 0.0, limit: int = 100):
+        """Accounts with a stored risk score of at least min_score, highest first, with their factors"""
+        if not self.graph:
+            return []
+        
+        try:
+            factors = ', '.join(f"{name}: a.risk_{name}" for name in FACTOR_NAMES)
+            query = f"""
+            MATCH (a:Account)
+            WHERE a.risk_score >= $min_score
+            RETURN a.id as account_id, a.risk_score as risk_score, a.risk_level as risk_level,
+                   a.risk_scored_at as scored_at, {{{factors}}} as factor_scores
+            ORDER BY a.risk_score DESC, a.id
+            LIMIT $limit
+            """
+            return self.graph.run(query, min_score=min_score, limit=limit).data()
+        except Exception as e:
+            logger.error(f"Error reading stored risk scores: {e}")
+            return []
+
+    def get_transaction_graph(self, account_id: str, limit: int = 50, since=None, until=None):
+        """Get transaction graph for a specific account, optionally within [since, until]"""
         if not self.graph:
             return {"nodes": [], "links": []}
         
         try:
-            query = """
-            MATCH (a:Account {id: $account_id})-[r]-(b:Account)
+            query = f"""
+            MATCH (a:Account {{id: $account_id}})-[r]-(b:Account)
+            WHERE {time_range_predicate('r', since, until)}
             RETURN a, r, b
             LIMIT $limit
             """
-            results = self.graph.run(query, account_id=account_id, limit=limit).data()
+            results = self.graph.run(
+                query, account_id=account_id, limit=limit, since=since, until=until
+            ).data()
             
             nodes = {}
             links = []
@@ -145,82 +458,175 @@ class GraphDatabase:
             logger.error(f"Error getting transaction graph: {e}")
             return {"nodes": [], "links": []}
 
-    def get_account_history(self, account_id: str, limit: int = 100):
-        """Get transaction history for an account"""
+    def get_account_history(self, account_id: str, limit: int = 100, since=None, until=None):
+        """Get transaction history for an account, optionally within [since, until]"""
         if not self.graph:
             return pd.DataFrame()
         
         try:
-            query = """
-            MATCH (a:Account {id: $account_id})-[r]-(b:Account)
+            # The window is applied while expanding, so only that slice is sorted
+            query = f"""
+            MATCH (a:Account {{id: $account_id}})-[r]-(b:Account)
+            WHERE {time_range_predicate('r', since, until)}
             RETURN a.id as account, type(r) as type, r.amount as amount, 
                    b.id as other_party, r.timestamp as timestamp,
                    CASE WHEN startNode(r) = a THEN 'outgoing' ELSE 'incoming' END as direction
             ORDER BY r.timestamp DESC
             LIMIT $limit
             """
-            results = self.graph.run(query, account_id=account_id, limit=limit)
+            results = self.graph.run(
+                query, account_id=account_id, limit=limit, since=since, until=until
+            )
             return pd.DataFrame(results.data())
             
         except Exception as e:
             logger.error(f"Error getting account history: {e}")
             return pd.DataFrame()
 
-    def find_cycles(self, account_id: str, max_length: int = 4):
-        """Find cycles involving a specific account"""
+    def get_account_histories(self, account_ids, limit: int = 100, since=None, until=None,
+                              chunk_size: int = 200):
+        """
+        Get the latest transactions of many accounts at once, one UNWIND query per chunk of ids.
+        Errors raise: a skipped chunk would give its accounts empty histories, and scores to match
+        """
+        if not account_ids:
+            return pd.DataFrame()
+        if not self.graph:
+            raise ConnectionError("Database connection unavailable")
+
+        frames = []
+        query = f"""
+        UNWIND $account_ids AS account_id
+        MATCH (a:Account {{id: account_id}})
+        CALL {{
+            WITH a
+            MATCH (a)-[r]-(b:Account)
+            WHERE {time_range_predicate('r', since, until)}
+            RETURN r, b
+            ORDER BY r.timestamp DESC
+            LIMIT $limit
+        }}
+        RETURN a.id as account, type(r) as type, r.amount as amount,
+               b.id as other_party, r.timestamp as timestamp,
+               CASE WHEN startNode(r) = a THEN 'outgoing' ELSE 'incoming' END as direction
+        """
+        for start in range(0, len(account_ids), chunk_size):
+            results = self.graph.run(
+                query, account_ids=list(account_ids[start:start + chunk_size]),
+                limit=limit, since=since, until=until
+            )
+            frames.append(pd.DataFrame(results.data()))
+
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def find_cycles(self, account_id: str, max_length: int = 4, supernodes=None, as_of=None):
+        """Find cycles involving a specific account, collecting the supernodes within reach it excludes from traversal"""
         if not self.graph:
             return []
         
         try:
+            # Supernodes other than the account itself are never expanded through
+            visible = time_range_predicate('rel', until=as_of)
             query = """
-            MATCH p=(a:Account {id: $account_id})-[*1..%d]->(a)
+            MATCH p=(a:Account {id: $account_id})-[r*1..%d]->(a)
+            WHERE ALL(rel in r WHERE %s) AND ALL(n in nodes(p) WHERE n = a OR NOT n:%s)
             RETURN p
             LIMIT 100
-            """ % max_length
-            results = self.graph.run(query, account_id=account_id).data()
+            """ % (max_length, visible, SUPERNODE_LABEL)
+            results = self.graph.run(query, account_id=account_id, until=as_of).data()
+            
+            if supernodes is not None and max_length > 1:
+                # Supernodes within reach of the account, from which a cycle could have continued
+                query = """
+                MATCH p=(a:Account {id: $account_id})-[r*1..%d]->(s:%s)
+                WHERE s <> a AND ALL(rel in r WHERE %s) AND ALL(n in nodes(p)[1..-1] WHERE n <> a AND NOT n:%s)
+                  AND EXISTS { MATCH (s)-[rel]->(:Account) WHERE %s }
+                RETURN DISTINCT s.id as account_id
+                """ % (max_length - 1, SUPERNODE_LABEL, visible, SUPERNODE_LABEL, visible)
+                supernodes.update(
+                    row['account_id'] for row in self.graph.run(query, account_id=account_id, until=as_of).data()
+                )
             return [row['p'] for row in results]
             
         except Exception as e:
             logger.error(f"Error finding cycles: {e}")
             return []
 
-    def find_all_cycles(self, max_length: int = 4):
-        """Find all cycles in the graph"""
+    def find_all_cycles(self, max_length: int = 4, supernodes=None, as_of=None):
+        """Find all cycles in the graph (at or before as_of), collecting the supernodes excluded from traversal"""
         if not self.graph:
             return []
         
         try:
             query = """
-            MATCH p=(a:Account)-[*2..%d]->(a)
+            MATCH (a:Account) WHERE NOT a:%s
+            MATCH p=(a)-[r*2..%d]->(a)
+            WHERE ALL(rel in r WHERE %s) AND ALL(n in nodes(p) WHERE NOT n:%s)
             RETURN DISTINCT a.id as account_id
             LIMIT 1000
-            """ % max_length
-            results = self.graph.run(query).data()
+            """ % (SUPERNODE_LABEL, max_length, time_range_predicate('rel', until=as_of), SUPERNODE_LABEL)
+            results = self.graph.run(query, until=as_of).data()
+            if supernodes is not None:
+                supernodes.update(self._untraversed_supernodes(as_of=as_of))
             return [{"account_id": row["account_id"]} for row in results]
             
         except Exception as e:
             logger.error(f"Error finding all cycles: {e}")
             return []
 
-    def find_high_risk_nodes(self, min_amount: float = 10000.0):
-        """Find accounts with high-risk characteristics"""
+    def count_cycle_accounts(self, max_age_seconds: float = 600.0):
+        """Number of accounts find_all_cycles returns and when it was counted, recounted at most every max_age_seconds"""
+        with self._cycle_count_lock:
+            if self._cycle_count is None or time.monotonic() - self._cycle_count[0] >= max_age_seconds:
+                count = len(self.find_all_cycles())
+                self._cycle_count = (time.monotonic(), count, datetime.utcnow().isoformat())
+            return self._cycle_count[1], self._cycle_count[2]
+
+    def _untraversed_supernodes(self, min_amount: float = 0.0, as_of=None):
+        """
+        Ids of the supernodes a cycle search excludes from traversal: those with an
+        incoming and an outgoing transaction (of at least min_amount, at or before
+        as_of) to other accounts. Whether a cycle through one would fit within the
+        search's length is not checked, so these are candidates rather than missed cycles
+        """
+        visible_in = time_range_predicate('r_in', until=as_of)
+        visible_out = time_range_predicate('r_out', until=as_of)
+        query = f"""
+        MATCH (s:{SUPERNODE_LABEL})
+        WHERE EXISTS {{
+            MATCH (b:Account)-[r_in]->(s)
+            WHERE NOT b:{SUPERNODE_LABEL} AND r_in.amount >= $min_amount AND {visible_in}
+        }}
+          AND EXISTS {{
+            MATCH (s)-[r_out]->(c:Account)
+            WHERE NOT c:{SUPERNODE_LABEL} AND r_out.amount >= $min_amount AND {visible_out}
+        }}
+        RETURN s.id as account_id
+        """
+        results = self.graph.run(query, min_amount=min_amount, until=as_of).data()
+        return [row['account_id'] for row in results]
+
+    def find_high_risk_nodes(self, min_score: float = 0.0, since=None, until=None, limit: int = 100):
+        """Accounts that sent transactions within [since, until], by stored risk score (highest first)"""
         if not self.graph:
             return []
         
         try:
-            query = """
-            MATCH (a:Account)-[r]->(b:Account)
-            WHERE r.amount > $min_amount OR r.isFraud = true
-            WITH a, sum(r.amount) as total_amount, count(r) as transaction_count,
-                 sum(CASE WHEN r.isFraud THEN 1 ELSE 0 END) as fraud_count
-            WHERE total_amount > $min_amount OR fraud_count > 0
-            RETURN a.id as account_id, total_amount, transaction_count, fraud_count,
-                   (total_amount / 1000000.0 + fraud_count * 0.5) as risk_score
-            ORDER BY risk_score DESC
-            LIMIT 100
+            factors = ', '.join(f"{name}: a.risk_{name}" for name in FACTOR_NAMES)
+            query = f"""
+            MATCH (a:Account)
+            WHERE a.risk_score >= $min_score
+              AND EXISTS {{
+                MATCH (a)-[r]->(:Account)
+                WHERE {time_range_predicate('r', since, until)}
+              }}
+            RETURN a.id as account_id, a.risk_score as risk_score, a.risk_level as risk_level,
+                   a.risk_scored_at as scored_at, {{{factors}}} as factor_scores
+            ORDER BY a.risk_score DESC, a.id
+            LIMIT $limit
             """
-            results = self.graph.run(query, min_amount=min_amount).data()
-            return results
+            return self.graph.run(query, min_score=min_score, limit=limit, since=since, until=until).data()
             
         except Exception as e:
             logger.error(f"Error finding high-risk nodes: {e}")
@@ -263,32 +669,89 @@ class GraphDatabase:
             logger.error(f"Error getting account IDs: {e}")
             return []
 
-    def get_transaction_path(self, account_id: str, max_depth: int = 5):
-        """Get transaction paths from an account"""
+    def fetch_outgoing_edges(self, frontier, min_amount: float = 0.0, fan_out: int = DEFAULT_FAN_OUT,
+                             supernodes=None, as_of=None):
+        """
+        Fetch the highest-value outgoing edges for a whole search frontier in one query.
+        
+        Supernodes are not expanded under the 'terminal' policy; under 'sample' the
+        first fan_out matching edges are read without sorting the hub's edges.
+        Supernodes met are added to the optional supernodes set. With as_of only
+        transactions at or before that timestamp are visible.
+        """
+        visible = time_range_predicate('r', until=as_of)
+        query = f"""
+        UNWIND $frontier as f
+        MATCH (a:Account {{id: f.node}})
+        WITH f, a, a:{SUPERNODE_LABEL} as is_supernode
+        CALL {{
+            WITH f, a, is_supernode
+            MATCH (a)-[r]->(b:Account)
+            WHERE NOT is_supernode AND {visible}
+              AND r.amount >= $min_amount AND (f.after IS NULL OR r.timestamp >= f.after)
+            WITH r, b ORDER BY r.amount DESC LIMIT $fan_out
+            RETURN collect([b.id, type(r), r.amount, r.timestamp]) as edges
+            UNION ALL
+            WITH f, a, is_supernode
+            MATCH (a)-[r]->(b:Account)
+            WHERE is_supernode AND $sample_supernodes AND {visible}
+              AND r.amount >= $min_amount AND (f.after IS NULL OR r.timestamp >= f.after)
+            WITH r, b LIMIT $fan_out
+            RETURN collect([b.id, type(r), r.amount, r.timestamp]) as edges
+        }}
+        WITH f, is_supernode, collect(edges) as edge_lists
+        RETURN f.node as node, is_supernode,
+               reduce(all_edges = [], e in edge_lists | all_edges + e) as edges
+        """
+        params = [
+            {"node": node, "after": None if after == float('-inf') else after}
+            for node, after in frontier.items()
+        ]
+        results = self.graph.run(
+            query, frontier=params, min_amount=min_amount, fan_out=fan_out,
+            sample_supernodes=Config.SUPERNODE_POLICY == 'sample', until=as_of
+        ).data()
+        
+        if supernodes is not None:
+            supernodes.update(row['node'] for row in results if row['is_supernode'])
+        return {
+            row['node']: [(target, rel_type, amount or 0, timestamp or 0)
+                          for target, rel_type, amount, timestamp in row['edges']]
+            for row in results
+        }
+
+    def get_transaction_path(self, account_id: str, max_depth: int = 5, top_k: int = 50,
+                             min_amount: float = 0.0, rank_by: str = RANK_BY_TOTAL, supernodes=None,
+                             as_of=None):
+        """Get the top-k value-weighted transaction paths from an account, collecting supernodes met"""
         if not self.graph:
             return []
         
         try:
-            query = """
-            MATCH p=(a:Account {id: $account_id})-[*1..%d]->(b:Account)
-            RETURN p
-            LIMIT 50
-            """ % max_depth
-            results = self.graph.run(query, account_id=account_id).data()
+            top_paths = find_top_paths(
+                account_id,
+                lambda frontier: self.fetch_outgoing_edges(
+                    frontier, min_amount, supernodes=supernodes, as_of=as_of
+                ),
+                max_depth=max_depth,
+                top_k=top_k,
+                rank_by=rank_by
+            )
             
             paths = []
-            for row in results:
-                path = row['p']
+            for path in top_paths:
                 path_data = {
-                    "nodes": [node['id'] for node in path.nodes],
+                    "nodes": list(path.nodes),
                     "relationships": [
                         {
-                            "type": type(rel).__name__,
-                            "amount": rel.get('amount', 0),
-                            "timestamp": rel.get('timestamp', 0)
+                            "type": rel_type,
+                            "amount": amount,
+                            "timestamp": timestamp
                         }
-                        for rel in path.relationships
-                    ]
+                        for rel_type, amount, timestamp in zip(path.types, path.amounts, path.timestamps)
+                    ],
+                    "total_amount": path.total_amount,
+                    "bottleneck_amount": path.bottleneck_amount
                 }
                 paths.append(path_data)
             
@@ -298,47 +761,47 @@ class GraphDatabase:
             logger.error(f"Error getting transaction path: {e}")
             return []
 
-    def trace_money_flow(self, account_id: str, amount_threshold: float = 10000, max_depth: int = 6):
+    def trace_money_flow(self, account_id: str, amount_threshold: float = 10000, max_depth: int = 6,
+                         rank_by: str = RANK_BY_TOTAL, as_of=None):
         """Trace money flow across multiple accounts with enhanced tracking"""
         if not self.graph:
             return {"error": "Database connection unavailable"}
         
         try:
-            # Complex query to trace money flows above threshold
-            query = """
-            MATCH p=(source:Account {id: $account_id})-[r*1..%d]->(destination:Account)
-            WHERE ALL(rel in r WHERE rel.amount >= $amount_threshold)
-            WITH p, [rel in relationships(p) | rel.amount] as amounts,
-                 [rel in relationships(p) | rel.timestamp] as timestamps,
-                 length(p) as depth
-            WHERE depth >= 2
-            RETURN p, amounts, timestamps, depth,
-                   reduce(total = 0, amount in amounts | total + amount) as total_amount
-            ORDER BY total_amount DESC
-            LIMIT 100
-            """ % max_depth
-            
-            results = self.graph.run(query, account_id=account_id, amount_threshold=amount_threshold).data()
+            # Beam search over time-ordered hops above the threshold, best totals first
+            supernodes = set()
+            top_paths = find_top_paths(
+                account_id,
+                lambda frontier: self.fetch_outgoing_edges(
+                    frontier, amount_threshold, supernodes=supernodes, as_of=as_of
+                ),
+                max_depth=max_depth,
+                top_k=100,
+                rank_by=rank_by,
+                min_depth=2
+            )
             
             flow_paths = []
-            for row in results:
-                path = row['p']
+            for path in top_paths:
+                row = {"amounts": list(path.amounts), "timestamps": list(path.timestamps)}
                 flow_paths.append({
                     "path_id": len(flow_paths),
                     "source": account_id,
-                    "destination": path.nodes[-1]['id'],
-                    "nodes": [node['id'] for node in path.nodes],
+                    "destination": path.nodes[-1],
+                    "nodes": list(path.nodes),
                     "amounts": row['amounts'],
                     "timestamps": row['timestamps'],
-                    "total_amount": row['total_amount'],
-                    "depth": row['depth'],
-                    "suspicious_indicators": self._analyze_path_suspicion(row)
+                    "total_amount": path.total_amount,
+                    "bottleneck_amount": path.bottleneck_amount,
+                    "depth": path.depth,
+                    "suspicious_indicators": path_indicators(row['amounts'], row['timestamps'])
                 })
             
             return {
                 "source_account": account_id,
                 "total_paths": len(flow_paths),
                 "high_value_paths": flow_paths,
+                "supernodes": sorted(supernodes),
                 "analysis": self._analyze_money_flows(flow_paths),
                 "timestamp": datetime.utcnow().isoformat()
             }
@@ -347,30 +810,49 @@ class GraphDatabase:
             logger.error(f"Error tracing money flow: {e}")
             return {"error": str(e)}
 
-    def detect_circular_transactions(self, min_amount: float = 5000, max_cycle_length: int = 8):
-        """Detect circular money flows that could indicate layering"""
+    def detect_circular_transactions(self, min_amount: float = 5000, max_cycle_length: int = 8,
+                                     limit: int = 50, after=None, as_of=None, supernodes=None):
+        """
+        Detect circular money flows that could indicate layering, largest first from the after key.
+        
+        Cycles never pass through supernodes; those excluded from traversal (see
+        _untraversed_supernodes) are added to the optional supernodes set.
+        """
         if not self.graph:
             return []
         
         try:
             query = """
-            MATCH p=(a:Account)-[r*2..%d]->(a)
-            WHERE ALL(rel in r WHERE rel.amount >= $min_amount)
+            MATCH (a:Account) WHERE NOT a:%s
+            MATCH p=(a)-[r*2..%d]->(a)
+            WHERE ALL(rel in r WHERE rel.amount >= $min_amount AND %s)
+              AND ALL(n in nodes(p) WHERE NOT n:%s)
             WITH p, [rel in relationships(p) | rel.amount] as amounts,
-                 [rel in relationships(p) | rel.timestamp] as timestamps
-            RETURN p, amounts, timestamps,
-                   reduce(total = 0, amount in amounts | total + amount) as total_amount,
+                 [rel in relationships(p) | rel.timestamp] as timestamps,
+                 reduce(k = '', rel in relationships(p) | k + ':' + toString(id(rel))) as cycle_key
+            WITH p, amounts, timestamps, cycle_key,
+                 reduce(total = 0, amount in amounts | total + amount) as total_amount
+            WHERE $after_total IS NULL OR total_amount < $after_total
+               OR (total_amount = $after_total AND cycle_key > $after_key)
+            RETURN p, amounts, timestamps, total_amount, cycle_key,
                    length(p) as cycle_length
-            ORDER BY total_amount DESC
-            LIMIT 50
-            """ % max_cycle_length
+            ORDER BY total_amount DESC, cycle_key
+            LIMIT $limit
+            """ % (SUPERNODE_LABEL, max_cycle_length, time_range_predicate('rel', until=as_of), SUPERNODE_LABEL)
+            
+            after_total, after_key = after if after else (None, None)
+            results = self.graph.run(
+                query, min_amount=min_amount, limit=limit,
+                after_total=after_total, after_key=after_key, until=as_of
+            ).data()
             
-            results = self.graph.run(query, min_amount=min_amount).data()
+            indicators = run_analytics(self.analytics_pool, analyze_cycles, *pack_rows(results)) if results else []
+            if supernodes is not None:
+                supernodes.update(self._untraversed_supernodes(min_amount, as_of))
             
             cycles = []
-            for row in results:
+            for row, cycle_analysis in zip(results, indicators):
                 path = row['p']
-                cycle_analysis = self._analyze_cycle_pattern(row)
                 
                 cycles.append({
                     "cycle_id": len(cycles),
@@ -381,38 +863,62 @@ class GraphDatabase:
                     "total_amount": row['total_amount'],
                     "cycle_length": row['cycle_length'],
                     "time_span": max(row['timestamps']) - min(row['timestamps']) if row['timestamps'] else 0,
-                    "layering_indicators": cycle_analysis
+                    "layering_indicators": cycle_analysis,
+                    "cursor": encode_cursor([row['total_amount'], row['cycle_key']])
                 })
             
             return cycles
             
+        except AnalyticsTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Error detecting circular transactions: {e}")
             return []
 
-    def find_shell_company_networks(self):
-        """Identify potential shell company networks"""
+    def find_shell_company_networks(self, limit: int = 100, after=None, as_of=None):
+        """Identify potential shell company networks, largest flows first from the after key"""
         if not self.graph:
             return []
         
         try:
+            # Anchor each chain position on the indexed entity_type tag
             query = """
-            MATCH (a:Account)-[r1]->(b:Account)-[r2]->(c:Account)
-            WHERE a.id <> c.id 
+            CALL {{
+                MATCH (x:Account) WHERE x.entity_type IN $corporate_types
+                MATCH (x)-[r1]->(b:Account)-[r2]->(c:Account)
+                RETURN x as a, b, c, r1, r2
+                UNION
+                MATCH (x:Account) WHERE x.entity_type IN $corporate_types
+                MATCH (a:Account)-[r1]->(x)-[r2]->(c:Account)
+                RETURN a, x as b, c, r1, r2
+                UNION
+                MATCH (x:Account) WHERE x.entity_type IN $corporate_types
+                MATCH (a:Account)-[r1]->(b:Account)-[r2]->(x)
+                RETURN a, b, x as c, r1, r2
+            }}
+            WITH a, b, c, r1, r2
+            WHERE a.id <> c.id AND {visible_r1} AND {visible_r2}
             AND (r1.amount > 50000 OR r2.amount > 50000)
             WITH a, b, c, r1.amount + r2.amount as total_flow,
-                 r1.timestamp as first_timestamp, r2.timestamp as second_timestamp
+                 r1.timestamp as first_timestamp, r2.timestamp as second_timestamp,
+                 toString(id(r1)) + ':' + toString(id(r2)) as network_key
             WHERE abs(second_timestamp - first_timestamp) <= 86400  // Within 24 hours
-            AND (a.id CONTAINS 'LLC' OR a.id CONTAINS 'CORP' OR a.id CONTAINS 'HOLDING' OR
-                 b.id CONTAINS 'LLC' OR b.id CONTAINS 'CORP' OR b.id CONTAINS 'HOLDING' OR
-                 c.id CONTAINS 'LLC' OR c.id CONTAINS 'CORP' OR c.id CONTAINS 'HOLDING')
+              AND ($after_flow IS NULL OR total_flow < $after_flow
+                   OR (total_flow = $after_flow AND network_key > $after_key))
             RETURN a.id as source, b.id as intermediary, c.id as destination,
-                   total_flow, first_timestamp, second_timestamp
-            ORDER BY total_flow DESC
-            LIMIT 100
-            """
+                   total_flow, first_timestamp, second_timestamp, network_key
+            ORDER BY total_flow DESC, network_key
+            LIMIT $limit
+            """.format(
+                visible_r1=time_range_predicate('r1', until=as_of),
+                visible_r2=time_range_predicate('r2', until=as_of)
+            )
             
-            results = self.graph.run(query).data()
+            after_flow, after_key = after if after else (None, None)
+            results = self.graph.run(
+                query, corporate_types=[t.value for t in CORPORATE_STRUCTURE_TYPES],
+                limit=limit, after_flow=after_flow, after_key=after_key, until=as_of
+            ).data()
             
             networks = []
             for row in results:
@@ -425,7 +931,8 @@ class GraphDatabase:
                     "time_span": row['second_timestamp'] - row['first_timestamp'],
                     "shell_indicators": self._identify_shell_indicators([
                         row['source'], row['intermediary'], row['destination']
-                    ])
+                    ]),
+                    "cursor": encode_cursor([row['total_flow'], row['network_key']])
                 })
             
             return networks
@@ -434,79 +941,40 @@ class GraphDatabase:
             logger.error(f"Error finding shell company networks: {e}")
             return []
 
-    def analyze_cash_intensive_patterns(self, min_cash_amount: float = 10000):
-        """Analyze cash-in/cash-out patterns that might indicate structuring"""
-        if not self.graph:
-            return []
-        
-        try:
-            query = """
-            MATCH (a:Account)-[r:CASH_OUT|CASH_IN]-(b:Account)
-            WHERE r.amount >= $min_cash_amount
-            WITH a, type(r) as operation_type, r.amount as amount, r.timestamp as timestamp
-            ORDER BY a.id, timestamp
-            WITH a, collect({op: operation_type, amount: amount, timestamp: timestamp}) as operations
-            WHERE size(operations) >= 5
-            RETURN a.id as account_id, operations,
-                   reduce(total = 0, op in operations | 
-                     total + CASE WHEN op.op = 'CASH_OUT' THEN op.amount ELSE 0 END) as total_cash_out,
-                   reduce(total = 0, op in operations | 
-                     total + CASE WHEN op.op = 'CASH_IN' THEN op.amount ELSE 0 END) as total_cash_in
-            ORDER BY (total_cash_out + total_cash_in) DESC
-            LIMIT 50
-            """
-            
-            results = self.graph.run(query, min_cash_amount=min_cash_amount).data()
-            
-            patterns = []
-            for row in results:
-                operations = row['operations']
-                structuring_analysis = self._analyze_structuring_pattern(operations)
-                
-                patterns.append({
-                    "account_id": row['account_id'],
-                    "total_cash_out": row['total_cash_out'],
-                    "total_cash_in": row['total_cash_in'],
-                    "operation_count": len(operations),
-                    "operations": operations,
-                    "structuring_indicators": structuring_analysis,
-                    "risk_score": self._calculate_cash_pattern_risk(row, structuring_analysis)
-                })
-            
-            return patterns
-            
-        except Exception as e:
-            logger.error(f"Error analyzing cash patterns: {e}")
-            return []
-
-    def find_offshore_connection_patterns(self):
-        """Find patterns involving offshore accounts and jurisdictions"""
+    def find_offshore_connection_patterns(self, limit: int = 100, after=None, as_of=None):
+        """Find patterns involving offshore accounts and jurisdictions, largest first from the after key"""
         if not self.graph:
             return []
         
-        # Define offshore jurisdiction patterns
-        offshore_patterns = ['BM', 'KY', 'VI', 'BS', 'PA', 'CH', 'SG', 'HK']
-        
         try:
-            # Build the pattern matching for offshore accounts
-            offshore_condition = " OR ".join([f"a.id STARTS WITH '{pattern}'" for pattern in offshore_patterns])
-            
+            # Offshore accounts carry the Offshore label from ingestion, so both
+            # sides are label scans rather than string predicates over every relationship.
+            # The keyset condition is applied inside each branch before the union.
+            keyset = "($after_amount IS NULL OR r.amount < $after_amount " \
+                     "OR (r.amount = $after_amount AND id(r) > $after_id))"
+            keyset += " AND " + time_range_predicate('r', until=as_of)
             query = f"""
-            MATCH (a:Account)-[r]->(b:Account)
-            WHERE ({offshore_condition}) OR 
-                  (a.id CONTAINS 'OFFSHORE' OR b.id CONTAINS 'OFFSHORE')
-            WITH a, b, r, 
-                 CASE WHEN {offshore_condition} THEN 'offshore' ELSE 'domestic' END as source_type,
-                 CASE WHEN b.id STARTS WITH 'BM' OR b.id STARTS WITH 'KY' OR b.id STARTS WITH 'VI' 
-                      OR b.id CONTAINS 'OFFSHORE' THEN 'offshore' ELSE 'domestic' END as dest_type
-            WHERE r.amount > 25000
+            CALL {{
+                MATCH (a:{OFFSHORE_LABEL})-[r]->(b:Account)
+                WHERE r.amount > 25000 AND {keyset}
+                RETURN a, r, b
+                UNION
+                MATCH (a:Account)-[r]->(b:{OFFSHORE_LABEL})
+                WHERE r.amount > 25000 AND {keyset}
+                RETURN a, r, b
+            }}
             RETURN a.id as source, b.id as destination, r.amount as amount, 
-                   r.timestamp as timestamp, source_type, dest_type
-            ORDER BY r.amount DESC
-            LIMIT 100
+                   r.timestamp as timestamp, id(r) as rel_id,
+                   CASE WHEN a:{OFFSHORE_LABEL} THEN 'offshore' ELSE 'domestic' END as source_type,
+                   CASE WHEN b:{OFFSHORE_LABEL} THEN 'offshore' ELSE 'domestic' END as destination_type
+            ORDER BY r.amount DESC, rel_id
+            LIMIT $limit
             """
             
-            results = self.graph.run(query).data()
+            after_amount, after_id = after if after else (None, None)
+            results = self.graph.run(
+                query, limit=limit, after_amount=after_amount, after_id=after_id, until=as_of
+            ).data()
             
             patterns = []
             for row in results:
@@ -516,9 +984,10 @@ class GraphDatabase:
                     "amount": row['amount'],
                     "timestamp": row['timestamp'],
                     "source_type": row['source_type'],
-                    "destination_type": row['dest_type'],
+                    "destination_type": row['destination_type'],
                     "pattern_type": self._classify_offshore_pattern(row),
-                    "risk_indicators": self._assess_offshore_risk(row)
+                    "risk_indicators": self._assess_offshore_risk(row),
+                    "cursor": encode_cursor([row['amount'], row['rel_id']])
                 })
             
             return patterns
@@ -527,45 +996,59 @@ class GraphDatabase:
             logger.error(f"Error finding offshore patterns: {e}")
             return []
 
-    def calculate_account_centrality_metrics(self, account_id: str):
+    def calculate_account_centrality_metrics(self, account_id: str, as_of=None):
         """Calculate advanced centrality metrics for risk assessment"""
         if not self.graph:
             return {}
         
         try:
-            # Get the account's network neighborhood
-            query = """
-            MATCH (center:Account {id: $account_id})
-            OPTIONAL MATCH (center)-[r1]-(neighbor:Account)
-            OPTIONAL MATCH (neighbor)-[r2]-(second_degree:Account)
-            WHERE second_degree.id <> center.id
-            RETURN center, collect(DISTINCT neighbor) as neighbors, 
-                   collect(DISTINCT second_degree) as second_degree_nodes,
-                   collect(DISTINCT r1) as direct_relationships,
-                   collect(DISTINCT r2) as indirect_relationships
-            """
-            
-            result = self.graph.run(query, account_id=account_id).data()
-            
-            if not result:
-                return {}
+            # Prefer the ingestion-maintained neighbour sketches (no graph expansion);
+            # they hold the current graph, so point-in-time queries aggregate in Cypher
+            data = None
+            if self.neighbour_sketches and as_of is None:
+                data = self.neighbour_sketches.centrality_inputs(account_id)
             
-            data = result[0]
+            if data is None:
+                # Aggregate instead of collecting nodes and relationships
+                query = f"""
+                MATCH (center:Account {{id: $account_id}})-[r]-(neighbor:Account)
+                WHERE {time_range_predicate('r', until=as_of)}
+                WITH center, count(DISTINCT neighbor) as direct_connections,
+                     sum(r.amount) as total_transaction_volume, count(r) as transaction_count,
+                     max(r.timestamp) - min(r.timestamp) as time_span,
+                     collect(DISTINCT neighbor) as neighbors
+                UNWIND neighbors as neighbor
+                OPTIONAL MATCH (neighbor)-[r2]-(second_degree:Account)
+                WHERE second_degree <> center AND {time_range_predicate('r2', until=as_of)}
+                RETURN direct_connections, total_transaction_volume, transaction_count, time_span,
+                       count(DISTINCT second_degree) as second_degree_connections
+                """
+                result = self.graph.run(query, account_id=account_id, until=as_of).data()
+                
+                if not result:
+                    return {}
+                
+                data = result[0]
+                data["second_degree_error_bound"] = 0.0
+                data["second_degree_approximate"] = False
+                if data["transaction_count"] <= 1:
+                    data["time_span"] = 0
             
             # Calculate metrics
-            direct_connections = len(data['neighbors'])
-            second_degree_connections = len(data['second_degree_nodes'])
-            total_transaction_volume = sum(rel.get('amount', 0) for rel in data['direct_relationships'])
+            direct_connections = data['direct_connections']
+            second_degree_connections = data['second_degree_connections']
+            total_transaction_volume = data['total_transaction_volume'] or 0
             
             # Calculate transaction velocity
-            timestamps = [rel.get('timestamp', 0) for rel in data['direct_relationships']]
-            time_span = max(timestamps) - min(timestamps) if len(timestamps) > 1 else 0
-            transaction_velocity = len(timestamps) / max(time_span / 86400, 1)  # transactions per day
+            time_span = data['time_span'] or 0
+            transaction_velocity = data['transaction_count'] / max(time_span / 86400, 1)  # transactions per day
             
             return {
                 "account_id": account_id,
                 "direct_connections": direct_connections,
                 "second_degree_connections": second_degree_connections,
+                "second_degree_error_bound": data['second_degree_error_bound'],
+                "second_degree_approximate": data['second_degree_approximate'],
                 "total_transaction_volume": total_transaction_volume,
                 "transaction_velocity": transaction_velocity,
                 "network_reach": direct_connections + second_degree_connections,
@@ -579,119 +1062,17 @@ class GraphDatabase:
             return {}
 
     # Helper methods for analysis
-    def _analyze_path_suspicion(self, path_data):
-        """Analyze a transaction path for suspicious indicators"""
-        indicators = []
-        
-        amounts = path_data.get('amounts', [])
-        timestamps = path_data.get('timestamps', [])
-        
-        # Check for amount patterns
-        if amounts:
-            # Rapid value decrease (potential layering)
-            if len(amounts) > 2 and amounts[0] > amounts[-1] * 2:
-                indicators.append("Rapid value decrease through chain")
-            
-            # Round amounts (potential structuring)
-            round_amounts = sum(1 for amount in amounts if amount % 1000 == 0)
-            if round_amounts / len(amounts) > 0.7:
-                indicators.append("High percentage of round amounts")
-        
-        # Check for timing patterns
-        if timestamps and len(timestamps) > 1:
-            time_diffs = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
-            avg_time_diff = sum(time_diffs) / len(time_diffs)
-            
-            # Very rapid transactions
-            if avg_time_diff < 3600:  # Less than 1 hour average
-                indicators.append("Rapid sequential transactions")
-        
-        return indicators
-
-    def _analyze_cycle_pattern(self, cycle_data):
-        """Analyze a circular transaction pattern"""
-        indicators = []
-        
-        amounts = cycle_data.get('amounts', [])
-        timestamps = cycle_data.get('timestamps', [])
-        
-        if amounts:
-            # Check if amounts decrease through the cycle (fee skimming)
-            if amounts[0] > amounts[-1]:
-                loss_percentage = (amounts[0] - amounts[-1]) / amounts[0] * 100
-                indicators.append(f"Value loss through cycle: {loss_percentage:.1f}%")
-            
-            # Check for consistent amounts (automated behavior)
-            amount_variance = np.var(amounts) if len(amounts) > 1 else 0
-            if amount_variance < np.mean(amounts) * 0.1:
-                indicators.append("Highly consistent transaction amounts")
-        
-        if timestamps:
-            # Check for regular timing
-            if len(timestamps) > 2:
-                time_diffs = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
-                if np.std(time_diffs) < np.mean(time_diffs) * 0.2:
-                    indicators.append("Regular transaction timing pattern")
-        
-        return indicators
-
     def _identify_shell_indicators(self, account_ids):
         """Identify shell company indicators in account names"""
         indicators = []
         
-        shell_keywords = ['LLC', 'CORP', 'HOLDING', 'INVEST', 'CAPITAL', 'MANAGEMENT', 'SERVICES']
-        
         for account_id in account_ids:
-            account_upper = account_id.upper()
-            matching_keywords = [kw for kw in shell_keywords if kw in account_upper]
+            matching_keywords = account_keywords(account_id).matches(SHELL_NETWORK_KEYWORDS)
             if matching_keywords:
                 indicators.append(f"{account_id}: {', '.join(matching_keywords)}")
         
         return indicators
 
-    def _analyze_structuring_pattern(self, operations):
-        """Analyze operations for structuring patterns"""
-        indicators = []
-        
-        # Check for amounts just below reporting thresholds
-        thresholds = [10000, 5000, 3000]
-        for threshold in thresholds:
-            near_threshold = sum(1 for op in operations 
-                               if threshold * 0.9 <= op['amount'] < threshold)
-            if near_threshold >= 3:
-                indicators.append(f"{near_threshold} transactions near ${threshold} threshold")
-        
-        # Check for rapid succession of cash operations
-        cash_out_ops = [op for op in operations if op['op'] == 'CASH_OUT']
-        if len(cash_out_ops) >= 5:
-            timestamps = [op['timestamp'] for op in cash_out_ops]
-            if max(timestamps) - min(timestamps) <= 86400 * 7:  # Within a week
-                indicators.append("Multiple cash-out operations within short timeframe")
-        
-        return indicators
-
-    def _calculate_cash_pattern_risk(self, data, structuring_analysis):
-        """Calculate risk score for cash transaction patterns"""
-        risk_score = 0.0
-        
-        # High volume risk
-        total_volume = data['total_cash_out'] + data['total_cash_in']
-        if total_volume > 500000:
-            risk_score += 0.3
-        
-        # High frequency risk
-        if data['operation_count'] > 20:
-            risk_score += 0.2
-        
-        # Structuring indicators
-        risk_score += len(structuring_analysis) * 0.1
-        
-        # Imbalance (more out than in, suggesting cash conversion)
-        if data['total_cash_out'] > data['total_cash_in'] * 2:
-            risk_score += 0.2
-        
-        return min(risk_score, 1.0)
-
     def _classify_offshore_pattern(self, pattern_data):
         """Classify the type of offshore transaction pattern"""
         source_type = pattern_data['source_type']
@@ -0,0 +1,71 @@
+"""
+Keyword Classifier
+Aho-Corasick automaton over several named keyword lists. One pass over an
+identifier reports every keyword it contains and, as a bitmask, every list
+(category) with at least one match, however many lists and keywords there
+are and however much they overlap.
+"""
+
+from collections import deque
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Tuple
+
+
+class KeywordAutomaton:
+    """Case-insensitive substring matcher for many keyword categories at once"""
+
+    def __init__(self, categories: Dict[Hashable, Iterable[str]]):
+        self.categories: List[Hashable] = list(categories)
+        self._bits = {category: 1 << index for index, category in enumerate(self.categories)}
+
+        keyword_masks: Dict[str, int] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.upper()
+                keyword_masks[keyword] = keyword_masks.get(keyword, 0) | self._bits[category]
+
+        # Trie of all keywords; each state lists the keywords ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[Tuple[str, ...]] = [()]
+        for keyword in keyword_masks:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._output.append(())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state] = (keyword,)
+
+        # Failure links in breadth-first order; outputs inherit their failure state's
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+        self._masks = [0] * len(self._goto)
+        for state, keywords in enumerate(self._output):
+            for keyword in keywords:
+                self._masks[state] |= keyword_masks[keyword]
+
+    def scan(self, text: str) -> Tuple[int, FrozenSet[str]]:
+        """Category bitmask and the set of keywords contained in text"""
+        goto, fail = self._goto, self._fail
+        state, mask, found = 0, 0, set()
+        for char in text.upper():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if self._output[state]:
+                mask |= self._masks[state]
+                found.update(self._output[state])
+        return mask, frozenset(found)
+
+    def bit(self, category: Hashable) -> int:
+        return self._bits[category]
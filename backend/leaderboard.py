@@ -0,0 +1,211 @@
+"""
+High-Risk Account Leaderboard
+In-memory set of the accounts whose stored risk score is at or above the case
+threshold, kept in an indexed min-heap (position map per account) so a score
+change is one O(log k) sift and the lowest entry is evicted first when the
+board is full. It is updated from every risk score write and rebuilt from the
+stored scores at startup and periodically, which also picks up scores written
+by other processes such as the nightly portfolio job. A periodic rebuild runs
+on a background thread, one at a time, and score updates made while it loads
+are applied again on top of the loaded rows.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from batch_scoring import FACTOR_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+class RiskLeaderboard:
+    """Top high-risk accounts by stored risk score"""
+
+    def __init__(self, capacity: int = 10000, min_score: float = 0.6,
+                 loader: Optional[Callable[[], List[Dict]]] = None, resync_seconds: float = 600.0):
+        self.capacity = capacity
+        self.min_score = min_score
+        self.loader = loader
+        self.resync_seconds = resync_seconds
+
+        self._lock = threading.Lock()
+        # Min-heap of (risk_score, account_id); _position maps account_id -> heap index
+        self._heap: List[Tuple[float, str]] = []
+        self._position: Dict[str, int] = {}
+        self._details: Dict[str, Dict] = {}
+        self._evicted = 0
+        self._synced_at: Optional[float] = None
+        # One rebuild at a time; updates made while it loads are kept in _pending
+        self._rebuild_lock = threading.Lock()
+        self._resyncing = False
+        self._pending: Optional[List[Tuple[str, float, Dict]]] = None
+
+    # Indexed heap primitives (caller holds the lock)
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i][1]] = i
+        self._position[heap[j][1]] = j
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i] >= self._heap[parent]:
+                return
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        size = len(self._heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self._heap[child] < self._heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def _remove_at(self, i: int):
+        last = len(self._heap) - 1
+        if i != last:
+            self._swap(i, last)
+        _, account_id = self._heap.pop()
+        del self._position[account_id]
+        self._details.pop(account_id, None)
+        if i < len(self._heap):
+            self._sift_up(i)
+            self._sift_down(i)
+
+    def _set(self, account_id: str, risk_score: float, details: Dict):
+        index = self._position.get(account_id)
+        if risk_score < self.min_score:
+            if index is not None:
+                self._remove_at(index)
+            return
+
+        self._details[account_id] = details
+        if index is not None:
+            self._heap[index] = (risk_score, account_id)
+            self._sift_up(index)
+            self._sift_down(self._position[account_id])
+            return
+
+        if len(self._heap) >= self.capacity:
+            if (risk_score, account_id) <= self._heap[0]:
+                self._details.pop(account_id, None)
+                self._evicted += 1
+                return
+            self._remove_at(0)
+            self._evicted += 1
+        self._heap.append((risk_score, account_id))
+        self._position[account_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def _apply(self, account_id: str, risk_score: float, details: Dict):
+        self._set(account_id, risk_score, details)
+        if self._pending is not None:
+            self._pending.append((account_id, risk_score, details))
+
+    # Public interface
+
+    def update(self, account_id: str, risk_score: float, **details):
+        """Set an account's score (and details such as risk_level); scores below min_score drop it"""
+        with self._lock:
+            self._apply(account_id, float(risk_score), details)
+
+    def update_scores(self, scores: pd.DataFrame, scored_at: Optional[str] = None):
+        """Risk score write listener: apply a score table indexed by account_id"""
+        factors = [name for name in FACTOR_NAMES if name in scores.columns]
+        with self._lock:
+            for account_id, row in zip(scores.index, scores.to_dict('records')):
+                self._apply(str(account_id), float(row['risk_score']), {
+                    "risk_level": row.get('risk_level'),
+                    "factor_scores": {name: float(row[name]) for name in factors},
+                    "scored_at": scored_at
+                })
+
+    def rebuild(self, rows: Optional[List[Dict]] = None):
+        """
+        Replace the contents with stored score rows (from the loader when rows is
+        None); updates made while the loader runs are applied after the rows
+        """
+        if rows is None and self.loader is None:
+            return
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                if rows is None:
+                    rows = self.loader()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._heap, self._position, self._details = [], {}, {}
+                for row in rows:
+                    self._set(row['account_id'], float(row['risk_score']), {
+                        key: row.get(key) for key in ('risk_level', 'factor_scores', 'scored_at')
+                    })
+                for account_id, risk_score, details in pending:
+                    self._set(account_id, risk_score, details)
+                self._synced_at = time.monotonic()
+        logger.info(f"Risk leaderboard rebuilt with {len(self._heap)} accounts")
+
+    def _maybe_resync(self):
+        """Start a background rebuild when the last one is older than resync_seconds"""
+        if self.loader is None:
+            return
+        with self._lock:
+            synced_at = self._synced_at
+            if self._resyncing or (synced_at is not None and time.monotonic() - synced_at < self.resync_seconds):
+                return
+            self._resyncing = True
+        threading.Thread(target=self._resync, name='risk-leaderboard-resync', daemon=True).start()
+
+    def _resync(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error(f"Error rebuilding risk leaderboard: {e}")
+            with self._lock:
+                self._synced_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._resyncing = False
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """The highest-scoring accounts, best first (ties by account id)"""
+        self._maybe_resync()
+        with self._lock:
+            best = heapq.nsmallest(limit, self._heap, key=lambda entry: (-entry[0], entry[1]))
+            return [{"account_id": account_id, "risk_score": risk_score, **self._details.get(account_id, {})}
+                    for risk_score, account_id in best]
+
+    def count(self) -> int:
+        """Number of accounts at or above min_score (at most capacity)"""
+        self._maybe_resync()
+        with self._lock:
+            return len(self._heap)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "accounts": len(self._heap),
+                "capacity": self.capacity,
+                "min_score": self.min_score,
+                "full": len(self._heap) >= self.capacity,
+                "evicted": self._evicted,
+                "seconds_since_sync": (round(time.monotonic() - self._synced_at, 1)
+                                       if self._synced_at is not None else None)
+            }
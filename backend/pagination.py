@@ -0,0 +1,74 @@
+"""
+Keyset Pagination
+Opaque cursors over a stable sort key, and NDJSON streaming that walks the
+pages one query at a time, so large result endpoints hold at most one page
+in memory and clients see the first rows as soon as the first page is read.
+"""
+
+import base64
+import json
+import logging
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Response, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# fetch_page(limit, after_key) -> rows sorted by the key, each carrying its own "cursor"
+PageFetcher = Callable[[int, Optional[list]], List[Dict]]
+
+
+def encode_cursor(key: Sequence) -> str:
+    """Encode a sort key as an opaque URL-safe cursor"""
+    raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], key_size: Optional[int] = None) -> Optional[list]:
+    """Decode a cursor back into its sort key; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or not key or (key_size and len(key) != key_size):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def fetch_page(fetch: PageFetcher, limit: int, after: Optional[list] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Fetch one page and the cursor of the next (None on the last page)"""
+    rows = fetch(limit + 1, after)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]['cursor']
+    return rows, None
+
+
+def iter_pages(fetch: PageFetcher, page_size: int, after: Optional[list] = None) -> Iterator[Dict]:
+    """Yield every row from after onwards, reading page_size rows per query"""
+    while True:
+        rows = fetch(page_size, after)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = decode_cursor(rows[-1]['cursor'])
+
+
+def wants_ndjson(request) -> bool:
+    """Whether the client asked for a streamed NDJSON response"""
+    return (request.args.get('format') == 'ndjson' or
+            NDJSON_MIMETYPE in request.headers.get('Accept', ''))
+
+
+def ndjson_response(rows: Iterator[Dict]) -> Response:
+    """Stream rows as newline-delimited JSON"""
+    def generate():
+        for row in rows:
+            yield json.dumps(row, default=str) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,382 @@
+"""
+Partitioned Graph Analytics
+Full-graph detectors run over independent pieces of the exported edge table in
+parallel worker processes. A partitioner splits the graph so that no result
+can span two pieces, each piece is handed to the detector as an array of edge
+positions, and the per-piece rows are merged in a fixed order, so the output
+does not depend on the number of workers or on which piece finishes first.
+
+Cycle detection partitions by weakly connected component after trimming every
+node that cannot lie on a cycle (no incoming or no outgoing qualifying edge):
+a cycle never leaves its strongly connected component, which sits inside one
+such component. Each cycle is reported by the partition that owns its smallest
+node, so a giant component can be shared between partitions by root. The
+partition count is fixed rather than derived from the worker count, so the
+pieces, and any per-piece cap on results, are the same for every pool size.
+A summary of the latest cycle run is saved in the work directory, where the
+API's global dashboard reads its cycle count.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from batch_scoring import EdgeTable
+from pattern_indicators import cycle_indicators
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CYCLES_PER_PARTITION = 10000
+DEFAULT_NUM_PARTITIONS = 64
+
+# Summary of the latest cycle run, in the work directory
+CYCLE_SUMMARY_FILE = 'circular_flows_summary.json'
+
+# Per-process state, set once by _init_worker
+_worker_edges: Optional[EdgeTable] = None
+
+
+@dataclass
+class Partition:
+    """
+    One independent piece of the graph: positions of its edges in the edge table,
+    and the nodes (account codes) whose results this piece reports. A component
+    too large for one piece is shared by several, each reporting for a subset
+    of its nodes.
+    """
+    index: int
+    edges: np.ndarray
+    roots: np.ndarray
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.roots)
+
+
+def _init_worker(edges_directory: str):
+    """Memory-map the exported edges once per worker process"""
+    global _worker_edges
+    _worker_edges = EdgeTable.load(edges_directory)
+
+
+def _run_detector(detector: Callable, partition: Partition, params: Dict) -> Tuple[int, List[Dict]]:
+    return partition.index, detector(_worker_edges, partition, params)
+
+
+def weak_component_labels(src: np.ndarray, dst: np.ndarray, num_nodes: int) -> np.ndarray:
+    """Smallest node id of each node's weakly connected component (min-label propagation)"""
+    labels = np.arange(num_nodes, dtype=np.int64)
+    while True:
+        previous = labels.copy()
+        smallest = np.minimum(labels[src], labels[dst])
+        np.minimum.at(labels, src, smallest)
+        np.minimum.at(labels, dst, smallest)
+        # Pointer jumping shortcuts long chains of labels
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def trim_acyclic(src: np.ndarray, dst: np.ndarray, num_nodes: int) -> np.ndarray:
+    """Mask of the edges left after repeatedly removing nodes without in- or out-edges"""
+    alive = src != dst
+    while True:
+        has_in = np.bincount(dst[alive], minlength=num_nodes) > 0
+        has_out = np.bincount(src[alive], minlength=num_nodes) > 0
+        keep = alive & has_in[src] & has_out[src] & has_in[dst] & has_out[dst]
+        if np.array_equal(keep, alive):
+            return alive
+        alive = keep
+
+
+def pack_components(edge_positions: np.ndarray, src: np.ndarray, dst: np.ndarray,
+                    edge_labels: np.ndarray, num_partitions: int) -> List[Partition]:
+    """
+    Group components into at most num_partitions pieces of similar edge count
+    (heaviest first onto the lightest piece; ties broken by label). A component
+    heavier than an even share is split into shards by root, every shard
+    carrying all of the component's edges and every k-th of its nodes as roots.
+    """
+    if not len(edge_positions):
+        return []
+
+    order = np.argsort(edge_labels, kind='stable')
+    component_ids, starts, sizes = np.unique(edge_labels[order], return_index=True, return_counts=True)
+    share = max(len(edge_positions) // num_partitions, 1)
+
+    # (weight, label, shard, component, number of shards)
+    items = []
+    for component, size in enumerate(sizes.tolist()):
+        shards = min(-(-size // share), num_partitions)
+        items.extend((size / shards, int(component_ids[component]), shard, component, shards)
+                     for shard in range(shards))
+    items.sort(key=lambda item: (-item[0], item[1], item[2]))
+
+    loads = np.zeros(num_partitions)
+    assigned: List[List[Tuple]] = [[] for _ in range(num_partitions)]
+    for item in items:
+        target = int(np.argmin(loads))
+        assigned[target].append(item)
+        loads[target] += item[0]
+
+    def members(component):
+        return order[starts[component]:starts[component] + sizes[component]]
+
+    nodes = {}
+    partitions = []
+    for pieces in assigned:
+        if not pieces:
+            continue
+        roots = []
+        for _, _, shard, component, shards in pieces:
+            if component not in nodes:
+                nodes[component] = np.unique(np.concatenate([src[members(component)], dst[members(component)]]))
+            roots.append(nodes[component][shard::shards])
+        components = sorted({item[3] for item in pieces})
+        positions = np.sort(edge_positions[np.concatenate([members(c) for c in components])])
+        partitions.append(Partition(len(partitions), positions, np.sort(np.concatenate(roots))))
+    return partitions
+
+
+def cycle_partitions(edges: EdgeTable, min_amount: float = 0.0, until: Optional[int] = None,
+                     max_degree: Optional[int] = None, num_partitions: int = 1) -> List[Partition]:
+    """Partitions holding every edge that can lie on a qualifying cycle"""
+    qualifies = np.asarray(edges.amount) >= min_amount
+    if until is not None:
+        qualifies &= np.asarray(edges.timestamp) <= until
+    orig, dest = np.asarray(edges.orig), np.asarray(edges.dest)
+    if max_degree is not None:
+        # Supernodes (by degree over all their transactions) are never traversed
+        degree = (np.bincount(orig, minlength=edges.num_accounts) +
+                  np.bincount(dest, minlength=edges.num_accounts))
+        qualifies &= (degree[orig] < max_degree) & (degree[dest] < max_degree)
+
+    positions = np.flatnonzero(qualifies)
+    src, dst = orig[positions], dest[positions]
+    cyclic = trim_acyclic(src, dst, edges.num_accounts)
+    positions, src, dst = positions[cyclic], src[cyclic], dst[cyclic]
+
+    labels = weak_component_labels(src, dst, edges.num_accounts)
+    return pack_components(positions, src, dst, labels[src], num_partitions)
+
+
+def detect_cycles(edges: EdgeTable, partition: Partition, params: Dict) -> List[Dict]:
+    """
+    Simple cycles of 2..max_cycle_length edges whose smallest account code is
+    one of the partition's roots, each reported once, starting from that node.
+    Parallel transactions between the same accounts give distinct cycles. Unlike the Cypher query, which also
+    returns every rotation of a cycle and closed walks through a node twice,
+    each simple cycle appears exactly once.
+    """
+    max_length = params.get('max_cycle_length', 8)
+    max_cycles = params.get('max_cycles', DEFAULT_MAX_CYCLES_PER_PARTITION)
+
+    positions = partition.edges
+    src = np.asarray(edges.orig[positions])
+    dst = np.asarray(edges.dest[positions])
+    adjacency: Dict[int, List[Tuple[int, int]]] = {}
+    predecessors: Dict[int, List[int]] = {}
+    for position, u, v in zip(positions.tolist(), src.tolist(), dst.tolist()):
+        adjacency.setdefault(u, []).append((v, position))
+        predecessors.setdefault(v, []).append(u)
+
+    cycles = []
+    for root in partition.roots.tolist():
+        if root not in adjacency:
+            continue
+        # Hops back to the root through nodes above it; paths that cannot close in time are cut
+        hops_back = _hops_to_root(predecessors, root, max_length - 1)
+
+        # Depth-first over nodes above the root, so each cycle is found from its smallest node only
+        path_nodes, path_edges, on_path = [root], [], {root}
+        stack = [iter(adjacency[root])]
+        while stack and len(cycles) < max_cycles:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                if path_edges:
+                    path_edges.pop()
+                    on_path.discard(path_nodes.pop())
+                continue
+
+            node, position = step
+            if node == root and path_edges:
+                cycles.append(_cycle_row(edges, path_nodes, path_edges + [position], partition.index))
+            elif (node > root and node not in on_path
+                  and len(path_edges) + 1 + hops_back.get(node, max_length) <= max_length):
+                path_nodes.append(node)
+                path_edges.append(position)
+                on_path.add(node)
+                stack.append(iter(adjacency.get(node, ())))
+
+        if len(cycles) >= max_cycles:
+            logger.warning(f"Partition {partition.index} reached {max_cycles} cycles; truncated")
+            break
+    return cycles
+
+
+def _hops_to_root(predecessors: Dict[int, List[int]], root: int, max_hops: int) -> Dict[int, int]:
+    """Shortest hop count from each node above the root back to it, up to max_hops"""
+    hops = {root: 0}
+    frontier = [root]
+    for level in range(1, max_hops + 1):
+        next_frontier = []
+        for node in frontier:
+            for predecessor in predecessors.get(node, ()):
+                if predecessor > root and predecessor not in hops:
+                    hops[predecessor] = level
+                    next_frontier.append(predecessor)
+        frontier = next_frontier
+    return hops
+
+
+def _cycle_row(edges: EdgeTable, nodes: List[int], positions: List[int], partition: int) -> Dict:
+    amounts = [float(edges.amount[p]) for p in positions]
+    timestamps = [int(edges.timestamp[p]) for p in positions]
+    account_ids = [str(edges.account_ids[node]) for node in nodes]
+    return {
+        "root_account": account_ids[0],
+        "nodes": account_ids + [account_ids[0]],
+        "amounts": amounts,
+        "timestamps": timestamps,
+        "total_amount": sum(amounts),
+        "cycle_length": len(positions),
+        "time_span": max(timestamps) - min(timestamps),
+        "cycle_key": ':'.join(str(p) for p in positions),
+        "partition": partition
+    }
+
+
+def cycle_sort_key(cycle: Dict) -> Tuple:
+    """Largest cycles first, then by their edges, independent of partition order"""
+    return (-cycle['total_amount'], cycle['cycle_key'])
+
+
+class PartitionedRunner:
+    """Runs a detector over partitions on a local process pool and merges the rows"""
+
+    def __init__(self, edges_directory: str, workers: Optional[int] = None):
+        self.edges_directory = edges_directory
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self, detector: Callable, partitions: List[Partition], params: Dict,
+            sort_key: Callable[[Dict], Tuple], limit: Optional[int] = None) -> List[Dict]:
+        """Detector rows from every partition, merged by sort_key (deterministic)"""
+        if not partitions:
+            return []
+
+        rows: List[Dict] = []
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(partitions)), initializer=_init_worker,
+                                 initargs=(self.edges_directory,)) as pool:
+            for _, partition_rows in pool.map(_run_detector, [detector] * len(partitions),
+                                               partitions, [params] * len(partitions)):
+                rows.extend(partition_rows)
+
+        rows.sort(key=sort_key)
+        return rows[:limit] if limit is not None else rows
+
+
+def find_circular_flows(edges_directory: str, min_amount: float = 5000, max_cycle_length: int = 8,
+                        until: Optional[int] = None, max_degree: Optional[int] = None,
+                        workers: Optional[int] = None, limit: Optional[int] = None,
+                        num_partitions: int = DEFAULT_NUM_PARTITIONS) -> Dict:
+    """Partition-parallel counterpart of detect_circular_transactions over an exported edge table"""
+    started = time.time()
+    runner = PartitionedRunner(edges_directory, workers)
+    edges = EdgeTable.load(edges_directory)
+    partitions = cycle_partitions(edges, min_amount=min_amount, until=until,
+                                  max_degree=max_degree, num_partitions=num_partitions)
+    cycles = runner.run(detect_cycles, partitions, {"max_cycle_length": max_cycle_length},
+                        sort_key=cycle_sort_key, limit=limit)
+    for cycle_id, cycle in enumerate(cycles):
+        cycle['cycle_id'] = cycle_id
+    return {
+        "cycles": cycles,
+        "total_cycles": len(cycles),
+        "partitions": len(partitions),
+        "partition_edges": [int(len(p.edges)) for p in partitions],
+        "workers": runner.workers,
+        "duration_seconds": round(time.time() - started, 2)
+    }
+
+
+def save_cycle_summary(work_dir: str, result: Dict, parameters: Dict):
+    """Record the size of a cycle run (written to a temporary file, then renamed)"""
+    cycles = result['cycles']
+    summary = {
+        "total_cycles": result['total_cycles'],
+        "cycle_accounts": len({node for cycle in cycles for node in cycle['nodes']}),
+        "truncated": parameters.get('limit') is not None and result['total_cycles'] >= parameters['limit'],
+        "parameters": parameters,
+        "computed_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()),
+        "duration_seconds": result['duration_seconds']
+    }
+    path = os.path.join(work_dir, CYCLE_SUMMARY_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    os.replace(path + '.tmp', path)
+
+
+def load_cycle_summary(work_dir: str) -> Optional[Dict]:
+    """The summary of the latest cycle run, or None if there has been none"""
+    path = os.path.join(work_dir, CYCLE_SUMMARY_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error reading cycle run summary {path}: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    from config import Config
+    from graph_db import db_provider
+
+    parser = argparse.ArgumentParser(description="Detect circular money flows across the whole graph in parallel.")
+    parser.add_argument('--work-dir', type=str, default=Config.PARTITIONED_ANALYTICS_WORK_DIR,
+                        help="Directory holding (or receiving) the exported edges")
+    parser.add_argument('--export', action='store_true', help="Export the edges again before running")
+    parser.add_argument('--min-amount', type=float, default=5000)
+    parser.add_argument('--max-cycle-length', type=int, default=8)
+    parser.add_argument('--as-of', type=int, default=None,
+                        help="Only use transactions up to this timestamp")
+    parser.add_argument('--workers', type=int, default=Config.PARTITIONED_ANALYTICS_WORKERS or None,
+                        help="Worker processes (default: all cores)")
+    parser.add_argument('--partitions', type=int, default=DEFAULT_NUM_PARTITIONS,
+                        help="Graph pieces to split the work into (fixed, so results match for any worker count)")
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL, 'INFO'),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    edges_directory = os.path.join(args.work_dir, 'edges')
+    if args.export or not os.path.isdir(edges_directory):
+        # strict: a database error fails the job rather than saving a truncated export
+        EdgeTable.from_frames(db_provider.iter_transactions(strict=True)).save(edges_directory)
+
+    result = find_circular_flows(
+        edges_directory, min_amount=args.min_amount, max_cycle_length=args.max_cycle_length,
+        until=args.as_of, max_degree=Config.SUPERNODE_DEGREE_THRESHOLD,
+        workers=args.workers, limit=args.limit, num_partitions=args.partitions
+    )
+    for cycle in result['cycles']:
+        cycle['layering_indicators'] = cycle_indicators(cycle['amounts'], cycle['timestamps'])
+    save_cycle_summary(args.work_dir, result, {
+        "min_amount": args.min_amount, "max_cycle_length": args.max_cycle_length,
+        "as_of": args.as_of, "limit": args.limit
+    })
+    print(json.dumps(result, indent=2))
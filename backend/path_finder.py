@@ -0,0 +1,117 @@
+"""
+Value-Weighted Path Finder
+Beam search over outgoing transactions that keeps only the highest-value partial
+paths at each depth, so trace queries return the top-k flows without
+enumerating every path in the neighbourhood.
+"""
+
+import heapq
+import logging
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+RANK_BY_TOTAL = 'total'
+RANK_BY_BOTTLENECK = 'bottleneck'
+RANK_MODES = (RANK_BY_TOTAL, RANK_BY_BOTTLENECK)
+
+DEFAULT_BEAM_WIDTH = 200
+DEFAULT_FAN_OUT = 50
+
+# fetch_edges({node: earliest_timestamp}) -> {node: [(target, type, amount, timestamp), ...]}
+EdgeFetcher = Callable[[Dict[str, float]], Dict[str, List[Tuple[str, str, float, float]]]]
+
+
+@dataclass(frozen=True)
+class FlowPath:
+    """A transaction path from the source with its value summaries"""
+    nodes: Tuple[str, ...]
+    types: Tuple[str, ...]
+    amounts: Tuple[float, ...]
+    timestamps: Tuple[float, ...]
+    total_amount: float
+    bottleneck_amount: float
+
+    @property
+    def depth(self) -> int:
+        return len(self.amounts)
+
+    def score(self, rank_by: str) -> float:
+        return self.bottleneck_amount if rank_by == RANK_BY_BOTTLENECK else self.total_amount
+
+    def extend(self, target: str, rel_type: str, amount: float, timestamp: float) -> 'FlowPath':
+        return FlowPath(
+            nodes=self.nodes + (target,),
+            types=self.types + (rel_type,),
+            amounts=self.amounts + (amount,),
+            timestamps=self.timestamps + (timestamp,),
+            total_amount=self.total_amount + amount,
+            bottleneck_amount=min(self.bottleneck_amount, amount)
+        )
+
+
+def find_top_paths(source: str, fetch_edges: EdgeFetcher, max_depth: int = 5, top_k: int = 50,
+                   rank_by: str = RANK_BY_TOTAL, min_depth: int = 1, time_ordered: bool = True,
+                   beam_width: int = DEFAULT_BEAM_WIDTH) -> List[FlowPath]:
+    """
+    Return the top_k simple paths from source ranked by total or bottleneck amount.
+
+    Each depth level issues one fetch_edges call for the whole beam, so a search
+    costs at most max_depth round trips. With time_ordered, every hop must occur
+    no earlier than the previous one.
+    """
+    if rank_by not in RANK_MODES:
+        raise ValueError(f"rank_by must be one of {RANK_MODES}")
+
+    beam = [FlowPath((source,), (), (), (), 0.0, math.inf)]
+    # Min-heap of (score, tie_breaker, path) holding the best top_k complete paths
+    results: List[Tuple[float, int, FlowPath]] = []
+    counter = 0
+
+    for depth in range(1, max_depth + 1):
+        frontier: Dict[str, float] = {}
+        for path in beam:
+            last_ts = path.timestamps[-1] if (time_ordered and path.timestamps) else -math.inf
+            node = path.nodes[-1]
+            frontier[node] = min(frontier.get(node, math.inf), last_ts)
+
+        edges_by_node = fetch_edges(frontier)
+        if not edges_by_node:
+            break
+
+        candidates: List[Tuple[float, int, FlowPath]] = []
+        for path in beam:
+            last_ts = path.timestamps[-1] if path.timestamps else -math.inf
+            for target, rel_type, amount, timestamp in edges_by_node.get(path.nodes[-1], ()):
+                if target in path.nodes:
+                    continue
+                if time_ordered and timestamp < last_ts:
+                    continue
+
+                extended = path.extend(target, rel_type, amount, timestamp)
+                score = extended.score(rank_by)
+
+                # Bottleneck can only shrink, so paths already below the k-th result are dead
+                if (rank_by == RANK_BY_BOTTLENECK and len(results) >= top_k
+                        and score <= results[0][0]):
+                    continue
+
+                counter += 1
+                if depth >= min_depth:
+                    if len(results) < top_k:
+                        heapq.heappush(results, (score, counter, extended))
+                    elif score > results[0][0]:
+                        heapq.heapreplace(results, (score, counter, extended))
+
+                if len(candidates) < beam_width:
+                    heapq.heappush(candidates, (score, counter, extended))
+                elif score > candidates[0][0]:
+                    heapq.heapreplace(candidates, (score, counter, extended))
+
+        if not candidates:
+            break
+        beam = [path for _, _, path in candidates]
+
+    return [path for _, _, path in sorted(results, key=lambda item: (-item[0], item[1]))]
@@ -0,0 +1,83 @@
+"""
+Path and Cycle Indicators
+Suspicion indicators of transaction paths and cycles from their amounts and
+timestamps. The functions never touch the database, so a page of cycles can
+be analyzed on the analytics pool; a batch travels as flat amount and
+timestamp arrays with row offsets rather than as a list of dicts.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def path_indicators(amounts: Sequence[float], timestamps: Sequence[int]) -> List[str]:
+    """Analyze a transaction path for suspicious indicators"""
+    indicators = []
+
+    # Check for amount patterns
+    if amounts:
+        # Rapid value decrease (potential layering)
+        if len(amounts) > 2 and amounts[0] > amounts[-1] * 2:
+            indicators.append("Rapid value decrease through chain")
+
+        # Round amounts (potential structuring)
+        round_amounts = sum(1 for amount in amounts if amount % 1000 == 0)
+        if round_amounts / len(amounts) > 0.7:
+            indicators.append("High percentage of round amounts")
+
+    # Check for timing patterns
+    if timestamps and len(timestamps) > 1:
+        time_diffs = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
+        avg_time_diff = sum(time_diffs) / len(time_diffs)
+
+        # Very rapid transactions
+        if avg_time_diff < 3600:  # Less than 1 hour average
+            indicators.append("Rapid sequential transactions")
+
+    return indicators
+
+
+def cycle_indicators(amounts: Sequence[float], timestamps: Sequence[int]) -> List[str]:
+    """Analyze a circular transaction pattern"""
+    indicators = []
+
+    if amounts:
+        # Check if amounts decrease through the cycle (fee skimming)
+        if amounts[0] > amounts[-1]:
+            loss_percentage = (amounts[0] - amounts[-1]) / amounts[0] * 100
+            indicators.append(f"Value loss through cycle: {loss_percentage:.1f}%")
+
+        # Check for consistent amounts (automated behavior)
+        amount_variance = np.var(amounts) if len(amounts) > 1 else 0
+        if amount_variance < np.mean(amounts) * 0.1:
+            indicators.append("Highly consistent transaction amounts")
+
+    if timestamps:
+        # Check for regular timing
+        if len(timestamps) > 2:
+            time_diffs = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps)-1)]
+            if np.std(time_diffs) < np.mean(time_diffs) * 0.2:
+                indicators.append("Regular transaction timing pattern")
+
+    return indicators
+
+
+def pack_rows(rows: Sequence[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flat amounts and timestamps of rows (each with 'amounts' and 'timestamps'), plus row offsets"""
+    lengths = [len(row['amounts']) for row in rows]
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    amounts = np.fromiter((amount for row in rows for amount in row['amounts']),
+                          dtype=np.float64, count=int(offsets[-1]))
+    timestamps = np.fromiter((timestamp for row in rows for timestamp in row['timestamps']),
+                             dtype=np.int64, count=int(offsets[-1]))
+    return amounts, timestamps, offsets
+
+
+def analyze_cycles(amounts: np.ndarray, timestamps: np.ndarray, offsets: np.ndarray) -> List[List[str]]:
+    """cycle_indicators of every packed row, in order"""
+    return [
+        cycle_indicators(amounts[start:stop].tolist(), timestamps[start:stop].tolist())
+        for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
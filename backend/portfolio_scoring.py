@@ -0,0 +1,198 @@
+"""
+Portfolio Risk Scoring Job
+Nightly batch scoring of every account. The edge table is exported once to
+memory-mapped column files, accounts are split into contiguous code ranges,
+and the ranges are scored column-wise in parallel worker processes. Scores are
+written back in bulk and each finished range is checkpointed, so an
+interrupted run resumes where it stopped.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from advanced_risk_scorer import AdvancedRiskScorer, HISTORY_LIMIT, NETWORK_EDGE_LIMIT
+from batch_scoring import EdgeTable, TransactionTable, score_table
+from screening import ScreeningEngine
+from risk_rules import RuleEngine
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = 'checkpoint.json'
+EDGES_DIRECTORY = 'edges'
+
+# Per-process state, set once by _init_worker
+_worker_edges: Optional[EdgeTable] = None
+_worker_scorer: Optional[AdvancedRiskScorer] = None
+
+
+def _init_worker(edges_directory: str, screening: Optional[Dict] = None, risk_rules_path: Optional[str] = None):
+    """Memory-map the exported edges and load the screening lists and risk rules once per worker process"""
+    global _worker_edges, _worker_scorer
+    _worker_edges = EdgeTable.load(edges_directory)
+    # Only the factor rules and weights are used, never the database; the
+    # rule file is rechecked as ranges are scored, so edits apply without a restart
+    _worker_scorer = AdvancedRiskScorer(
+        None,
+        screening=ScreeningEngine(**screening) if screening else None,
+        risk_rules=RuleEngine(risk_rules_path) if risk_rules_path else None
+    )
+
+
+def _score_range(start: int, stop: int) -> pd.DataFrame:
+    """Score accounts start..stop-1 (by code) in a worker process"""
+    table = TransactionTable.from_edges(_worker_edges, start, stop, limit=HISTORY_LIMIT)
+    return score_table(table, _worker_scorer, NETWORK_EDGE_LIMIT)
+
+
+class PortfolioScoringJob:
+    """Resumable, parallel full-portfolio risk scoring"""
+
+    def __init__(self, db_provider, work_dir: str, chunk_size: int = 50000,
+                 workers: Optional[int] = None, as_of: Optional[int] = None,
+                 screening: Optional[Dict] = None, risk_rules_path: Optional[str] = None):
+        self.db_provider = db_provider
+        self.work_dir = work_dir
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.as_of = as_of
+        # ScreeningEngine arguments (list paths) for the workers; lists are not consulted when None
+        self.screening = screening
+        self.risk_rules_path = risk_rules_path
+
+    @property
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.work_dir, CHECKPOINT_FILE)
+
+    @property
+    def _edges_directory(self) -> str:
+        return os.path.join(self.work_dir, EDGES_DIRECTORY)
+
+    def run(self, resume: bool = True) -> Dict:
+        """Score every account, skipping ranges already completed by an interrupted run"""
+        started = time.time()
+        checkpoint = self._load_checkpoint() if resume else None
+        if checkpoint is None:
+            checkpoint = self._start_run()
+
+        ranges = self._ranges(checkpoint['num_accounts'])
+        completed = set(checkpoint['completed'])
+        pending = [(index, bounds) for index, bounds in enumerate(ranges) if index not in completed]
+        logger.info(f"Portfolio scoring run {checkpoint['run_id']}: {len(pending)} of "
+                    f"{len(ranges)} account ranges pending on {self.workers} workers")
+
+        scored = 0
+        levels: Dict[str, int] = {}
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self._edges_directory, self.screening,
+                                               self.risk_rules_path)) as pool:
+                futures = {pool.submit(_score_range, *bounds): index for index, bounds in pending}
+                for future in as_completed(futures):
+                    scores = future.result()
+                    self.db_provider.write_risk_scores(scores, scored_at=checkpoint['scored_at'])
+
+                    checkpoint['completed'].append(futures[future])
+                    self._save_checkpoint(checkpoint)
+                    scored += len(scores)
+                    for level, count in scores['risk_level'].value_counts().items():
+                        levels[level] = levels.get(level, 0) + int(count)
+
+        return {
+            "run_id": checkpoint['run_id'],
+            "as_of": checkpoint['as_of'],
+            "total_accounts": checkpoint['num_accounts'],
+            "total_ranges": len(ranges),
+            "resumed_ranges": len(completed),
+            "accounts_scored": scored,
+            "risk_levels": levels,
+            "duration_seconds": round(time.time() - started, 2)
+        }
+
+    def _start_run(self) -> Dict:
+        """Export the edge table and write a fresh checkpoint"""
+        # A failed export raises before any checkpoint exists, so the run fails
+        # instead of scoring (and checkpointing) a truncated graph
+        logger.info("Exporting transaction edges for portfolio scoring")
+        edges = EdgeTable.from_frames(self.db_provider.iter_transactions(until=self.as_of, strict=True))
+        edges.save(self._edges_directory)
+
+        now = datetime.utcnow()
+        checkpoint = {
+            "run_id": now.strftime('%Y%m%dT%H%M%S'),
+            "scored_at": now.isoformat(),
+            "as_of": self.as_of,
+            "chunk_size": self.chunk_size,
+            "num_accounts": edges.num_accounts,
+            "completed": []
+        }
+        self._save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _load_checkpoint(self) -> Optional[Dict]:
+        """The previous run's checkpoint, if it can be resumed with these settings"""
+        try:
+            with open(self._checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if checkpoint.get('chunk_size') != self.chunk_size or checkpoint.get('as_of') != self.as_of:
+            logger.info("Checkpoint settings differ from this run; starting over")
+            return None
+        if not os.path.isdir(self._edges_directory):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict):
+        # Write then rename, so a crash never leaves a truncated checkpoint
+        os.makedirs(self.work_dir, exist_ok=True)
+        temporary = self._checkpoint_path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(temporary, self._checkpoint_path)
+
+    def _ranges(self, num_accounts: int) -> List[Tuple[int, int]]:
+        return [(start, min(start + self.chunk_size, num_accounts))
+                for start in range(0, num_accounts, self.chunk_size)]
+
+
+if __name__ == '__main__':
+    from config import Config
+    from graph_db import db_provider
+
+    parser = argparse.ArgumentParser(description="Score the risk of every account in the graph.")
+    parser.add_argument('--work-dir', type=str, default=Config.PORTFOLIO_SCORING_WORK_DIR,
+                        help="Directory for the exported edges and the checkpoint")
+    parser.add_argument('--chunk-size', type=int, default=Config.PORTFOLIO_SCORING_CHUNK_SIZE,
+                        help="Accounts per scoring range")
+    parser.add_argument('--workers', type=int, default=Config.PORTFOLIO_SCORING_WORKERS or None,
+                        help="Worker processes (default: all cores)")
+    parser.add_argument('--as-of', type=int, default=None,
+                        help="Score the graph as it stood at this timestamp")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore any checkpoint and export the edges again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL, 'INFO'),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # Open and rescore investigation cases as each range is written
+    from case_store import CaseStore
+    case_store = CaseStore(Config.CASE_STORE_PATH, min_score=Config.CASE_MIN_RISK_SCORE)
+    db_provider.add_risk_score_listener(case_store.upsert_scores)
+
+    job = PortfolioScoringJob(db_provider, args.work_dir, chunk_size=args.chunk_size,
+                              workers=args.workers, as_of=args.as_of,
+                              screening={"sanctions_path": Config.SANCTIONS_LIST_PATH,
+                                         "pep_path": Config.PEP_LIST_PATH,
+                                         "max_distance": Config.SCREENING_MAX_DISTANCE},
+                              risk_rules_path=Config.RISK_RULES_PATH)
+    print(json.dumps(job.run(resume=not args.restart), indent=2))
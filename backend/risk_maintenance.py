@@ -0,0 +1,129 @@
+"""
+Incremental Risk Score Maintenance
+Keeps the risk scores stored on Account nodes current as transactions arrive.
+Every ingested batch marks the accounts it touches as dirty; a background
+thread rescores dirty accounts once they have been quiet for a debounce
+period (or have waited the maximum delay, so constantly active accounts are
+still refreshed) and writes scores, levels and factor breakdowns back in bulk.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class RiskScoreMaintainer:
+    """Debounced background rescoring of accounts touched by ingestion"""
+
+    def __init__(self, risk_scorer, db_provider, debounce_seconds: float = 30.0,
+                 max_delay_seconds: float = 300.0, batch_size: int = 500, poll_seconds: float = 5.0):
+        self.risk_scorer = risk_scorer
+        self.db_provider = db_provider
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # account_id -> [first dirtied, last touched] (monotonic seconds)
+        self._dirty: Dict[str, List[float]] = {}
+        self._stats = {"marked": 0, "rescored": 0, "failed_batches": 0, "last_run": None}
+
+    def ingest_dataframe(self, df: pd.DataFrame):
+        """Ingestion listener: mark both parties of every transaction as dirty"""
+        if df is None or df.empty:
+            return
+        accounts = pd.unique(pd.concat([df['nameOrig'], df['nameDest']]).astype(str))
+        self.mark_dirty(accounts)
+
+    def mark_dirty(self, account_ids):
+        """Schedule accounts for rescoring"""
+        now = time.monotonic()
+        with self._lock:
+            for account_id in account_ids:
+                entry = self._dirty.get(account_id)
+                if entry is None:
+                    self._dirty[account_id] = [now, now]
+                else:
+                    entry[1] = now
+            self._stats["marked"] += len(account_ids)
+
+    def _take_due(self, now: float, force: bool = False) -> List[str]:
+        """Remove and return up to batch_size accounts whose debounce has expired"""
+        with self._lock:
+            due = [account_id for account_id, (first, last) in self._dirty.items()
+                   if force or now - last >= self.debounce_seconds or now - first >= self.max_delay_seconds]
+            due = due[:self.batch_size]
+            for account_id in due:
+                del self._dirty[account_id]
+            return due
+
+    def run_once(self, force: bool = False) -> int:
+        """Rescore one batch of due accounts (all dirty ones when force); returns the number rescored"""
+        account_ids = self._take_due(time.monotonic(), force)
+        if not account_ids:
+            return 0
+
+        try:
+            scores = self.risk_scorer.calculate_batch_risk_table(account_ids)
+            self.db_provider.write_risk_scores(scores, scored_at=datetime.utcnow().isoformat())
+        except Exception as e:
+            logger.error(f"Error rescoring {len(account_ids)} dirty accounts: {e}")
+            # Put them back to be retried after the debounce
+            self.mark_dirty(account_ids)
+            with self._lock:
+                self._stats["failed_batches"] += 1
+            return 0
+
+        with self._lock:
+            self._stats["rescored"] += len(account_ids)
+            self._stats["last_run"] = datetime.utcnow().isoformat()
+        return len(account_ids)
+
+    def flush(self) -> int:
+        """Rescore every dirty account now, ignoring the debounce"""
+        total = 0
+        while True:
+            rescored = self.run_once(force=True)
+            if not rescored:
+                return total
+            total += rescored
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # Drain every due batch, then sleep until the next poll
+            while not self._stopped.is_set() and self.run_once():
+                pass
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def start(self):
+        """Start the background worker (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='risk-maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_stats(self) -> Dict:
+        """Pending dirty accounts and rescoring counts"""
+        with self._lock:
+            return {
+                "dirty_accounts": len(self._dirty),
+                "running": self._thread is not None and self._thread.is_alive(),
+                **self._stats
+            }
@@ -0,0 +1,258 @@
+"""
+Declarative Risk Rules
+Thresholds of the velocity, amount pattern, structural and temporal factors,
+and the weights of all factors, read from a rule file (JSON, or YAML when
+PyYAML is installed). Each rule adds its weight to a factor when all of its
+conditions (feature, operator, threshold) hold; a threshold is a number or
+another feature times a multiplier. Rules compile into NumPy mask
+expressions over the feature columns of batch_scoring, so one rule set
+scores a single account or a whole table, and the file is reloaded when it
+changes.
+"""
+
+import json
+import logging
+import operator
+import os
+import string
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from batch_scoring import FACTOR_NAMES, RULE_FACTORS, RULE_FEATURES
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'risk_rules.json')
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+DEFAULT_FACTOR_WEIGHT = 0.1
+
+Features = Dict[str, np.ndarray]
+
+
+@dataclass(frozen=True)
+class Condition:
+    feature: str
+    operator: str
+    threshold: float
+    threshold_feature: Optional[str] = None
+
+    def mask(self, features: Features) -> np.ndarray:
+        right = self.threshold
+        if self.threshold_feature is not None:
+            right = features[self.threshold_feature] * self.threshold
+        return OPERATORS[self.operator](features[self.feature], right)
+
+
+@dataclass(frozen=True)
+class Rule:
+    factor: str
+    name: str
+    conditions: Tuple[Condition, ...]
+    weight: float
+    evidence: Optional[str] = None
+
+    def mask(self, features: Features) -> np.ndarray:
+        masks = [condition.mask(features) for condition in self.conditions]
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+
+
+def _condition(spec: Dict, where: str) -> Condition:
+    feature, op = spec.get('feature'), spec.get('operator')
+    if feature not in RULE_FEATURES:
+        raise ValueError(f"{where}: unknown feature {feature!r}")
+    if op not in OPERATORS:
+        raise ValueError(f"{where}: unknown operator {op!r}")
+
+    threshold = spec.get('threshold')
+    if isinstance(threshold, dict):
+        if threshold.get('feature') not in RULE_FEATURES:
+            raise ValueError(f"{where}: unknown threshold feature {threshold.get('feature')!r}")
+        return Condition(feature, op, float(threshold.get('times', 1.0)), threshold['feature'])
+    if not isinstance(threshold, (int, float)):
+        raise ValueError(f"{where}: threshold must be a number or {{feature, times}}")
+    return Condition(feature, op, threshold)
+
+
+def _rule(factor: str, spec: Dict, position: int) -> Rule:
+    name = spec.get('name', f"{factor}_{position}")
+    where = f"rule {name}"
+    conditions = spec['all'] if 'all' in spec else [spec]
+    if not isinstance(conditions, list) or not conditions:
+        raise ValueError(f"{where}: no conditions")
+    if not all(isinstance(condition, dict) for condition in conditions):
+        raise ValueError(f"{where}: conditions must be mappings")
+    weight = spec.get('weight')
+    if not isinstance(weight, (int, float)):
+        raise ValueError(f"{where}: weight must be a number")
+    evidence = spec.get('evidence')
+    if evidence is not None:
+        _check_evidence(evidence, where)
+    return Rule(factor, name, tuple(_condition(condition, where) for condition in conditions),
+                float(weight), evidence)
+
+
+def _check_evidence(template, where: str):
+    """Evidence templates may only format rule features"""
+    if not isinstance(template, str):
+        raise ValueError(f"{where}: evidence must be a string")
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template) if field is not None]
+    except ValueError as e:
+        raise ValueError(f"{where}: invalid evidence template: {e}")
+    for field in fields:
+        feature = field.split('.')[0].split('[')[0]
+        if feature not in RULE_FEATURES:
+            raise ValueError(f"{where}: evidence uses unknown feature {field!r}")
+
+
+class RuleSet:
+    """A compiled rule file"""
+
+    def __init__(self, rules: List[Rule], weights: Dict[str, float], descriptions: Dict[str, str],
+                 version: Optional[str] = None):
+        self.rules = rules
+        self.weights = weights
+        self.descriptions = descriptions
+        self.version = version
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RuleSet':
+        """Compile a parsed rule file; raises ValueError naming the first invalid entry"""
+        if not isinstance(data, dict):
+            raise ValueError("rule file must be a mapping")
+        factors = data.get('factors')
+        if not isinstance(factors, dict):
+            raise ValueError("rule file needs a 'factors' mapping")
+
+        rules, weights, descriptions = [], {}, {}
+        for factor, spec in factors.items():
+            if factor not in FACTOR_NAMES:
+                raise ValueError(f"unknown factor {factor!r}")
+            if not isinstance(spec, dict):
+                raise ValueError(f"factor {factor!r} must be a mapping")
+            weight = spec.get('weight', DEFAULT_FACTOR_WEIGHT)
+            if not isinstance(weight, (int, float)):
+                raise ValueError(f"factor {factor!r}: weight must be a number")
+            weights[factor] = float(weight)
+            descriptions[factor] = spec.get('description', '')
+            factor_rules = spec.get('rules', [])
+            if not isinstance(factor_rules, list) or not all(isinstance(rule, dict) for rule in factor_rules):
+                raise ValueError(f"factor {factor!r}: rules must be a list of mappings")
+            if factor_rules and factor not in RULE_FACTORS:
+                raise ValueError(f"factor {factor!r} is not rule-based")
+            rules.extend(_rule(factor, rule, position) for position, rule in enumerate(factor_rules))
+        return cls(rules, weights, descriptions, data.get('version'))
+
+    @classmethod
+    def load(cls, path: str) -> 'RuleSet':
+        with open(path, encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                if not YAML_AVAILABLE:
+                    raise ValueError("PyYAML is required for YAML rule files")
+                try:
+                    return cls.from_dict(yaml.safe_load(f))
+                except yaml.YAMLError as e:
+                    raise ValueError(f"invalid YAML: {e}")
+            return cls.from_dict(json.load(f))
+
+    def weight(self, factor: str) -> float:
+        return self.weights.get(factor, DEFAULT_FACTOR_WEIGHT)
+
+    def evaluate(self, features: Features, size: int) -> Dict[str, np.ndarray]:
+        """Uncapped score of every rule-based factor for each of size accounts"""
+        scores = {factor: np.zeros(size) for factor in RULE_FACTORS}
+        for rule in self.rules:
+            scores[rule.factor] += rule.weight * rule.mask(features)
+        return scores
+
+    def explain(self, factor: str, features: Features, index: int = 0) -> Tuple[float, List[str]]:
+        """One account's uncapped factor score and the evidence of the rules that fired"""
+        values = {name: column[index].item() for name, column in features.items()}
+        score, evidence = 0.0, []
+        for rule in self.rules:
+            if rule.factor == factor and rule.mask(features)[index]:
+                score += rule.weight
+                if rule.evidence:
+                    evidence.append(rule.evidence.format(**values))
+        return score, evidence
+
+
+class RuleEngine:
+    """The current RuleSet of a rule file, reloaded when the file changes"""
+
+    def __init__(self, path: str = DEFAULT_RULES_PATH, reload_check_seconds: float = 5.0):
+        self.path = path
+        self.reload_check_seconds = reload_check_seconds
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[float, int]] = None
+        self._checked_at = time.monotonic()
+        self._loaded_at: Optional[str] = None
+        self._reloads = 0
+        # A broken rule file at startup is fatal; later it only keeps the previous rules
+        self._rules = RuleSet.load(path)
+        self._signature = self._stat()
+        self._loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    def _stat(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile the rule file if it changed (or when forced); returns whether it was replaced"""
+        with self._lock:
+            signature = self._stat()
+            self._checked_at = time.monotonic()
+            if signature is None or (not force and signature == self._signature):
+                return False
+            try:
+                rules = RuleSet.load(self.path)
+            except Exception as e:
+                logger.error(f"Error loading risk rules from {self.path}, keeping the previous ones: {e}")
+                self._signature = signature
+                return False
+
+            self._rules = rules
+            self._signature = signature
+            self._loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+            self._reloads += 1
+            logger.info(f"Risk rules reloaded: {len(rules.rules)} rules, version {rules.version}")
+            return True
+
+    def current(self) -> RuleSet:
+        """The rule set to use for one scoring pass (checks the file at most every reload_check_seconds)"""
+        if time.monotonic() - self._checked_at >= self.reload_check_seconds:
+            self.reload()
+        return self._rules
+
+    def get_stats(self) -> Dict:
+        rules = self._rules
+        return {
+            "path": self.path,
+            "version": rules.version,
+            "rules": len(rules.rules),
+            "weights": dict(rules.weights),
+            "loaded_at": self._loaded_at,
+            "reloads": self._reloads
+        }
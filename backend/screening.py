@@ -0,0 +1,262 @@
+"""
+Sanctions and PEP Screening
+Screens account names against sanctions and politically exposed person lists
+loaded from local CSV files (a `name` column, optional `aliases` separated by
+';' and optional `source`). Listed names are indexed by trigram; a name is
+compared against each run of its tokens with the token count of a listed
+name, and candidates sharing enough trigrams are confirmed with a bounded
+edit distance. Results are memoized per name, and the lists are reloaded
+when their files change.
+"""
+
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SANCTIONS = 'sanctions'
+PEP = 'pep'
+LIST_TYPES = (SANCTIONS, PEP)
+
+# Memoized names kept per list generation before the memo is reset
+_CACHE_LIMIT = 1 << 18
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+
+
+def normalize_name(name: str) -> Tuple[str, ...]:
+    """Uppercase alphanumeric tokens of a name or account identifier"""
+    return tuple(token for token in _NON_ALNUM.split(name.upper()) if token)
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allowed_distance(length: int, max_distance: int) -> int:
+    """Edits tolerated for a listed name of this length"""
+    if length <= 4:
+        return 0
+    return min(1 if length <= 8 else 2, max_distance)
+
+
+def bounded_edit_distance(a: str, b: str, bound: int) -> Optional[int]:
+    """Levenshtein distance if it is at most bound, else None (banded, stops early)"""
+    if abs(len(a) - len(b)) > bound:
+        return None
+    if a == b:
+        return 0
+
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [bound + 1] * len(b)
+        low, high = max(1, i - bound), min(len(b), i + bound)
+        for j in range(low, high + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (a[i - 1] != b[j - 1]))
+        if min(current[low - 1:high + 1]) > bound:
+            return None
+        previous = current
+    return previous[len(b)] if previous[len(b)] <= bound else None
+
+
+@dataclass(frozen=True)
+class ScreeningMatch:
+    """A listed name found in a screened name"""
+    list_type: str
+    listed_name: str
+    source: str
+    matched_text: str
+    distance: int
+
+    def as_dict(self) -> Dict:
+        return {
+            "list_type": self.list_type,
+            "listed_name": self.listed_name,
+            "source": self.source,
+            "matched_text": self.matched_text,
+            "distance": self.distance
+        }
+
+
+class _ScreeningIndex:
+    """Immutable trigram index over the listed names of every list"""
+
+    def __init__(self, entries: List[Tuple[str, str, str]], max_distance: int):
+        # entries: (list_type, listed name or alias, source)
+        self.max_distance = max_distance
+        self.entries: List[Tuple[str, str, str, str]] = []
+        self.exact: Dict[str, List[int]] = defaultdict(list)
+        self.postings: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+        self.token_counts = set()
+        for list_type, name, source in entries:
+            tokens = normalize_name(name)
+            if not tokens:
+                continue
+            text = ' '.join(tokens)
+            index = len(self.entries)
+            self.entries.append((list_type, name, source, text))
+            self.exact[text].append(index)
+            self.token_counts.add(len(tokens))
+            for trigram in _trigrams(text):
+                self.postings[(len(tokens), trigram)].append(index)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def screen(self, name: str) -> List[ScreeningMatch]:
+        tokens = normalize_name(name)
+        found: Dict[int, Tuple[int, str]] = {}
+        for width in self.token_counts:
+            for start in range(len(tokens) - width + 1):
+                window = ' '.join(tokens[start:start + width])
+                for index in self.exact.get(window, ()):
+                    found[index] = (0, window)
+                self._fuzzy(window, width, found)
+
+        matches = [
+            ScreeningMatch(self.entries[index][0], self.entries[index][1], self.entries[index][2], text, distance)
+            for index, (distance, text) in found.items()
+        ]
+        matches.sort(key=lambda match: (match.distance, match.list_type, match.listed_name))
+        return matches
+
+    def _fuzzy(self, window: str, width: int, found: Dict[int, Tuple[int, str]]):
+        bound = allowed_distance(len(window), self.max_distance)
+        if bound == 0:
+            return
+
+        # Each edit removes at most three of the window's trigrams
+        trigrams = _trigrams(window)
+        required = len(trigrams) - 3 * bound
+        if required <= 0:
+            return
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in trigrams:
+            for index in self.postings.get((width, trigram), ()):
+                shared[index] += 1
+
+        for index, count in shared.items():
+            if count < required or index in found and found[index][0] == 0:
+                continue
+            text = self.entries[index][3]
+            distance = bounded_edit_distance(window, text, min(bound, allowed_distance(len(text), self.max_distance)))
+            if distance is not None and (index not in found or distance < found[index][0]):
+                found[index] = (distance, window)
+
+
+class ScreeningEngine:
+    """Screens names against locally stored sanctions and PEP lists"""
+
+    def __init__(self, sanctions_path: Optional[str] = None, pep_path: Optional[str] = None,
+                 max_distance: int = 2, reload_check_seconds: float = 5.0):
+        self.paths = {SANCTIONS: sanctions_path, PEP: pep_path}
+        self.max_distance = max_distance
+        self.reload_check_seconds = reload_check_seconds
+
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Optional[Tuple[float, int]]] = {}
+        self._checked_at = 0.0
+        self._index = _ScreeningIndex([], max_distance)
+        self._cache: Dict[str, List[ScreeningMatch]] = {}
+        self._loaded_at: Optional[str] = None
+        self.reload(force=True)
+
+    def _signature(self, path: Optional[str]) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size) if stat else None
+
+    def _read_list(self, list_type: str, path: Optional[str]) -> List[Tuple[str, str, str]]:
+        if not path or not os.path.exists(path):
+            logger.info(f"No {list_type} list at {path}; screening without it")
+            return []
+        entries = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                source = (row.get('source') or list_type).strip()
+                names = [row.get('name') or ''] + (row.get('aliases') or '').split(';')
+                entries.extend((list_type, name.strip(), source) for name in names if name.strip())
+        return entries
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the index if a list file changed (or when forced); returns whether it was rebuilt"""
+        with self._lock:
+            signatures = {list_type: self._signature(path) for list_type, path in self.paths.items()}
+            self._checked_at = time.monotonic()
+            if not force and signatures == self._signatures:
+                return False
+
+            try:
+                entries = [entry for list_type, path in self.paths.items()
+                           for entry in self._read_list(list_type, path)]
+            except (OSError, csv.Error, UnicodeError) as e:
+                logger.error(f"Error loading screening lists, keeping the previous ones: {e}")
+                return False
+
+            # Readers keep using the old index and memo until these swaps
+            self._index = _ScreeningIndex(entries, self.max_distance)
+            self._cache = {}
+            self._signatures = signatures
+            self._loaded_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+            logger.info(f"Screening lists loaded: {len(self._index)} names")
+            return True
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at >= self.reload_check_seconds:
+            self.reload()
+
+    def screen(self, name: str) -> List[ScreeningMatch]:
+        """Listed names found in the name, closest first"""
+        self._maybe_reload()
+        cache = self._cache
+        matches = cache.get(name)
+        if matches is None:
+            matches = self._index.screen(name) if len(self._index) else []
+            if len(cache) >= _CACHE_LIMIT:
+                cache.clear()
+            cache[name] = matches
+        return matches
+
+    def screen_many(self, names: Iterable[str]) -> Dict[str, List[ScreeningMatch]]:
+        """Screen a set of names (each distinct name once); only names with matches are returned"""
+        results = {}
+        for name in set(names):
+            matches = self.screen(name)
+            if matches:
+                results[name] = matches
+        return results
+
+    def is_listed(self, name: str, list_type: str) -> bool:
+        return any(match.list_type == list_type for match in self.screen(name))
+
+    def flags(self, names: List[str], list_type: str) -> np.ndarray:
+        """Whether each name matches the given list"""
+        listed = self.screen_many(names)
+        return np.fromiter(
+            (any(match.list_type == list_type for match in listed.get(name, ())) for name in names),
+            dtype=bool, count=len(names)
+        )
+
+    def get_stats(self) -> Dict:
+        index = self._index
+        counts = {list_type: 0 for list_type in LIST_TYPES}
+        for list_type, _, _, _ in index.entries:
+            counts[list_type] += 1
+        return {
+            "listed_names": counts,
+            "memoized_names": len(self._cache),
+            "loaded_at": self._loaded_at
+        }
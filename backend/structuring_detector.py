@@ -0,0 +1,280 @@
+"""
+Streaming Structuring Detector
+Keeps per-account rolling windows of cash operations so structuring indicators
+are available as soon as a transaction is ingested. All windows end at the
+latest timestamp seen, so accounts that go quiet expire and are dropped
+"""
+
+import heapq
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+CASH_OPERATION_TYPES = ('CASH_IN', 'CASH_OUT')
+
+# Reporting thresholds watched for structuring (amounts within 10% below them)
+STRUCTURING_THRESHOLDS = (10000, 5000, 3000)
+NEAR_THRESHOLD_RATIO = 0.9
+NEAR_THRESHOLD_ALERT_COUNT = 3
+
+# Cash-out burst: this many cash-outs inside the window raises an indicator
+CASH_OUT_BURST_COUNT = 5
+
+DEFAULT_WINDOW_SECONDS = 86400 * 7  # One week
+DEFAULT_MAX_OPERATIONS = 5000
+
+# Idle windows are swept each time the watermark advances this fraction of the window
+SWEEP_FRACTION = 0.25
+
+
+def _threshold_band(amount: float) -> int:
+    """Return the index of the threshold the amount sits just below, or -1"""
+    for index, threshold in enumerate(STRUCTURING_THRESHOLDS):
+        if threshold * NEAR_THRESHOLD_RATIO <= amount < threshold:
+            return index
+    return -1
+
+
+class _CashWindow:
+    """Rolling window of one account's cash operations with running aggregates"""
+
+    __slots__ = ('operations', 'near_threshold', 'cash_out_count',
+                 'total_cash_in', 'total_cash_out', 'latest_timestamp')
+
+    def __init__(self):
+        # Each entry: (timestamp, operation_type, amount, threshold_band)
+        self.operations = deque()
+        self.near_threshold = [0] * len(STRUCTURING_THRESHOLDS)
+        self.cash_out_count = 0
+        self.total_cash_in = 0.0
+        self.total_cash_out = 0.0
+        self.latest_timestamp = None
+
+    def append(self, timestamp: int, op: str, amount: float):
+        band = _threshold_band(amount)
+        self.operations.append((timestamp, op, amount, band))
+        self._account(op, amount, band, 1)
+        if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+            self.latest_timestamp = timestamp
+
+    def evict(self, window_start: int, max_operations: int) -> bool:
+        """Drop operations older than the window start or beyond the size cap; returns whether any were"""
+        operations = self.operations
+        evicted = False
+        while operations and (operations[0][0] < window_start or len(operations) > max_operations):
+            _, op, amount, band = operations.popleft()
+            self._account(op, amount, band, -1)
+            evicted = True
+        return evicted
+
+    def _account(self, op: str, amount: float, band: int, sign: int):
+        if band >= 0:
+            self.near_threshold[band] += sign
+        if op == 'CASH_OUT':
+            self.cash_out_count += sign
+            self.total_cash_out += sign * amount
+        else:
+            self.total_cash_in += sign * amount
+
+
+class StructuringDetector:
+    """Online detector for cash structuring and cash-out bursts"""
+
+    def __init__(self, window_seconds: int = DEFAULT_WINDOW_SECONDS,
+                 max_operations: int = DEFAULT_MAX_OPERATIONS):
+        self.window_seconds = window_seconds
+        self.max_operations = max_operations
+        self._windows: Dict[str, _CashWindow] = {}
+        self._alerts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # Latest timestamp seen across all accounts; every window ends here
+        self._watermark: Optional[int] = None
+        self._swept_at: Optional[int] = None
+
+    @property
+    def window_start(self) -> Optional[int]:
+        """Earliest timestamp the windows still hold, or None before any operation"""
+        watermark = self._watermark
+        return None if watermark is None else watermark - self.window_seconds
+
+    def observe(self, account_id: str, op: str, amount: float, timestamp: int) -> List[str]:
+        """Add one cash operation to an account's window and return its current indicators"""
+        if op not in CASH_OPERATION_TYPES:
+            return []
+
+        timestamp = int(timestamp)
+        with self._lock:
+            if self._watermark is None or timestamp > self._watermark:
+                self._watermark = timestamp
+            window_start = self._watermark - self.window_seconds
+
+            window = self._windows.get(account_id)
+            if timestamp < window_start:
+                # Already outside the window
+                return self._indicators(window) if window else []
+            if window is None:
+                window = self._windows[account_id] = _CashWindow()
+
+            window.append(timestamp, op, float(amount))
+            window.evict(window_start, self.max_operations)
+            indicators = self._update_alert(account_id, window)
+
+            if self._swept_at is None or self._watermark - self._swept_at >= self.window_seconds * SWEEP_FRACTION:
+                self._sweep(window_start)
+            return indicators
+
+    def _update_alert(self, account_id: str, window: _CashWindow) -> List[str]:
+        indicators = self._indicators(window)
+        if indicators:
+            self._alerts[account_id] = {
+                "account_id": account_id,
+                "structuring_indicators": indicators,
+                "risk_score": self._risk_score(window, indicators),
+                "timestamp": window.latest_timestamp
+            }
+        else:
+            self._alerts.pop(account_id, None)
+        return indicators
+
+    def _sweep(self, window_start: int):
+        """Expire every window against the watermark and drop accounts left empty"""
+        for account_id in list(self._windows):
+            window = self._windows[account_id]
+            if not window.evict(window_start, self.max_operations):
+                continue
+            if window.operations:
+                self._update_alert(account_id, window)
+            else:
+                del self._windows[account_id]
+                self._alerts.pop(account_id, None)
+        self._swept_at = self._watermark
+
+    def ingest_dataframe(self, df: pd.DataFrame):
+        """Feed a batch of canonical transactions (nameOrig, nameDest, type, amount, step)"""
+        if df is None or df.empty or 'type' not in df.columns:
+            return
+
+        cash = df[df['type'].isin(CASH_OPERATION_TYPES)]
+        if cash.empty:
+            return
+
+        # Windows evict from the left, so feed each batch in time order
+        cash = cash.sort_values('step', kind='stable')
+        for orig, dest, op, amount, step in zip(
+            cash['nameOrig'].astype(str), cash['nameDest'].astype(str),
+            cash['type'], cash['amount'], cash['step']
+        ):
+            # Cash operations count against both parties, as in the graph query
+            self.observe(orig, op, amount, step)
+            self.observe(dest, op, amount, step)
+
+    def get_alert(self, account_id: str) -> Optional[Dict]:
+        """Return the latest structuring alert for an account, if any"""
+        with self._lock:
+            alert = self._alerts.get(account_id)
+            return dict(alert) if alert else None
+
+    def get_patterns(self, min_cash_amount: float = 10000, min_operations: int = 5,
+                     limit: int = 50, after: Optional[list] = None,
+                     since: Optional[int] = None, until: Optional[int] = None) -> List[Dict]:
+        """
+        Return accounts with cash-intensive activity in their current window, by
+        window cash volume (largest first) from the after key. Indicators and scores
+        cover only the operations in the amount and time range; ranges before
+        window_start are not held here. Only the returned accounts' operations are read
+        """
+        rows = []
+        with self._lock:
+            window_start = self.window_start
+            if window_start is not None and (since is None or since < window_start):
+                since = window_start
+
+            # Keyset order: window cash volume descending (kept by the windows), then account id
+            candidates = [
+                (-(window.total_cash_out + window.total_cash_in), account_id)
+                for account_id, window in self._windows.items()
+                if len(window.operations) >= min_operations
+            ]
+            if after:
+                after_key = (-after[0], after[1])
+                candidates = [key for key in candidates if key > after_key]
+            heapq.heapify(candidates)
+
+            while candidates and len(rows) < limit:
+                key = heapq.heappop(candidates)
+                operations = [
+                    (timestamp, op, amount)
+                    for timestamp, op, amount, _ in self._windows[key[1]].operations
+                    if (amount >= min_cash_amount
+                        and (since is None or timestamp >= since)
+                        and (until is None or timestamp <= until))
+                ]
+                if len(operations) >= min_operations:
+                    rows.append((key, operations))
+
+        patterns = []
+        for (key, account_id), operations in rows:
+            selected = _CashWindow()
+            for timestamp, op, amount in operations:
+                selected.append(timestamp, op, amount)
+            indicators = self._indicators(selected)
+            patterns.append({
+                "account_id": account_id,
+                "total_cash_out": selected.total_cash_out,
+                "total_cash_in": selected.total_cash_in,
+                "operation_count": len(operations),
+                "operations": [
+                    {"op": op, "amount": amount, "timestamp": timestamp}
+                    for timestamp, op, amount in operations
+                ],
+                "cash_out_burst": selected.cash_out_count,
+                "structuring_indicators": indicators,
+                "risk_score": self._risk_score(selected, indicators),
+                "cursor": encode_cursor([-key, account_id])
+            })
+        return patterns
+
+    def get_stats(self) -> Dict:
+        """Return detector size information"""
+        with self._lock:
+            return {
+                "tracked_accounts": len(self._windows),
+                "windowed_operations": sum(len(w.operations) for w in self._windows.values()),
+                "active_alerts": len(self._alerts),
+                "window_seconds": self.window_seconds
+            }
+
+    def _indicators(self, window: _CashWindow) -> List[str]:
+        indicators = []
+        for threshold, count in zip(STRUCTURING_THRESHOLDS, window.near_threshold):
+            if count >= NEAR_THRESHOLD_ALERT_COUNT:
+                indicators.append(f"{count} transactions near ${threshold} threshold")
+
+        if window.cash_out_count >= CASH_OUT_BURST_COUNT:
+            indicators.append("Multiple cash-out operations within short timeframe")
+
+        return indicators
+
+    def _risk_score(self, window: _CashWindow, indicators: List[str]) -> float:
+        """Same weighting as the graph-side cash pattern risk, over the window"""
+        risk_score = 0.0
+
+        if window.total_cash_out + window.total_cash_in > 500000:
+            risk_score += 0.3
+
+        if len(window.operations) > 20:
+            risk_score += 0.2
+
+        risk_score += len(indicators) * 0.1
+
+        if window.total_cash_out > window.total_cash_in * 2:
+            risk_score += 0.2
+
+        return min(risk_score, 1.0)
@@ -0,0 +1,93 @@
+"""Unit tests for flow_attribution: traced funds are conserved for both allocation rules"""
+
+import numpy as np
+import pytest
+
+from flow_attribution import ATTRIBUTION_FIFO, ATTRIBUTION_METHODS, ATTRIBUTION_PROPORTIONAL, attribute_flow
+from flow_graph import MoneyFlowGraph
+
+
+def make_graph(edges, source='S'):
+    """MoneyFlowGraph from (sender, receiver, amount, timestamp) tuples"""
+    nodes = [source]
+    node_index = {source: 0}
+    for sender, receiver, _, _ in edges:
+        for node in (sender, receiver):
+            if node not in node_index:
+                node_index[node] = len(nodes)
+                nodes.append(node)
+    return MoneyFlowGraph(
+        source=source,
+        nodes=nodes,
+        depth=np.zeros(len(nodes), dtype=np.int64),
+        src=np.array([node_index[e[0]] for e in edges], dtype=np.int64),
+        dst=np.array([node_index[e[1]] for e in edges], dtype=np.int64),
+        amount=np.array([e[2] for e in edges], dtype=np.float64),
+        timestamp=np.array([e[3] for e in edges], dtype=np.int64),
+        edge_type=np.zeros(len(edges), dtype=np.int64),
+        type_names=['TRANSFER'],
+        node_index=node_index
+    )
+
+
+def random_graph(seed, num_accounts=40, num_edges=300):
+    rng = np.random.default_rng(seed)
+    names = ['S'] + [f'A{i}' for i in range(1, num_accounts)]
+    edges = []
+    for _ in range(num_edges):
+        sender, receiver = rng.choice(num_accounts, 2, replace=False)
+        edges.append((names[sender], names[receiver], float(rng.uniform(100, 10000)), int(rng.integers(0, 1000))))
+    return make_graph(edges)
+
+
+@pytest.mark.parametrize('method', ATTRIBUTION_METHODS)
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_hops', [1, 3, 6])
+def test_attributed_funds_sum_to_source_outflow(method, seed, max_hops):
+    graph = random_graph(seed)
+    attribution = attribute_flow(graph, max_hops=max_hops, method=method)
+
+    assert attribution.source_outflow == pytest.approx(graph.amount[graph.src == 0].sum())
+    assert attribution.ended.sum() == pytest.approx(attribution.source_outflow, rel=1e-9)
+    assert (attribution.ended >= -1e-9).all()
+    # No transaction carries more traced funds than its amount, over all hops
+    assert (attribution.edge_attributed <= graph.amount * (1 + 1e-9)).all()
+
+
+@pytest.mark.parametrize('method', ATTRIBUTION_METHODS)
+def test_chain_passes_funds_to_the_end(method):
+    graph = make_graph([('S', 'A', 1000.0, 1), ('A', 'B', 1000.0, 2), ('B', 'C', 1000.0, 3)])
+    attribution = attribute_flow(graph, max_hops=5, method=method)
+
+    assert attribution.share_ended_at('C') == pytest.approx(1.0)
+    assert attribution.first_hop[graph.node_index['C']] == 3
+
+
+@pytest.mark.parametrize('method', ATTRIBUTION_METHODS)
+def test_funds_never_leave_before_they_arrive(method):
+    # A sent to B before it received anything from S, so the traced funds stay at A
+    graph = make_graph([('A', 'B', 500.0, 1), ('S', 'A', 1000.0, 2)])
+    attribution = attribute_flow(graph, max_hops=5, method=method)
+
+    assert attribution.share_ended_at('A') == pytest.approx(1.0)
+    assert attribution.share_ended_at('B') == 0.0
+
+
+def test_proportional_and_fifo_split_differently():
+    graph = make_graph([
+        ('S', 'A', 1000.0, 1),
+        ('A', 'B', 1000.0, 2),
+        ('A', 'C', 1000.0, 3),
+    ])
+    proportional = attribute_flow(graph, max_hops=2, method=ATTRIBUTION_PROPORTIONAL)
+    fifo = attribute_flow(graph, max_hops=2, method=ATTRIBUTION_FIFO)
+
+    assert proportional.share_ended_at('B') == pytest.approx(0.5)
+    assert proportional.share_ended_at('C') == pytest.approx(0.5)
+    assert fifo.share_ended_at('B') == pytest.approx(1.0)
+    assert fifo.share_ended_at('C') == 0.0
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        attribute_flow(random_graph(0), method='lifo')
@@ -0,0 +1,123 @@
+"""Unit tests for the indexed-heap risk leaderboard"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from leaderboard import RiskLeaderboard
+
+
+def board_scores(board, limit=1000):
+    return [(entry['account_id'], entry['risk_score']) for entry in board.top(limit)]
+
+
+def assert_heap_consistent(board):
+    heap = board._heap
+    for i, entry in enumerate(heap):
+        assert board._position[entry[1]] == i
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(heap):
+                assert entry <= heap[child]
+    assert len(board._position) == len(heap)
+
+
+def test_top_orders_by_score_then_account_id():
+    board = RiskLeaderboard(capacity=10, min_score=0.6)
+    for account_id, score in [('B', 0.7), ('A', 0.9), ('D', 0.7), ('C', 0.8), ('E', 0.7)]:
+        board.update(account_id, score, risk_level='HIGH')
+
+    assert board_scores(board) == [('A', 0.9), ('C', 0.8), ('B', 0.7), ('D', 0.7), ('E', 0.7)]
+    assert board_scores(board, limit=2) == [('A', 0.9), ('C', 0.8)]
+    assert board.top(1)[0]['risk_level'] == 'HIGH'
+
+
+def test_full_board_evicts_the_lowest_score():
+    board = RiskLeaderboard(capacity=3, min_score=0.6)
+    for account_id, score in [('A', 0.7), ('B', 0.8), ('C', 0.9)]:
+        board.update(account_id, score)
+
+    board.update('D', 0.95)
+    assert board_scores(board) == [('D', 0.95), ('C', 0.9), ('B', 0.8)]
+    assert board.get_stats()['evicted'] == 1
+
+    # Not better than the current lowest entry: rejected
+    board.update('E', 0.75)
+    assert [account_id for account_id, _ in board_scores(board)] == ['D', 'C', 'B']
+    assert board.get_stats()['evicted'] == 2
+    assert board.get_stats()['full'] is True
+
+
+def test_score_changes_move_or_drop_an_account():
+    board = RiskLeaderboard(capacity=10, min_score=0.6)
+    for account_id, score in [('A', 0.7), ('B', 0.8), ('C', 0.9)]:
+        board.update(account_id, score)
+
+    board.update('A', 0.99)
+    assert board_scores(board)[0] == ('A', 0.99)
+
+    board.update('C', 0.3)
+    assert board_scores(board) == [('A', 0.99), ('B', 0.8)]
+    assert board.count() == 2
+    assert_heap_consistent(board)
+
+
+def test_random_updates_keep_the_heap_consistent():
+    rng = random.Random(3)
+    board = RiskLeaderboard(capacity=1000, min_score=0.6)
+    expected = {}
+    for _ in range(5000):
+        account_id = f"C{rng.randrange(200)}"
+        score = round(rng.random(), 3)
+        board.update(account_id, score)
+        if score >= 0.6:
+            expected[account_id] = score
+        else:
+            expected.pop(account_id, None)
+
+    assert_heap_consistent(board)
+    assert board_scores(board) == sorted(expected.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_update_scores_applies_a_score_table():
+    board = RiskLeaderboard(capacity=10, min_score=0.6)
+    scores = pd.DataFrame({'risk_score': [0.9, 0.2], 'risk_level': ['HIGH', 'LOW'], 'velocity': [0.5, 0.1]},
+                          index=pd.Index(['A', 'B'], name='account_id'))
+    board.update_scores(scores, scored_at='2024-01-01T00:00:00')
+
+    [entry] = board.top()
+    assert entry['account_id'] == 'A'
+    assert entry['factor_scores']['velocity'] == pytest.approx(0.5)
+    assert entry['scored_at'] == '2024-01-01T00:00:00'
+
+
+def test_rebuild_replays_updates_made_while_loading():
+    board = RiskLeaderboard(capacity=10, min_score=0.6, resync_seconds=3600)
+
+    def loader():
+        # Score writes that land while the stored rows are being read
+        board.update('C', 0.95)
+        board.update('B', 0.1)
+        return [{'account_id': 'A', 'risk_score': 0.7}, {'account_id': 'B', 'risk_score': 0.8}]
+
+    board.loader = loader
+    board.rebuild()
+
+    assert board_scores(board) == [('C', 0.95), ('A', 0.7)]
+    assert board._pending is None
+    assert_heap_consistent(board)
+
+
+def test_failed_rebuild_keeps_the_current_board():
+    board = RiskLeaderboard(capacity=10, min_score=0.6)
+    board.update('A', 0.9)
+
+    def loader():
+        raise ConnectionError("database unavailable")
+
+    board.loader = loader
+    with pytest.raises(ConnectionError):
+        board.rebuild()
+
+    assert board_scores(board) == [('A', 0.9)]
+    assert board._pending is None
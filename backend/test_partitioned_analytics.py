@@ -0,0 +1,93 @@
+"""Unit tests for partitioned_analytics: the cycle set does not depend on how the graph is split"""
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_scoring import EdgeTable
+from partitioned_analytics import cycle_partitions, detect_cycles, find_circular_flows, load_cycle_summary, \
+    save_cycle_summary
+
+MAX_CYCLE_LENGTH = 4
+
+
+def canonical(nodes):
+    """A cycle's node sequence (closed, first node repeated) rotated to start at its smallest node"""
+    ring = list(nodes[:-1])
+    start = ring.index(min(ring))
+    return tuple(ring[start:] + ring[:start])
+
+
+@pytest.fixture(scope='module')
+def transactions():
+    # No parallel transactions or self-loops, so every cycle is one networkx simple cycle
+    rng = np.random.default_rng(7)
+    pairs = set()
+    while len(pairs) < 900:
+        sender, receiver = rng.integers(0, 300, 2)
+        if sender != receiver:
+            pairs.add((int(sender), int(receiver)))
+    pairs = sorted(pairs)
+    return pd.DataFrame({
+        'nameOrig': [f'C{sender}' for sender, _ in pairs],
+        'nameDest': [f'C{receiver}' for _, receiver in pairs],
+        'type': 'TRANSFER',
+        'amount': rng.uniform(5000, 9000, len(pairs)),
+        'step': rng.integers(0, 10 ** 6, len(pairs)),
+        'isFraud': 0
+    })
+
+
+@pytest.fixture(scope='module')
+def edges_directory(transactions, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('edges'))
+    EdgeTable.from_frames([transactions]).save(directory)
+    return directory
+
+
+def cycles_in_process(edges_directory, num_partitions):
+    edges = EdgeTable.load(edges_directory)
+    params = {"max_cycle_length": MAX_CYCLE_LENGTH}
+    found = []
+    for partition in cycle_partitions(edges, num_partitions=num_partitions):
+        found.extend(detect_cycles(edges, partition, params))
+    return found
+
+
+def test_cycles_match_networkx(transactions, edges_directory):
+    graph = nx.DiGraph(list(zip(transactions['nameOrig'], transactions['nameDest'])))
+    expected = {canonical(cycle + [cycle[0]]) for cycle in nx.simple_cycles(graph, length_bound=MAX_CYCLE_LENGTH)
+                if len(cycle) >= 2}
+
+    found = [canonical(cycle['nodes']) for cycle in cycles_in_process(edges_directory, num_partitions=8)]
+
+    assert len(found) == len(set(found)), "a cycle was reported twice"
+    assert set(found) == expected
+
+
+@pytest.mark.parametrize('num_partitions', [1, 3, 64])
+def test_cycle_set_does_not_depend_on_partition_count(edges_directory, num_partitions):
+    reference = sorted(canonical(cycle['nodes']) for cycle in cycles_in_process(edges_directory, num_partitions=8))
+    found = sorted(canonical(cycle['nodes']) for cycle in cycles_in_process(edges_directory, num_partitions))
+
+    assert found == reference
+
+
+def test_find_circular_flows_is_ordered_and_summarized(edges_directory, tmp_path):
+    everything = find_circular_flows(edges_directory, min_amount=5000, max_cycle_length=MAX_CYCLE_LENGTH,
+                                     workers=1, num_partitions=4)
+    result = find_circular_flows(edges_directory, min_amount=5000, max_cycle_length=MAX_CYCLE_LENGTH,
+                                 workers=1, limit=20, num_partitions=4)
+
+    totals = [cycle['total_amount'] for cycle in result['cycles']]
+    assert totals == sorted(totals, reverse=True)
+    assert result['total_cycles'] == len(result['cycles']) == 20
+    assert result['cycles'] == everything['cycles'][:20]
+
+    assert load_cycle_summary(str(tmp_path)) is None
+    save_cycle_summary(str(tmp_path), result, {"limit": 20})
+    summary = load_cycle_summary(str(tmp_path))
+    assert summary['total_cycles'] == 20
+    assert summary['truncated'] is True
+    assert summary['cycle_accounts'] == len({node for cycle in result['cycles'] for node in cycle['nodes']})
@@ -0,0 +1,102 @@
+"""Unit tests for risk_rules: rule file validation and hot reload keeping the last good rules"""
+
+import copy
+import json
+import os
+
+import pytest
+
+from risk_rules import DEFAULT_RULES_PATH, RuleEngine, RuleSet
+
+
+@pytest.fixture
+def default_rules():
+    with open(DEFAULT_RULES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def rule_file(tmp_path, default_rules):
+    path = tmp_path / 'risk_rules.json'
+    path.write_text(json.dumps(default_rules), encoding='utf-8')
+    return path
+
+
+def rewrite(path, text):
+    """Replace the rule file and move its mtime forward so the change is always seen"""
+    mtime = os.stat(path).st_mtime
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (mtime + 10, mtime + 10))
+
+
+def test_default_rule_file_compiles(default_rules):
+    rules = RuleSet.load(DEFAULT_RULES_PATH)
+
+    assert rules.rules
+    assert set(rules.weights) == set(default_rules['factors'])
+
+
+@pytest.mark.parametrize('breakage, message', [
+    (lambda data: data['factors'].update(velocity=0.15), "must be a mapping"),
+    (lambda data: data['factors']['velocity'].update(weight='high'), "weight must be a number"),
+    (lambda data: data['factors']['velocity'].update(rules={'name': 'burst'}), "rules must be a list"),
+    (lambda data: data['factors']['velocity']['rules'][0].update(evidence="{account_id}"), "unknown feature"),
+    (lambda data: data['factors']['velocity']['rules'][0].update(evidence="{0}"), "unknown feature"),
+    (lambda data: data['factors']['velocity']['rules'][0].update(operator='~'), "unknown operator"),
+    (lambda data: data['factors'].update(unknown_factor={}), "unknown factor"),
+])
+def test_invalid_rule_files_are_rejected(default_rules, breakage, message):
+    data = copy.deepcopy(default_rules)
+    breakage(data)
+
+    with pytest.raises(ValueError, match=message):
+        RuleSet.from_dict(data)
+
+
+def test_non_mapping_rule_file_is_rejected():
+    with pytest.raises(ValueError):
+        RuleSet.from_dict([])
+
+
+@pytest.mark.parametrize('text', [
+    '{"factors": {',
+    '{"factors": {"velocity": 0.15}}',
+    '{"factors": {"velocity": {"rules": [{"feature": "avg_daily_transactions", "operator": ">", '
+    '"threshold": 50, "weight": 0.4, "evidence": "{missing}"}]}}}',
+    '[]',
+])
+def test_reload_keeps_previous_rules_on_a_broken_file(rule_file, text):
+    engine = RuleEngine(str(rule_file), reload_check_seconds=0)
+    before = engine.current()
+
+    rewrite(rule_file, text)
+
+    assert engine.reload() is False
+    assert engine.current() is before
+    assert engine.get_stats()['reloads'] == 0
+
+
+def test_reload_picks_up_a_valid_change(rule_file, default_rules):
+    engine = RuleEngine(str(rule_file), reload_check_seconds=0)
+    assert engine.reload() is False
+
+    data = copy.deepcopy(default_rules)
+    data['version'] = 'changed'
+    data['factors']['velocity']['weight'] = 0.5
+    rewrite(rule_file, json.dumps(data))
+
+    rules = engine.current()
+    assert rules.version == 'changed'
+    assert rules.weight('velocity') == 0.5
+    assert engine.get_stats()['reloads'] == 1
+
+
+def test_reload_recovers_after_a_broken_file(rule_file, default_rules):
+    engine = RuleEngine(str(rule_file), reload_check_seconds=0)
+
+    rewrite(rule_file, '{"factors": {')
+    assert engine.reload() is False
+
+    rewrite(rule_file, json.dumps(default_rules))
+    assert engine.reload() is True
+    assert engine.get_stats()['reloads'] == 1
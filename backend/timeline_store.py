@@ -0,0 +1,244 @@
+"""
+Account Timeline Store
+Per-account, time-sorted columnar transaction arrays appended at ingestion.
+Window lookups are binary searches and return zero-copy views, so risk factors
+run directly on NumPy arrays instead of DataFrames rebuilt from query rows.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPE_CODES = {
+    'CASH_IN': 0,
+    'CASH_OUT': 1,
+    'TRANSFER': 2,
+    'PAYMENT': 3,
+    'DEBIT': 4,
+}
+UNKNOWN_TYPE_CODE = len(TRANSACTION_TYPE_CODES)
+TRANSACTION_TYPE_NAMES = list(TRANSACTION_TYPE_CODES) + ['UNKNOWN']
+
+SECONDS_PER_DAY = 86400
+# 1970-01-01 was a Thursday (weekday 3 with Monday = 0)
+_EPOCH_WEEKDAY = 3
+
+_INITIAL_CAPACITY = 8
+
+
+@dataclass(frozen=True)
+class AccountTimeline:
+    """Time-sorted column views of one account's transactions"""
+    account_id: str
+    timestamp: np.ndarray      # int64, ascending
+    amount: np.ndarray         # float64
+    type_code: np.ndarray      # int8, index into TRANSACTION_TYPE_NAMES
+    outgoing: np.ndarray       # bool, True when the account sent the funds
+    counterparty: np.ndarray   # int32, index into counterparty_ids
+    counterparty_ids: List[str]
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def _slice(self, start: int, stop: int) -> 'AccountTimeline':
+        return AccountTimeline(
+            self.account_id,
+            self.timestamp[start:stop],
+            self.amount[start:stop],
+            self.type_code[start:stop],
+            self.outgoing[start:stop],
+            self.counterparty[start:stop],
+            self.counterparty_ids
+        )
+
+    def window(self, since: Optional[int] = None, until: Optional[int] = None) -> 'AccountTimeline':
+        """Transactions with since <= timestamp <= until (binary search, no copy)"""
+        start = 0 if since is None else int(np.searchsorted(self.timestamp, since, side='left'))
+        stop = len(self) if until is None else int(np.searchsorted(self.timestamp, until, side='right'))
+        return self._slice(start, max(start, stop))
+
+    def latest(self, count: int) -> 'AccountTimeline':
+        """The most recent count transactions (no copy)"""
+        return self._slice(max(len(self) - count, 0), len(self))
+
+    @property
+    def day(self) -> np.ndarray:
+        return self.timestamp // SECONDS_PER_DAY
+
+    @property
+    def hour(self) -> np.ndarray:
+        return (self.timestamp // 3600) % 24
+
+    @property
+    def weekday(self) -> np.ndarray:
+        return (self.day + _EPOCH_WEEKDAY) % 7
+
+    @property
+    def total_inflow(self) -> float:
+        return float(self.amount[~self.outgoing].sum())
+
+    @property
+    def total_outflow(self) -> float:
+        return float(self.amount[self.outgoing].sum())
+
+    def counterparties(self) -> List[str]:
+        """Distinct counterparty account ids"""
+        return [self.counterparty_ids[code] for code in np.unique(self.counterparty)]
+
+    @classmethod
+    def from_history(cls, account_id: str, history: pd.DataFrame) -> 'AccountTimeline':
+        """Build a timeline from get_account_history rows (used when the store has no data)"""
+        if history is None or history.empty:
+            return cls.empty(account_id)
+
+        history = history.sort_values('timestamp', kind='stable')
+        codes, counterparty_ids = pd.factorize(history['other_party'].astype(str))
+        return cls(
+            account_id,
+            history['timestamp'].fillna(0).to_numpy(dtype=np.int64),
+            history['amount'].fillna(0).to_numpy(dtype=np.float64),
+            history['type'].map(TRANSACTION_TYPE_CODES).fillna(UNKNOWN_TYPE_CODE).to_numpy(dtype=np.int8),
+            (history['direction'] == 'outgoing').to_numpy(),
+            codes.astype(np.int32),
+            list(counterparty_ids)
+        )
+
+    @classmethod
+    def empty(cls, account_id: str) -> 'AccountTimeline':
+        return cls(
+            account_id,
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.float64),
+            np.zeros(0, dtype=np.int8),
+            np.zeros(0, dtype=bool),
+            np.zeros(0, dtype=np.int32),
+            []
+        )
+
+
+class _Columns:
+    """Growable column buffers for one account"""
+
+    __slots__ = ('size', 'timestamp', 'amount', 'type_code', 'outgoing', 'counterparty')
+
+    def __init__(self):
+        self.size = 0
+        self.timestamp = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self.amount = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        self.type_code = np.empty(_INITIAL_CAPACITY, dtype=np.int8)
+        self.outgoing = np.empty(_INITIAL_CAPACITY, dtype=bool)
+        self.counterparty = np.empty(_INITIAL_CAPACITY, dtype=np.int32)
+
+    def append(self, timestamp: int, amount: float, type_code: int, outgoing: bool, counterparty: int):
+        if self.size and timestamp < self.timestamp[self.size - 1]:
+            self._insert(timestamp, amount, type_code, outgoing, counterparty)
+            return
+
+        if self.size == len(self.timestamp):
+            self._grow()
+        i = self.size
+        self.timestamp[i] = timestamp
+        self.amount[i] = amount
+        self.type_code[i] = type_code
+        self.outgoing[i] = outgoing
+        self.counterparty[i] = counterparty
+        self.size += 1
+
+    def _grow(self):
+        # Fresh buffers, so views handed out earlier keep their snapshot
+        for name in ('timestamp', 'amount', 'type_code', 'outgoing', 'counterparty'):
+            column = getattr(self, name)
+            grown = np.empty(len(column) * 2, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def _insert(self, timestamp, amount, type_code, outgoing, counterparty):
+        # Late arrivals are rare (ingestion and replay are time-ordered); np.insert copies
+        position = int(np.searchsorted(self.timestamp[:self.size], timestamp, side='right'))
+        values = (timestamp, amount, type_code, outgoing, counterparty)
+        for name, value in zip(('timestamp', 'amount', 'type_code', 'outgoing', 'counterparty'), values):
+            setattr(self, name, np.insert(getattr(self, name)[:self.size], position, value))
+        self.size += 1
+
+
+class TimelineStore:
+    """Columnar per-account transaction timelines fed by ingestion"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns: Dict[str, _Columns] = {}
+        # Shared account dictionary for counterparty codes
+        self._account_codes: Dict[str, int] = {}
+        self._account_ids: List[str] = []
+
+    def _code(self, account_id: str) -> int:
+        code = self._account_codes.get(account_id)
+        if code is None:
+            code = len(self._account_ids)
+            self._account_codes[account_id] = code
+            self._account_ids.append(account_id)
+        return code
+
+    def _account(self, account_id: str) -> _Columns:
+        columns = self._columns.get(account_id)
+        if columns is None:
+            columns = self._columns[account_id] = _Columns()
+        return columns
+
+    def add_transaction(self, sender_id: str, receiver_id: str, tx_type: str, amount: float, timestamp: int):
+        """Append one transaction to both parties' timelines"""
+        type_code = TRANSACTION_TYPE_CODES.get(tx_type, UNKNOWN_TYPE_CODE)
+        with self._lock:
+            sender_code = self._code(sender_id)
+            receiver_code = self._code(receiver_id)
+            self._account(sender_id).append(timestamp, amount, type_code, True, receiver_code)
+            self._account(receiver_id).append(timestamp, amount, type_code, False, sender_code)
+
+    def ingest_dataframe(self, df: pd.DataFrame):
+        """Feed a batch of canonical transactions (nameOrig, nameDest, type, amount, step)"""
+        if df is None or df.empty:
+            return
+
+        df = df.sort_values('step', kind='stable')
+        for orig, dest, tx_type, amount, step in zip(
+            df['nameOrig'].astype(str), df['nameDest'].astype(str),
+            df['type'].astype(str), df['amount'], df['step']
+        ):
+            self.add_transaction(orig, dest, tx_type, float(amount), int(step))
+
+    def timeline(self, account_id: str, since: Optional[int] = None,
+                 until: Optional[int] = None) -> Optional[AccountTimeline]:
+        """Zero-copy timeline views for an account, or None if it has no transactions"""
+        with self._lock:
+            columns = self._columns.get(account_id)
+            if columns is None:
+                return None
+            size = columns.size
+            timeline = AccountTimeline(
+                account_id,
+                columns.timestamp[:size],
+                columns.amount[:size],
+                columns.type_code[:size],
+                columns.outgoing[:size],
+                columns.counterparty[:size],
+                self._account_ids
+            )
+        return timeline.window(since, until)
+
+    def get_stats(self) -> Dict:
+        """Return store size information"""
+        with self._lock:
+            transactions = sum(columns.size for columns in self._columns.values())
+            capacity = sum(len(columns.timestamp) for columns in self._columns.values())
+            return {
+                "tracked_accounts": len(self._columns),
+                "stored_entries": transactions,
+                # int64 + float64 + int8 + bool + int32 per slot
+                "column_bytes": capacity * 22
+            }
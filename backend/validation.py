@@ -7,6 +7,8 @@ from typing import Dict, List, Any, Optional
 from functools import wraps
 from flask import request, jsonify
 
+from pagination import decode_cursor
+
 logger = logging.getLogger(__name__)
 
 # Security patterns and limits
@@ -101,6 +103,48 @@ def validate_pagination_params(request_args: Dict[str, Any]) -> tuple[int, int]:
     except (ValueError, TypeError):
         return 50, 0
 
+def validate_cursor_params(request_args: Dict[str, Any], default_limit: int = 50,
+                           key_size: int = 2) -> tuple[int, Optional[list]]:
+    """Validate and return keyset pagination parameters; raises ValueError on a bad cursor"""
+    try:
+        limit = max(1, min(int(request_args.get('limit', default_limit)), 1000))
+    except (ValueError, TypeError):
+        limit = default_limit
+
+    return limit, decode_cursor(request_args.get('cursor'), key_size)
+
+def validate_time_range(request_args: Dict[str, Any]) -> tuple[Optional[int], Optional[int]]:
+    """Validate and return since/until timestamps; raises ValueError if invalid"""
+    bounds = []
+    for name in ('since', 'until'):
+        value = request_args.get(name)
+        if value is None or value == '':
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(int(value))
+        except (ValueError, TypeError):
+            raise ValueError(f"{name} must be an integer timestamp")
+
+    since, until = bounds
+    # A point-in-time view is an upper bound on the visible transactions
+    as_of = validate_as_of(request_args)
+    if as_of is not None:
+        until = as_of if until is None else min(until, as_of)
+    if since is not None and until is not None and since > until:
+        raise ValueError("since must not be after until")
+    return since, until
+
+def validate_as_of(request_args: Dict[str, Any]) -> Optional[int]:
+    """Validate and return the as_of timestamp for point-in-time queries; raises ValueError if invalid"""
+    value = request_args.get('as_of')
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        raise ValueError("as_of must be an integer timestamp")
+
 def rate_limit_key(user_id: str = None) -> str:
     """Generate rate limiting key"""
     if user_id: